@@ -0,0 +1,29 @@
+import argparse
+import asyncio
+
+from infrastructure.config import settings
+from infrastructure.database.db_session import SessionLocal
+from api.v1.services.book_import_service import import_books, read_records
+
+async def run(path: str, format: str, batch_size: int) -> None:
+    """
+    Imports a CSV or NDJSON file of books into the database and prints the report.
+
+    Args:
+        path: The path of the file to import.
+        format: Either "csv" or "ndjson".
+        batch_size: The number of books written per statement.
+    """
+    with open(path, encoding="utf-8", newline="") as lines:
+        async with SessionLocal() as db:
+            report = await import_books(db, read_records(lines, format), batch_size)
+    print(report.json(indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import books from a CSV or NDJSON file.")
+    parser.add_argument("path", help="The file to import")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="The file format (default: guessed from the extension)")
+    parser.add_argument("--batch-size", type=int, default=int(settings.IMPORT_BATCH_SIZE), help="Books written per statement")
+    args = parser.parse_args()
+    format = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    asyncio.run(run(args.path, format, args.batch_size))
@@ -1,24 +1,228 @@
-from infrastructure.database.db_session import get_db
-from infrastructure.database.models import User, Book
-from infrastructure.config import settings
-from sqlalchemy.orm import Session
-
-# Import dummy data or read data from a file, ensuring consistent data format
-from scripts.dummy_data import users, books
-
-def seed_users(db: Session):
-    for user_data in users:
-        db_user = User(**user_data)
-        db.add(db_user)
-    db.commit()
-
-def seed_books(db: Session):
-    for book_data in books:
-        db_book = Book(**book_data)
-        db.add(db_book)
-    db.commit()
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, text
+
+from infrastructure.database import initialize_database
+from infrastructure.database.db_session import SessionLocal
+from infrastructure.database.models import Book, Holding, Loan, User
+from utils.auth import get_password_hash
+
+# The columns of the generated rows of each table; holdings and loans take their
+# ids from the database
+COLUMNS = {
+    "users": ["id", "username", "email", "hashed_password", "created_at", "updated_at"],
+    "books": ["id", "title", "author", "isbn", "genre", "description", "publication_date", "cover_image", "is_available"],
+    "book_holdings": ["book_id", "total_copies", "available_copies", "hold_head", "hold_tail"],
+    "loans": ["book_id", "user_id", "borrowed_at"],
+}
+MODELS = {"users": User, "books": Book, "book_holdings": Holding, "loans": Loan}
+
+# Every generated timestamp is relative to this instant, so output never depends on the clock
+EPOCH = datetime(2024, 1, 1)
+
+# An unusable password hash: seeded accounts cannot log in unless a password is given
+UNUSABLE_PASSWORD_HASH = "!"
+
+FIRST_NAMES = [
+    "Ada", "Alan", "Amara", "Ana", "Arjun", "Beatrice", "Bruno", "Chen", "Clara", "Dmitri",
+    "Elena", "Emeka", "Farah", "Felix", "Grace", "Hana", "Hugo", "Ines", "Ivan", "Jamal",
+    "Julia", "Kenji", "Lena", "Leo", "Lucia", "Malik", "Maria", "Mateo", "Mei", "Nadia",
+    "Noah", "Olga", "Omar", "Priya", "Rafael", "Rosa", "Sami", "Sofia", "Tariq", "Yuki",
+]
+LAST_NAMES = [
+    "Adeyemi", "Andersen", "Bauer", "Costa", "Dubois", "Fischer", "Garcia", "Haddad", "Ivanova", "Jensen",
+    "Kim", "Kowalski", "Larsen", "Lopez", "Mensah", "Moreau", "Nakamura", "Novak", "Okafor", "Patel",
+    "Petrov", "Quinn", "Rossi", "Santos", "Schmidt", "Silva", "Singh", "Tanaka", "Torres", "Wang",
+]
+TITLE_WORDS = [
+    "Shadow", "River", "Silent", "Garden", "Empire", "Winter", "Glass", "Memory", "Secret", "Storm",
+    "Night", "Ocean", "Iron", "Letters", "Journey", "Forgotten", "Crown", "Island", "Light", "Stone",
+    "House", "City", "Dream", "Fire", "Last", "Broken", "Golden", "Hidden", "Long", "Wild",
+]
+DESCRIPTION_WORDS = TITLE_WORDS + [
+    "a", "the", "of", "and", "in", "story", "family", "war", "love", "mystery",
+    "journey", "discovers", "young", "old", "world", "across", "between", "after", "before", "truth",
+]
+# Genres with their relative frequency in the catalog
+GENRES = {
+    "Fiction": 30, "Mystery": 12, "Romance": 10, "Science Fiction": 9, "Fantasy": 9,
+    "Biography": 6, "History": 6, "Science": 5, "Poetry": 3, "Children": 7, "Horror": 3,
+}
+GENRE_NAMES, GENRE_WEIGHTS = list(GENRES), list(GENRES.values())
+
+# Odd multiplier used to scatter popularity ranks over ids (see `_zipf_pick`)
+SCATTER = 2654435761
+
+def generate_users(seed: int, start: int, count: int, password_hash: str) -> Dict[str, List[Tuple[Any, ...]]]:
+    """
+    Generates the users with ids `start` to `start + count - 1`.
+
+    Each chunk draws from its own random generator seeded with `seed` and `start`,
+    so the output is identical whatever the chunk is generated by.
+
+    Returns:
+        Dict[str, List[Tuple[Any, ...]]]: The rows of the "users" table, in `COLUMNS` order.
+    """
+    rng = random.Random(f"{seed}:users:{start}")
+    rows = []
+    for user_id in range(start, start + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        username = f"{first.lower()}.{last.lower()}{user_id}"
+        created_at = EPOCH - timedelta(seconds=rng.randrange(5 * 365 * 86400))
+        updated_at = min(EPOCH, created_at + timedelta(seconds=int(rng.expovariate(1 / (90 * 86400)))))
+        rows.append((user_id, username, f"{username}@example.com", password_hash, created_at, updated_at))
+    return {"users": rows}
+
+def generate_books(seed: int, start: int, count: int, book_count: int, user_count: int, borrowed_ratio: float) -> Dict[str, List[Tuple[Any, ...]]]:
+    """
+    Generates the books with ids `start` to `start + count - 1`, with their
+    holdings and open loans.
+
+    Authors follow a Zipf-like distribution, so a few authors write many books.
+    Most books have a single copy and a few have several; about `borrowed_ratio`
+    of the copies are lent out to borrowers drawn from the same kind of
+    distribution: most users hold one or two books while a handful of heavy
+    readers hold hundreds. Every lent copy has an open loan, and a book is
+    available as long as one of its copies is.
+
+    Returns:
+        Dict[str, List[Tuple[Any, ...]]]: The rows of the "books", "book_holdings"
+        and "loans" tables, in `COLUMNS` order.
+    """
+    rng = random.Random(f"{seed}:books:{start}")
+    author_count = max(100, book_count // 20)
+    books, holdings, loans = [], [], []
+    for book_id in range(start, start + count):
+        title = " ".join(rng.sample(TITLE_WORDS, rng.randint(1, 4)))
+        author_id = _zipf_pick(rng, author_count)
+        author = f"{FIRST_NAMES[author_id % len(FIRST_NAMES)]} {LAST_NAMES[author_id // len(FIRST_NAMES) % len(LAST_NAMES)]}"
+        isbn = _isbn13(book_id)
+        genre = rng.choices(GENRE_NAMES, GENRE_WEIGHTS)[0]
+        description = " ".join(rng.choices(DESCRIPTION_WORDS, k=rng.randint(8, 40))).capitalize() + "."
+        # Recent books are more common than old ones
+        year = max(1450, EPOCH.year - int(rng.expovariate(1 / 25)))
+        publication_date = date(year, 1, 1) + timedelta(days=rng.randrange(365))
+        copies = 1 + int(rng.expovariate(1.5))
+        borrowers = set()
+        if user_count:
+            for _ in range(copies):
+                if rng.random() < borrowed_ratio:
+                    borrowers.add(_zipf_pick(rng, user_count) + 1)
+        available = copies - len(borrowers)
+        books.append((
+            book_id, title, author, isbn, genre, description, publication_date,
+            f"https://covers.example.com/{isbn}.jpg", available > 0,
+        ))
+        holdings.append((book_id, copies, available, 0, 0))
+        for user_id in sorted(borrowers):
+            loans.append((book_id, user_id, EPOCH - timedelta(seconds=rng.randrange(21 * 86400))))
+    return {"books": books, "book_holdings": holdings, "loans": loans}
+
+def _zipf_pick(rng: random.Random, n: int) -> int:
+    # A log-uniform rank approximates Zipf's law with exponent 1; scattering the
+    # rank keeps the most popular values from all being the lowest ids
+    rank = int(n ** rng.random()) - 1
+    return rank * SCATTER % n
+
+def _isbn13(book_id: int) -> str:
+    digits = f"978{book_id:09d}"
+    check = -sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(digits)) % 10
+    return f"{digits}{check}"
+
+async def load_rows(tables: Dict[str, List[Tuple[Any, ...]]]) -> None:
+    """
+    Bulk loads generated rows in one transaction, table by table in the given
+    order, with COPY on Postgres and an executemany insert elsewhere.
+    """
+    async with SessionLocal() as db:
+        for table, rows in tables.items():
+            if not rows:
+                continue
+            if db.bind.dialect.name == "postgresql":
+                connection = await (await db.connection()).get_raw_connection()
+                await connection.driver_connection.copy_records_to_table(table, records=rows, columns=COLUMNS[table])
+            else:
+                await db.execute(insert(MODELS[table]), [dict(zip(COLUMNS[table], row)) for row in rows])
+        await db.commit()
+
+async def generate_and_load(
+    executor: ProcessPoolExecutor,
+    generate: Callable[[int, int], Dict[str, List[Tuple[Any, ...]]]],
+    total: int,
+    chunk_size: int,
+    window: int,
+) -> None:
+    """
+    Generates `total` rows in chunks across the process pool and loads them in id order.
+
+    `generate` is called with the first id and the size of each chunk, and returns
+    the rows of each table the chunk fills.
+
+    At most `window` chunks are generated ahead of the loader, which bounds memory
+    use while keeping every worker busy.
+    """
+    loop = asyncio.get_running_loop()
+    starts = deque(range(1, total + 1, chunk_size))
+    pending = deque()
+    while starts or pending:
+        while starts and len(pending) < window:
+            start = starts.popleft()
+            count = min(chunk_size, total + 1 - start)
+            pending.append(loop.run_in_executor(executor, generate, start, count))
+        await load_rows(await pending.popleft())
+
+async def reset_sequences() -> None:
+    """
+    Moves the Postgres id sequences past the explicitly inserted ids.
+    """
+    async with SessionLocal() as db:
+        if db.bind.dialect.name != "postgresql":
+            return
+        for table in ("users", "books"):
+            await db.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}"
+            ))
+        await db.commit()
+
+async def seed(users: int, books: int, seed: int, workers: int, chunk_size: int, borrowed_ratio: float, password: Optional[str]) -> None:
+    """
+    Seeds an empty database with `users` users and `books` books, with the
+    holdings and loans of the books.
+
+    Generation is deterministic: the same arguments always produce the same rows,
+    whatever the number of workers. When `password` is given, every user shares a
+    single hash of it, since hashing millions of passwords would dominate the run.
+    """
+    await initialize_database()
+    password_hash = await get_password_hash(password) if password else UNUSABLE_PASSWORD_HASH
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        started = time.perf_counter()
+        generate = partial(generate_users, seed, password_hash=password_hash)
+        await generate_and_load(executor, generate, users, chunk_size, workers * 2)
+        print(f"Loaded {users} users in {time.perf_counter() - started:.1f}s")
+        started = time.perf_counter()
+        generate = partial(generate_books, seed, book_count=books, user_count=users, borrowed_ratio=borrowed_ratio)
+        await generate_and_load(executor, generate, books, chunk_size, workers * 2)
+        print(f"Loaded {books} books in {time.perf_counter() - started:.1f}s")
+    await reset_sequences()
 
 if __name__ == "__main__":
-    with get_db() as db:
-        seed_users(db)
-        seed_books(db)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Seed the database with deterministic synthetic users and books.")
+    parser.add_argument("--users", type=int, default=10_000, help="Number of users to generate")
+    parser.add_argument("--books", type=int, default=100_000, help="Number of books to generate")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed; the same seed always yields the same data")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Generator processes")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="Rows generated and loaded per chunk")
+    parser.add_argument("--borrowed-ratio", type=float, default=0.2, help="Fraction of copies that are lent out")
+    parser.add_argument("--password", help="Password given to every user (default: users cannot log in)")
+    args = parser.parse_args()
+    asyncio.run(seed(args.users, args.books, args.seed, args.workers, args.chunk_size, args.borrowed_ratio, args.password))
@@ -1,67 +1,203 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import io
+from typing import Optional
 
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from infrastructure.compression import payload_response
 from infrastructure.database.db_session import get_db
+from infrastructure.timing import TimedRoute
 from api.v1.services.books_service import books_service
-from api.v1.schemas.book import Book, BookCreate, BookResponse
+from api.v1.services import book_import_service, holds_service
+from api.v1.schemas.book import Book, BookBatchRequest, BookBatchResponse, BookCreate, BookFacets, BookFilter, BookImportReport, BookResponse
+from api.v1.schemas.change import ChangePage
+from api.v1.schemas.hold import HoldResponse
 
 # Import the necessary dependencies for the controller
 from infrastructure.config import settings
 from utils.auth import get_current_user
+from utils.etags import book_etag, conditional_response, page_etag
+from utils.pagination import page_size, set_next_cursor
+from utils.serialization import rows_response
 
 # Import the necessary dependencies for the controller
-from api.v1.schemas.auth import Token, User, UserResponse
+from api.v1.schemas.auth import CurrentUser, Token, User, UserResponse
 
 # Define the router for the books controller
-books_router = APIRouter()
+books_router = APIRouter(route_class=TimedRoute)
 
 # Define the function to create a new book
 @books_router.post("/", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
-async def create_book(book: BookCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_book(book: BookCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Creates a new book in the library catalog."""
     # Call the create_book function from the books service
     new_book = await books_service.create_book(db, book)
     return new_book
 
+# Define the function to bulk import books
+@books_router.post("/import", response_model=BookImportReport)
+async def import_books(
+    file: UploadFile = File(..., description="A CSV file with a header row, or an NDJSON file, of books"),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="The file format, guessed from the file name when omitted"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Inserts or updates (by ISBN) every book in the uploaded file and reports the rejected records."""
+    if format is None:
+        format = "csv" if (file.filename or "").lower().endswith(".csv") else "ndjson"
+    # Records are parsed lazily from the spooled upload, one batch at a time
+    lines = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    records = book_import_service.read_records(lines, format)
+    return await book_import_service.import_books(db, records)
+
 # Define the function to get all books
 @books_router.get("/", response_model=list[BookResponse])
-async def get_books(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Retrieves a list of all books in the library catalog."""
+async def get_books(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of books to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    sort: str = Query("id", pattern="^(id|title)$", description="Ordering of the listing"),
+    filters: BookFilter = Depends(),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Retrieves one page of the books in the library catalog that match the filters."""
     # Call the get_books function from the books service
-    books = await books_service.get_books(db)
+    books, next_cursor = await books_service.get_books(db, page_size(limit), cursor, sort, filters)
+    # Answer 304 Not Modified if the client already has this exact page
+    not_modified = conditional_response(request, response, page_etag(map(book_etag, books), next_cursor))
+    if not_modified:
+        return not_modified
+    # Expose the cursor for the next page, if there is one
+    set_next_cursor(response, next_cursor)
+    # Encode the rows directly, skipping per-row models and response validation
+    return rows_response(books, response.headers)
+
+# Define the function to count the catalog per facet
+@books_router.get("/facets", response_model=BookFacets)
+async def get_book_facets(request: Request, filters: BookFilter = Depends(), db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Counts the books matching the filters per genre, availability and publication decade."""
+    # Serve the cached counts as stored, possibly precompressed
+    return payload_response(request, await books_service.get_book_facets_payload(db, filters))
+
+# Define the function to search the catalog
+@books_router.get("/search", response_model=list[BookResponse])
+async def search_books(
+    response: Response,
+    q: str = Query(..., min_length=1, description="Words to look for in the title, author, genre and description"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of books to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Searches the library catalog, best matches first."""
+    # Call the search_books function from the books service
+    books, next_cursor = await books_service.search_books(db, q, page_size(limit), cursor)
+    set_next_cursor(response, next_cursor)
     return books
 
+# Define the function to export the whole catalog
+@books_router.get("/export", response_class=StreamingResponse)
+async def export_books(current_user: User = Depends(get_current_user)):
+    """Streams every book in the library catalog as newline-delimited JSON."""
+    # The service generator reads the catalog in batches while the response is being sent
+    return StreamingResponse(books_service.export_books(), media_type="application/x-ndjson")
+
+# Define the function to follow the changes to the catalog
+@books_router.get("/changes", response_model=ChangePage)
+async def get_book_changes(
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page of changes; omit to read the feed from the start"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of changes to return"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Retrieves the books created, updated or deleted since the cursor, oldest first."""
+    # Call the get_book_changes function from the books service
+    return await books_service.get_book_changes(db, cursor, page_size(limit))
+
+# Define the function to look up many books at once
+@books_router.post("/batch", response_model=BookBatchResponse)
+async def get_books_batch(batch: BookBatchRequest, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Retrieves many books by ID and by ISBN, in request order, marking the ones that do not exist."""
+    # Call the get_books_batch function from the books service
+    return await books_service.get_books_batch(db, batch)
+
 # Define the function to get a specific book by ID
 @books_router.get("/{book_id}", response_model=BookResponse)
-async def get_book(book_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Retrieves details for a specific book by its ID."""
-    # Call the get_book function from the books service
-    book = await books_service.get_book(db, book_id)
+async def get_book(book_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Retrieves details for a specific book by its ID, or answers 304 Not Modified if the client's copy is current."""
+    # Call the get_book_payload function from the books service
+    book, payload = await books_service.get_book_payload(db, book_id)
     # If the book is not found, raise a 404 Not Found exception
     if not book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Book with ID {book_id} not found",
         )
-    return book
+    # Answer 304 Not Modified without serializing the book if the client has it
+    not_modified = conditional_response(request, response, book_etag(book))
+    if not_modified:
+        return not_modified
+    # Serve the cached encoding as stored, possibly precompressed
+    return payload_response(request, payload, response.headers)
+
+# Define the function to borrow a specific book by ID
+@books_router.post("/{book_id}/borrow", response_model=BookResponse)
+async def borrow_book(book_id: int, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
+    """Lends a specific book to the current user, or answers 409 Conflict if it is already borrowed."""
+    return await books_service.borrow_book(db, book_id, current_user)
+
+# Define the function to return a specific book by ID
+@books_router.post("/{book_id}/return", response_model=BookResponse)
+async def return_book(book_id: int, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
+    """Returns a specific book borrowed by the current user, or answers 409 Conflict if they do not hold it."""
+    return await books_service.return_book(db, book_id, current_user)
+
+# Define the function to place a hold on a specific book by ID
+@books_router.post("/{book_id}/holds", response_model=HoldResponse, status_code=status.HTTP_201_CREATED)
+async def place_hold(book_id: int, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
+    """Queues the current user for the next copy of a book that has none available."""
+    return await holds_service.place_hold(db, book_id, current_user)
+
+# Define the function to get the current user's hold on a specific book by ID
+@books_router.get("/{book_id}/holds/me", response_model=HoldResponse)
+async def get_hold(book_id: int, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
+    """Retrieves the current user's hold on a book and their position in the queue."""
+    return await holds_service.get_hold(db, book_id, current_user)
+
+# Define the function to cancel the current user's hold on a specific book by ID
+@books_router.delete("/{book_id}/holds/me", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_hold(book_id: int, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
+    """Cancels the current user's hold on a book."""
+    await holds_service.cancel_hold(db, book_id, current_user)
 
 # Define the function to update a specific book by ID
 @books_router.put("/{book_id}", response_model=BookResponse)
-async def update_book(book_id: int, book: Book, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def update_book(
+    book_id: int,
+    book: Book,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="ETag of the version being updated; the update fails with 412 if the book has changed since"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
     """Updates the details of a specific book by its ID."""
     # Call the update_book function from the books service
-    updated_book = await books_service.update_book(db, book_id, book)
+    updated_book = await books_service.update_book(db, book_id, book, if_match)
     # If the book is not found, raise a 404 Not Found exception
     if not updated_book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Book with ID {book_id} not found",
         )
+    response.headers["ETag"] = book_etag(updated_book)
     return updated_book
 
 # Define the function to delete a specific book by ID
 @books_router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_book(book_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_book(book_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     """Deletes a specific book from the library catalog."""
     # Call the delete_book function from the books service
     await books_service.delete_book(db, book_id)
\ No newline at end of file
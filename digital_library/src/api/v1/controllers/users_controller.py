@@ -1,47 +1,83 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from infrastructure.database.db_session import get_db
+from infrastructure.timing import TimedRoute
 from api.v1.services.users_service import users_service
+from api.v1.schemas.change import ChangePage
 from api.v1.schemas.user import User, UserCreate, UserResponse
+from utils.etags import conditional_response, page_etag, user_etag
+from utils.pagination import page_size, set_next_cursor
+from utils.serialization import rows_response
 
-users_router = APIRouter()
+users_router = APIRouter(route_class=TimedRoute)
 
 @users_router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """Creates a new user account in the library system."""
     new_user = await users_service.create_user(db, user)
     return new_user
 
 @users_router.get("/", response_model=list[UserResponse])
-async def get_users(db: Session = Depends(get_db)):
-    """Retrieves a list of all users in the library system."""
-    users = await users_service.get_users(db)
-    return users
+async def get_users(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of users to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Retrieves one page of users in the library system."""
+    users, next_cursor = await users_service.get_users(db, page_size(limit), cursor)
+    not_modified = conditional_response(request, response, page_etag(map(user_etag, users), next_cursor))
+    if not_modified:
+        return not_modified
+    set_next_cursor(response, next_cursor)
+    return rows_response(users, response.headers)
+
+@users_router.get("/changes", response_model=ChangePage)
+async def get_user_changes(
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page of changes; omit to read the feed from the start"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of changes to return"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Retrieves the users created, updated or deleted since the cursor, oldest first."""
+    return await users_service.get_user_changes(db, cursor, page_size(limit))
 
 @users_router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int, db: Session = Depends(get_db)):
-    """Retrieves details of a specific user by ID."""
+async def get_user(user_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """Retrieves details of a specific user by ID, or answers 304 Not Modified if the client's copy is current."""
     user = await users_service.get_user(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with ID {user_id} not found",
         )
+    not_modified = conditional_response(request, response, user_etag(user))
+    if not_modified:
+        return not_modified
     return user
 
 @users_router.put("/{user_id}", response_model=UserResponse)
-async def update_user(user_id: int, user: User, db: Session = Depends(get_db)):
+async def update_user(
+    user_id: int,
+    user: User,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="ETag of the version being updated; the update fails with 412 if the user has changed since"),
+    db: AsyncSession = Depends(get_db),
+):
     """Updates the details of a specific user by ID."""
-    updated_user = await users_service.update_user(db, user_id, user)
+    updated_user = await users_service.update_user(db, user_id, user, if_match)
     if not updated_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with ID {user_id} not found",
         )
+    response.headers["ETag"] = user_etag(updated_user)
     return updated_user
 
 @users_router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_user(user_id: int, db: Session = Depends(get_db)):
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
     """Deletes a specific user account by ID."""
     await users_service.delete_user(db, user_id)
\ No newline at end of file
@@ -1,23 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from infrastructure.database.db_session import get_db
+from infrastructure.timing import TimedRoute
 from api.v1.controllers.books_controller import books_controller
-from api.v1.schemas.book import Book, BookCreate, BookResponse
+from api.v1.schemas.book import Book, BookBatchRequest, BookBatchResponse, BookCreate, BookFacets, BookFilter, BookImportReport, BookResponse
+from api.v1.schemas.change import ChangePage
+from api.v1.schemas.hold import HoldResponse
 
-books_router = APIRouter()
+books_router = APIRouter(route_class=TimedRoute)
 
 @books_router.post("/", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
-async def create_book(book: BookCreate, db: Session = Depends(get_db)):
+async def create_book(book: BookCreate, db: AsyncSession = Depends(get_db)):
     return books_controller.create_book(db, book)
 
+@books_router.post("/import", response_model=BookImportReport)
+async def import_books(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    return books_controller.import_books(file, format, db)
+
 @books_router.get("/", response_model=list[BookResponse])
-async def get_books(db: Session = Depends(get_db)):
-    return books_controller.get_books(db)
+async def get_books(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    sort: str = Query("id", pattern="^(id|title)$"),
+    filters: BookFilter = Depends(),
+    db: AsyncSession = Depends(get_db),
+):
+    return books_controller.get_books(request, response, limit, cursor, sort, filters, db)
+
+@books_router.get("/facets", response_model=BookFacets)
+async def get_book_facets(request: Request, filters: BookFilter = Depends(), db: AsyncSession = Depends(get_db)):
+    return books_controller.get_book_facets(request, filters, db)
+
+@books_router.get("/search", response_model=list[BookResponse])
+async def search_books(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    return books_controller.search_books(response, q, limit, cursor, db)
+
+@books_router.get("/export", response_class=StreamingResponse)
+async def export_books():
+    return books_controller.export_books()
+
+@books_router.get("/changes", response_model=ChangePage)
+async def get_book_changes(cursor: Optional[str] = None, limit: Optional[int] = Query(None, ge=1), db: AsyncSession = Depends(get_db)):
+    return books_controller.get_book_changes(cursor, limit, db)
+
+@books_router.post("/batch", response_model=BookBatchResponse)
+async def get_books_batch(batch: BookBatchRequest, db: AsyncSession = Depends(get_db)):
+    return books_controller.get_books_batch(batch, db)
 
 @books_router.get("/{book_id}", response_model=BookResponse)
-async def get_book(book_id: int, db: Session = Depends(get_db)):
-    book = books_controller.get_book(db, book_id)
+async def get_book(book_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    book = books_controller.get_book(book_id, request, response, db)
     if not book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -25,10 +73,30 @@ async def get_book(book_id: int, db: Session = Depends(get_db)):
         )
     return book
 
+@books_router.post("/{book_id}/borrow", response_model=BookResponse)
+async def borrow_book(book_id: int, db: AsyncSession = Depends(get_db)):
+    return books_controller.borrow_book(book_id, db)
+
+@books_router.post("/{book_id}/return", response_model=BookResponse)
+async def return_book(book_id: int, db: AsyncSession = Depends(get_db)):
+    return books_controller.return_book(book_id, db)
+
+@books_router.post("/{book_id}/holds", response_model=HoldResponse, status_code=status.HTTP_201_CREATED)
+async def place_hold(book_id: int, db: AsyncSession = Depends(get_db)):
+    return books_controller.place_hold(book_id, db)
+
+@books_router.get("/{book_id}/holds/me", response_model=HoldResponse)
+async def get_hold(book_id: int, db: AsyncSession = Depends(get_db)):
+    return books_controller.get_hold(book_id, db)
+
+@books_router.delete("/{book_id}/holds/me", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_hold(book_id: int, db: AsyncSession = Depends(get_db)):
+    books_controller.cancel_hold(book_id, db)
+
 @books_router.put("/{book_id}", response_model=BookResponse)
-async def update_book(book_id: int, book: Book, db: Session = Depends(get_db)):
-    return books_controller.update_book(db, book_id, book)
+async def update_book(book_id: int, book: Book, response: Response, if_match: Optional[str] = Header(None), db: AsyncSession = Depends(get_db)):
+    return books_controller.update_book(book_id, book, response, if_match, db)
 
 @books_router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_book(book_id: int, db: Session = Depends(get_db)):
+async def delete_book(book_id: int, db: AsyncSession = Depends(get_db)):
     books_controller.delete_book(db, book_id)
\ No newline at end of file
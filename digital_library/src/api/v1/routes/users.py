@@ -1,23 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from infrastructure.database.db_session import get_db
+from infrastructure.timing import TimedRoute
 from api.v1.controllers.users_controller import users_controller
+from api.v1.schemas.change import ChangePage
 from api.v1.schemas.user import User, UserCreate, UserResponse
 
-users_router = APIRouter()
+users_router = APIRouter(route_class=TimedRoute)
 
 @users_router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     return users_controller.create_user(db, user)
 
 @users_router.get("/", response_model=list[UserResponse])
-async def get_users(db: Session = Depends(get_db)):
-    return users_controller.get_users(db)
+async def get_users(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    return users_controller.get_users(request, response, limit, cursor, db)
+
+@users_router.get("/changes", response_model=ChangePage)
+async def get_user_changes(cursor: Optional[str] = None, limit: Optional[int] = Query(None, ge=1), db: AsyncSession = Depends(get_db)):
+    return users_controller.get_user_changes(cursor, limit, db)
 
 @users_router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int, db: Session = Depends(get_db)):
-    user = users_controller.get_user(db, user_id)
+async def get_user(user_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    user = users_controller.get_user(user_id, request, response, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -26,9 +40,9 @@ async def get_user(user_id: int, db: Session = Depends(get_db)):
     return user
 
 @users_router.put("/{user_id}", response_model=UserResponse)
-async def update_user(user_id: int, user: User, db: Session = Depends(get_db)):
-    return users_controller.update_user(db, user_id, user)
+async def update_user(user_id: int, user: User, response: Response, if_match: Optional[str] = Header(None), db: AsyncSession = Depends(get_db)):
+    return users_controller.update_user(user_id, user, response, if_match, db)
 
 @users_router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_user(user_id: int, db: Session = Depends(get_db)):
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
     users_controller.delete_user(db, user_id)
\ No newline at end of file
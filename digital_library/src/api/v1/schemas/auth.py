@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import Optional
 
 class Token(BaseModel):
     access_token: str = Field(..., description="The access token for authenticating requests.")
@@ -14,4 +15,9 @@ class UserResponse(BaseModel):
     id: int = Field(..., description="The ID of the user.")
     username: str = Field(..., description="The username of the user.")
     created_at: datetime = Field(..., description="The date and time the user was created.")
-    updated_at: datetime = Field(..., description="The date and time the user was last updated.")
\ No newline at end of file
+    updated_at: datetime = Field(..., description="The date and time the user was last updated.")
+
+class CurrentUser(BaseModel):
+    username: str = Field(..., description="The username the access token was issued to.")
+    expires_at: datetime = Field(..., description="The date and time the access token expires.")
+    token_family: Optional[str] = Field(None, description="The ID shared by the tokens issued from the same login.")
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, root_validator
+from typing import List, Optional
 from datetime import date
 
 class BookBase(BaseModel):
@@ -12,13 +12,73 @@ class BookBase(BaseModel):
     cover_image: Optional[str] = Field(None, description="URL to the cover image of the book")
 
 class BookCreate(BookBase):
-    pass
+    copies: int = Field(1, ge=1, description="Number of copies of the book held by the library")
 
 class BookResponse(BookBase):
     id: int = Field(..., description="ID of the book")
     is_available: bool = Field(..., description="Indicates whether the book is currently available for borrowing")
     borrower_id: Optional[int] = Field(None, description="ID of the user who has borrowed the book, if any")
+    total_copies: int = Field(1, description="Number of copies of the book held by the library")
+    available_copies: int = Field(1, description="Number of copies currently available for borrowing")
+    version: int = Field(1, description="Version of the book record, incremented on every update")
+
+    class Config:
+        orm_mode = True
 
 class BookUpdate(BookBase):
     is_available: Optional[bool] = Field(None, description="Whether the book is available for borrowing (can be used to change the availability status)")
-    borrower_id: Optional[int] = Field(None, description="ID of the user who has borrowed the book (can be used to change the borrower)")
\ No newline at end of file
+    borrower_id: Optional[int] = Field(None, description="ID of the user who has borrowed the book (can be used to change the borrower)")
+
+class BookFilter(BaseModel):
+    genre: Optional[str] = Field(None, description="Only include books of this genre")
+    author: Optional[str] = Field(None, description="Only include books by this author")
+    is_available: Optional[bool] = Field(None, description="Only include books that are (or are not) available for borrowing")
+    published_from: Optional[int] = Field(None, ge=1, le=9998, description="Only include books published in or after this year")
+    published_to: Optional[int] = Field(None, ge=1, le=9998, description="Only include books published in or before this year")
+
+class FacetCount(BaseModel):
+    value: str = Field(..., description="The facet value")
+    count: int = Field(..., description="The number of matching books with this value")
+
+class DecadeCount(BaseModel):
+    decade: int = Field(..., description="The first year of the decade, e.g. 1980")
+    count: int = Field(..., description="The number of matching books published in this decade")
+
+class AvailabilityCounts(BaseModel):
+    available: int = Field(0, description="The number of matching books available for borrowing")
+    unavailable: int = Field(0, description="The number of matching books currently borrowed")
+
+class BookFacets(BaseModel):
+    total: int = Field(..., description="The number of books matching the filters")
+    genres: List[FacetCount] = Field(..., description="Matching books per genre, most common first")
+    availability: AvailabilityCounts = Field(..., description="Matching books per availability")
+    decades: List[DecadeCount] = Field(..., description="Matching books per publication decade, oldest first")
+
+class BookImportError(BaseModel):
+    row: int = Field(..., description="The 1-based position of the record in the uploaded file")
+    message: str = Field(..., description="Why the record was rejected")
+
+class BookImportReport(BaseModel):
+    received: int = Field(0, description="The number of records read from the file")
+    imported: int = Field(0, description="The number of books inserted or updated")
+    failed: int = Field(0, description="The number of records rejected")
+    errors: List[BookImportError] = Field(default_factory=list, description="The rejected records, up to the configured limit")
+
+class BookBatchRequest(BaseModel):
+    ids: List[int] = Field(default_factory=list, description="IDs of the books to look up")
+    isbns: List[str] = Field(default_factory=list, description="ISBN numbers of the books to look up")
+
+    @root_validator(skip_on_failure=True)
+    def check_not_empty(cls, values):
+        if not values["ids"] and not values["isbns"]:
+            raise ValueError("Give at least one book ID or ISBN")
+        return values
+
+class BookBatchItem(BaseModel):
+    id: Optional[int] = Field(None, description="The requested ID, for lookups by ID")
+    isbn: Optional[str] = Field(None, description="The requested ISBN, for lookups by ISBN")
+    found: bool = Field(..., description="Whether a book matches the requested ID or ISBN")
+    book: Optional[BookResponse] = Field(None, description="The matching book, or null if none was found")
+
+class BookBatchResponse(BaseModel):
+    items: List[BookBatchItem] = Field(..., description="One result per requested ID, then per requested ISBN, in request order")
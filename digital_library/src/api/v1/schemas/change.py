@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import List
+from datetime import datetime
+
+class ChangeResponse(BaseModel):
+    id: int = Field(..., description="ID of the change")
+    entity_id: int = Field(..., description="ID of the changed book or user")
+    op: str = Field(..., description="Either \"upsert\" when the entity was created or changed, or \"delete\" when it was deleted")
+    changed_at: datetime = Field(..., description="Date and time of the change")
+
+class ChangePage(BaseModel):
+    changes: List[ChangeResponse] = Field(..., description="The changes after the cursor, in commit order")
+    cursor: str = Field(..., description="Cursor to pass back to read the changes after this page, even when it is empty")
+    has_more: bool = Field(..., description="Whether more changes are already available after this page")
\ No newline at end of file
@@ -0,0 +1,12 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+
+class HoldResponse(BaseModel):
+    id: int = Field(..., description="ID of the hold")
+    book_id: int = Field(..., description="ID of the book the hold is placed on")
+    status: str = Field(..., description="Either \"waiting\" in the queue or \"ready\" when a copy is set aside for the patron")
+    position: int = Field(..., description="Number of holds served before this one, counting it (0 once the hold is ready)")
+    created_at: datetime = Field(..., description="Date and time the hold was placed")
+    ready_at: Optional[datetime] = Field(None, description="Date and time a copy was set aside for the hold")
+    ready_until: Optional[datetime] = Field(None, description="Date and time the hold expires unless the set-aside copy is borrowed")
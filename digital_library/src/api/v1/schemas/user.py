@@ -5,12 +5,14 @@ from datetime import datetime
 class UserBase(BaseModel):
     username: str = Field(..., description="The username of the user.")
     email: str = Field(..., description="The email address of the user.")
-    password: str = Field(..., description="The password of the user.")
 
 class UserCreate(UserBase):
-    pass
+    password: str = Field(..., description="The password of the user.")
 
 class UserResponse(UserBase):
     id: int = Field(..., description="The ID of the user.")
     created_at: datetime = Field(..., description="The date and time the user was created.")
-    updated_at: datetime = Field(..., description="The date and time the user was last updated.")
\ No newline at end of file
+    updated_at: datetime = Field(..., description="The date and time the user was last updated.")
+
+    class Config:
+        orm_mode = True
@@ -1,69 +1,82 @@
+import time
+from typing import Dict
+
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from infrastructure.config import settings
 from infrastructure.database.db_session import get_db
-from utils.auth import create_access_token, create_refresh_token, verify_password, get_current_user
-from api.v1.schemas.auth import Token, User, UserResponse
+from infrastructure.token_store import get_token_store
+from utils.auth import (
+    LOGINS,
+    create_token_pair,
+    credentials_exception,
+    decode_token,
+    dummy_password_hash,
+    get_password_hash,
+    password_needs_rehash,
+    token_family_ttl,
+    verify_password,
+)
+from api.v1.schemas.auth import CurrentUser, Token, User, UserResponse
+from api.v1.services import changes_service
 
 from infrastructure.database.models import User
 
-def authenticate_user(db: Session, username: str, password: str) -> User:
-    user = db.query(User).filter(User.username == username).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    if not verify_password(password, user.hashed_password):
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> User:
+    user = await db.scalar(select(User).where(User.username == username))
+    # Unknown usernames are checked against a dummy hash, so that they take as long
+    # to reject as wrong passwords and cannot be told apart by the response time
+    hashed_password = user.hashed_password if user else dummy_password_hash()
+    if not await verify_password(password, hashed_password) or not user:
+        LOGINS.inc("failure")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    # The plain password is only known now, so outdated hashes are upgraded on login
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = await get_password_hash(password)
+        await db.commit()
+    LOGINS.inc("success")
     return user
 
-def create_access_token(data: dict = None) -> str:
-    return create_access_token(data)
-
-def create_refresh_token(data: dict = None) -> str:
-    return create_refresh_token(data)
-
-def signup_user(db: Session, user: User) -> UserResponse:
-    hashed_password = get_password_hash(user.password)
+async def signup_user(db: AsyncSession, user: User) -> UserResponse:
+    hashed_password = await get_password_hash(user.password)
     db_user = User(username=user.username, hashed_password=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.flush()
+    changes_service.record_change(db, "user", db_user.id)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    token = verify_password(token, SECRET_KEY)
-    if not token:
-        raise credentials_exception
-    return token
+async def refresh_token(token: str) -> Dict[str, str]:
+    """
+    Exchanges a refresh token for a new access and refresh token pair.
 
-def refresh_token(token: str) -> str:
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if not username:
-            raise credentials_exception
-        user = db.query(User).filter(User.username == username).first()
-        if not user:
-            raise credentials_exception
-        access_token = create_access_token(data={"sub": user.username})
-        return access_token
-    except jwt.exceptions.JWTError as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        ) from e
\ No newline at end of file
+    Refresh tokens are single use: the first refresh claims the token's `jti` in
+    the token store, and presenting it again is treated as theft, so the whole
+    token family is revoked and both parties have to log in again. Only the
+    token store is consulted, never the users table.
+    """
+    claims = decode_token(token)
+    if claims.get("type") != "refresh" or "fam" not in claims:
+        raise credentials_exception()
+    store = get_token_store()
+    if await store.is_revoked(claims["fam"]):
+        raise credentials_exception()
+    if not await store.claim(claims["jti"], int(claims["exp"] - time.time())):
+        await store.revoke(claims["fam"], token_family_ttl())
+        raise credentials_exception()
+    return create_token_pair(claims["sub"], family=claims["fam"])
+
+async def logout(current_user: CurrentUser) -> None:
+    """
+    Revokes every token issued from the login of `current_user`'s access token.
+    """
+    if current_user.token_family:
+        await get_token_store().revoke(current_user.token_family, token_family_ttl())
\ No newline at end of file
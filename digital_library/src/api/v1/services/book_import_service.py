@@ -0,0 +1,228 @@
+import csv
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from infrastructure.config import settings
+from infrastructure.cache import book_cache_key, get_cache
+from infrastructure.database.models import Book, Holding
+from api.v1.schemas.book import BookCreate, BookImportError, BookImportReport
+from api.v1.services import changes_service
+
+# Book columns written by an import; every other column keeps its default. The
+# number of copies is written to the book's holding in the same statement.
+IMPORT_COLUMNS = ["title", "author", "isbn", "genre", "description", "publication_date", "cover_image"]
+
+def read_records(lines: Iterable[str], format: str) -> Iterator[Tuple[int, Union[Dict[str, Any], str]]]:
+    """
+    Lazily parses an uploaded CSV or NDJSON file into raw records.
+
+    Args:
+        lines: The lines of the file.
+        format: Either "csv" (with a header row) or "ndjson".
+
+    Yields:
+        Tuple[int, Union[Dict[str, Any], str]]: The 1-based record number and the
+        parsed record, or an error message if the record could not be parsed.
+    """
+    if format == "csv":
+        for row, record in enumerate(csv.DictReader(lines), start=1):
+            # Empty CSV cells mean "no value" for the optional columns
+            yield row, {key: value for key, value in record.items() if value not in ("", None)}
+        return
+    row = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield row, "Expected a JSON object"
+            continue
+        yield row, record
+
+async def import_books(db: AsyncSession, records: Iterable[Tuple[int, Union[Dict[str, Any], str]]], batch_size: int = settings.IMPORT_BATCH_SIZE) -> BookImportReport:
+    """
+    Validates records against `BookCreate` and upserts them in batches keyed on `isbn`.
+
+    The holding of every book is upserted with it: an imported book gets its
+    `copies`, and a re-imported one keeps its lent copies out of the new count,
+    so its availability reflects the loans still open.
+
+    Every batch is committed on its own, so a bad record never aborts the whole
+    import: invalid records are reported and skipped, and if the database
+    rejects a batch it is retried one record at a time to find the culprits.
+    Postgres batches are loaded with COPY into a temporary table followed by a
+    single `INSERT ... ON CONFLICT`; other databases use an executemany upsert.
+    Records are read and validated in the threadpool, one batch at a time, and
+    the cache entries of a batch are invalidated together once it is committed.
+
+    Args:
+        db: The database session.
+        records: The raw records, as produced by `read_records`.
+        batch_size: The number of books written per statement.
+
+    Returns:
+        BookImportReport: The counts of received, imported and failed records,
+        with the reason each rejected record failed.
+    """
+    report = BookImportReport()
+    records = iter(records)
+    while True:
+        # Reading, parsing and validating are blocking and CPU bound, so each batch
+        # is prepared in the threadpool while the event loop keeps serving requests
+        batch = await run_in_threadpool(_read_batch, records, batch_size, report)
+        if not batch:
+            return report
+        await _flush(db, batch, report)
+
+def _read_batch(records: Iterator[Tuple[int, Union[Dict[str, Any], str]]], batch_size: int, report: BookImportReport) -> Dict[str, Tuple[int, Dict[str, Any]]]:
+    # Validates records until the batch is full or the records run out
+    batch: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+    for row, record in records:
+        report.received += 1
+        if isinstance(record, str):
+            _reject(report, row, record)
+            continue
+        try:
+            book = BookCreate.parse_obj(record)
+        except ValidationError as e:
+            _reject(report, row, _describe(e))
+            continue
+        # A later record for the same ISBN replaces an earlier one of the same batch,
+        # exactly as if both had been written in order
+        if book.isbn in batch:
+            report.imported += 1
+        batch[book.isbn] = (row, book.dict(include={*IMPORT_COLUMNS, "copies"}))
+        if len(batch) >= batch_size:
+            break
+    return batch
+
+async def _flush(db: AsyncSession, batch: Dict[str, Tuple[int, Dict[str, Any]]], report: BookImportReport) -> None:
+    rows = list(batch.values())
+    try:
+        updated_ids = await _upsert(db, [values for _, values in rows])
+        await db.commit()
+        report.imported += len(rows)
+    except SQLAlchemyError:
+        await db.rollback()
+        updated_ids = []
+        for row, values in rows:
+            try:
+                updated_ids += await _upsert_many(db, [values])
+                await db.commit()
+                report.imported += 1
+            except SQLAlchemyError as e:
+                await db.rollback()
+                _reject(report, row, str(getattr(e, "orig", e)))
+    await get_cache().delete_many([book_cache_key(book_id) for book_id in updated_ids])
+
+async def _upsert(db: AsyncSession, rows: List[Dict[str, Any]]) -> List[int]:
+    if db.bind.dialect.name == "postgresql":
+        return await _upsert_copy(db, rows)
+    return await _upsert_many(db, rows)
+
+async def _upsert_copy(db: AsyncSession, rows: List[Dict[str, Any]]) -> List[int]:
+    rows = await _with_availability(db, rows)
+    columns = ["copies", "available_copies", "is_available", *IMPORT_COLUMNS]
+    await db.execute(text(
+        "CREATE TEMP TABLE books_import (copies integer, available_copies integer, is_available boolean, "
+        "title text, author text, isbn text, genre text, description text, publication_date date, cover_image text) "
+        "ON COMMIT DROP"
+    ))
+    connection = await (await db.connection()).get_raw_connection()
+    await connection.driver_connection.copy_records_to_table(
+        "books_import",
+        records=[tuple(row[column] for column in columns) for row in rows],
+        columns=columns,
+    )
+    book_columns = ", ".join(IMPORT_COLUMNS)
+    updates = ", ".join(f"{column} = excluded.{column}" for column in IMPORT_COLUMNS if column != "isbn")
+    updates += ", is_available = excluded.is_available, version = books.version + 1"
+    # xmax is only set on rows that already existed, i.e. the ones whose cache entry is
+    # stale; every row, inserted or updated, gets its holding and is logged for the
+    # change feed
+    result = await db.execute(
+        text(
+            f"WITH upserted AS (INSERT INTO books ({book_columns}, is_available) "
+            f"SELECT {book_columns}, is_available FROM books_import "
+            f"ON CONFLICT (isbn) DO UPDATE SET {updates} RETURNING id, isbn, xmax <> 0 AS updated), "
+            "held AS (INSERT INTO book_holdings (book_id, total_copies, available_copies, hold_head, hold_tail) "
+            "SELECT upserted.id, books_import.copies, books_import.available_copies, 0, 0 "
+            "FROM upserted JOIN books_import ON books_import.isbn = upserted.isbn "
+            "ON CONFLICT (book_id) DO UPDATE SET total_copies = excluded.total_copies, "
+            "available_copies = excluded.available_copies), "
+            "logged AS (INSERT INTO changes (entity, entity_id, op, changed_at, txid) "
+            "SELECT 'book', id, 'upsert', :changed_at, pg_current_xact_id()::text::bigint FROM upserted) "
+            "SELECT id FROM upserted WHERE updated"
+        ),
+        {"changed_at": datetime.utcnow()},
+    )
+    return list(result.scalars())
+
+async def _upsert_many(db: AsyncSession, rows: List[Dict[str, Any]]) -> List[int]:
+    rows = await _with_availability(db, rows)
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    statement = insert(Book)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Book.isbn],
+        set_={
+            **{column: statement.excluded[column] for column in IMPORT_COLUMNS if column != "isbn"},
+            "is_available": statement.excluded.is_available,
+            "version": Book.version + 1,
+        },
+    ).returning(Book.isbn, Book.id)
+    book_ids = dict((await db.execute(
+        statement, [{**{column: row[column] for column in IMPORT_COLUMNS}, "is_available": row["is_available"]} for row in rows]
+    )).all())
+    statement = insert(Holding)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Holding.book_id],
+        set_={"total_copies": statement.excluded.total_copies, "available_copies": statement.excluded.available_copies},
+    )
+    await db.execute(statement, [
+        dict(book_id=book_ids[row["isbn"]], total_copies=row["copies"], available_copies=row["available_copies"], hold_head=0, hold_tail=0)
+        for row in rows
+    ])
+    await changes_service.record_changes(db, "book", book_ids.values())
+    return list(book_ids.values())
+
+async def _with_availability(db: AsyncSession, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Copies that are lent out, or set aside for a hold, stay so whatever the new
+    # count; the holdings are locked first, like borrowing and returning do, so
+    # that no copy is taken or returned until the batch commits
+    isbns = [row["isbn"] for row in rows]
+    lent = dict((await db.execute(
+        select(Book.isbn, Holding.total_copies - Holding.available_copies)
+        .join(Holding, Holding.book_id == Book.id)
+        .where(Book.isbn.in_(isbns))
+        .with_for_update(of=Holding)
+    )).all())
+    # Books created before holdings existed have a single copy, lent if unavailable
+    lent.update((isbn, 1) for isbn in await db.scalars(
+        select(Book.isbn).where(Book.isbn.in_(set(isbns) - set(lent)), Book.is_available.is_(False))
+    ))
+    prepared = []
+    for row in rows:
+        available = max(0, row["copies"] - lent.get(row["isbn"], 0))
+        prepared.append(dict(row, available_copies=available, is_available=available > 0))
+    return prepared
+
+def _reject(report: BookImportReport, row: int, message: str) -> None:
+    report.failed += 1
+    if len(report.errors) < settings.IMPORT_MAX_REPORTED_ERRORS:
+        report.errors.append(BookImportError(row=row, message=message))
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors())
@@ -1,68 +1,384 @@
-from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import Integer, cast, extract, func, or_, select, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.ext.asyncio import AsyncSession
 from infrastructure.config import settings
-from infrastructure.database.db_session import get_db
-from api.v1.schemas.book import Book, BookCreate, BookResponse
-from infrastructure.database.models import Book
+from infrastructure.database.db_session import SessionLocal, get_db
+from api.v1.schemas.book import (
+    AvailabilityCounts,
+    Book,
+    BookBatchItem,
+    BookBatchRequest,
+    BookBatchResponse,
+    BookCreate,
+    BookFacets,
+    BookFilter,
+    BookResponse,
+    DecadeCount,
+    FacetCount,
+)
+from infrastructure.database.models import Book, Holding, Loan
+from infrastructure.cache import book_cache_key, facets_cache_key, get_cache, pack_payload, unpack_payload
+from infrastructure.database.search import ranked_matches
+from api.v1.services import changes_service, holds_service, users_service
 
 from utils.auth import get_current_user
-from api.v1.schemas.auth import User
+from utils.etags import book_etag, require_if_match
+from utils.pagination import paginate, split_page
+from api.v1.schemas.auth import CurrentUser, User
+from api.v1.schemas.change import ChangePage
+
+# Keyset orderings supported by the book listing; each must end with a unique column
+SORT_COLUMNS = {
+    "id": (Book.id,),
+    "title": (Book.title, Book.id),
+}
+
+# The fields of BookResponse, in order, selected as plain columns for listing pages;
+# the copy counts default like Book.total_copies and Book.available_copies
+BOOK_RESPONSE_COLUMNS = (
+    Book.title,
+    Book.author,
+    Book.isbn,
+    Book.genre,
+    Book.description,
+    Book.publication_date,
+    Book.cover_image,
+    Book.id,
+    Book.is_available,
+    Book.borrower_id,
+    func.coalesce(Holding.total_copies, 1).label("total_copies"),
+    func.coalesce(Holding.available_copies, cast(Book.is_available, Integer)).label("available_copies"),
+    Book.version,
+)
+
+def apply_filters(query, filters: Optional[BookFilter]):
+    """
+    Restricts a select statement over books to the books matching `filters`.
+
+    Publication years are turned into date ranges so the filter can use the
+    index on `publication_date`.
+    """
+    if filters is None:
+        return query
+    if filters.genre is not None:
+        query = query.where(Book.genre == filters.genre)
+    if filters.author is not None:
+        query = query.where(Book.author == filters.author)
+    if filters.is_available is not None:
+        query = query.where(Book.is_available == filters.is_available)
+    if filters.published_from is not None:
+        query = query.where(Book.publication_date >= date(filters.published_from, 1, 1))
+    if filters.published_to is not None:
+        query = query.where(Book.publication_date < date(filters.published_to + 1, 1, 1))
+    return query
 
-async def create_book(db: Session, book: BookCreate, current_user: User = Depends(get_current_user)) -> BookResponse:
+async def create_book(db: AsyncSession, book: BookCreate, current_user: User = Depends(get_current_user)) -> BookResponse:
     """
     Creates a new book in the library catalog.
     """
-    db_book = Book(**book.dict())
+    db_book = Book(**book.dict(exclude={"copies"}))
+    db_book.holding = Holding(total_copies=book.copies, available_copies=book.copies)
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    await db.flush()
+    changes_service.record_change(db, "book", db_book.id)
+    await db.commit()
+    await db.refresh(db_book)
     return BookResponse.from_orm(db_book)
 
-async def get_books(db: Session, current_user: User = Depends(get_current_user)) -> list[BookResponse]:
+async def get_books(db: AsyncSession, limit: int, cursor: Optional[str] = None, sort: str = "id", filters: Optional[BookFilter] = None, current_user: User = Depends(get_current_user)) -> Tuple[Sequence[Any], Optional[str]]:
+    """
+    Retrieves one page of books from the library catalog using keyset pagination.
+
+    Books are ordered by `id`, or by `(title, id)` when `sort` is "title", and the
+    returned cursor points just after the last book of the page. Only books
+    matching `filters` are included.
+
+    Books are returned as rows of `BOOK_RESPONSE_COLUMNS` rather than as models,
+    ready to be encoded with `utils.serialization.rows_response`.
+    """
+    columns = SORT_COLUMNS[sort]
+    query = apply_filters(select(*BOOK_RESPONSE_COLUMNS).outerjoin(Holding, Holding.book_id == Book.id), filters)
+    books = (await db.execute(paginate(query, columns, cursor, limit))).all()
+    return split_page(books, limit, key=lambda book: [getattr(book, column.key) for column in columns])
+
+async def get_book_facets(db: AsyncSession, filters: BookFilter, current_user: User = Depends(get_current_user)) -> BookFacets:
+    """
+    Counts the books matching `filters` per genre, availability and publication decade.
+    """
+    return BookFacets.parse_raw(unpack_payload(await get_book_facets_payload(db, filters)))
+
+async def get_book_facets_payload(db: AsyncSession, filters: BookFilter, current_user: User = Depends(get_current_user)) -> bytes:
+    """
+    Counts the books matching `filters` per genre, availability and publication
+    decade, as a cache entry holding the encoded `BookFacets` (see `pack_payload`).
+
+    All three facets come from a single aggregate query grouped by the three
+    dimensions at once, which yields at most genres x 2 x decades rows that are
+    then summed per facet. Results are cached for `settings.FACETS_CACHE_TTL_SECONDS`,
+    so counts can lag behind writes by up to that long.
+    """
+    cache = get_cache()
+    cache_key = facets_cache_key(filters.json(sort_keys=True))
+    cached = await cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    decade = cast(extract("year", Book.publication_date), Integer) // 10 * 10
+    # Grouping by the label keeps Postgres from seeing two differently parameterized decade expressions
+    query = apply_filters(
+        select(Book.genre, Book.is_available, decade.label("decade"), func.count().label("count")),
+        filters,
+    ).group_by(Book.genre, Book.is_available, "decade")
+    genres, availability, decades = Counter(), Counter(), Counter()
+    for row in await db.execute(query):
+        genres[row.genre] += row.count
+        availability[row.is_available] += row.count
+        decades[row.decade] += row.count
+
+    facets = BookFacets(
+        total=sum(genres.values()),
+        genres=[FacetCount(value=genre, count=count) for genre, count in genres.most_common()],
+        availability=AvailabilityCounts(available=availability[True], unavailable=availability[False]),
+        decades=[DecadeCount(decade=decade, count=decades[decade]) for decade in sorted(decades)],
+    )
+    payload = pack_payload(facets.json().encode())
+    await cache.set(cache_key, payload, settings.FACETS_CACHE_TTL_SECONDS)
+    return payload
+
+async def search_books(db: AsyncSession, q: str, limit: int, cursor: Optional[str] = None, current_user: User = Depends(get_current_user)) -> Tuple[list[BookResponse], Optional[str]]:
+    """
+    Searches the title, author, genre and description of every book.
+
+    Results are ordered by relevance, best match first, and keyset paginated on
+    `(score, id)`. Postgres ranks matches of its `search_vector` column with
+    `ts_rank_cd`; SQLite uses bm25 over the `books_fts` FTS5 table.
+    """
+    matches = ranked_matches(db.bind.dialect.name, q)
+    columns = (matches.c.score, matches.c.id)
+    query = select(Book, matches.c.score).join(matches, Book.id == matches.c.id)
+    rows = (await db.execute(paginate(query, columns, cursor, limit))).all()
+    page, next_cursor = split_page(rows, limit, key=lambda row: [row.score, row.Book.id])
+    return [BookResponse.from_orm(row.Book) for row in page], next_cursor
+
+async def export_books(batch_size: int = settings.EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """
+    Streams the whole library catalog as NDJSON, one book per line.
+
+    Rows are read through a server-side cursor in batches of `batch_size`, and each
+    batch is emitted as soon as it is encoded, so memory use does not grow with the
+    size of the catalog. The generator owns its session because the response body is
+    produced after the request's `get_db` dependency has been closed.
+    """
+    async with SessionLocal() as db:
+        books = await db.stream_scalars(
+            select(Book).order_by(Book.id).execution_options(yield_per=batch_size)
+        )
+        async for batch in books.partitions():
+            yield "".join(BookResponse.from_orm(book).json() + "\n" for book in batch).encode()
+
+async def get_book_changes(db: AsyncSession, cursor: Optional[str], limit: int, current_user: User = Depends(get_current_user)) -> ChangePage:
     """
-    Retrieves a list of all books in the library catalog.
+    Retrieves the books created, updated, borrowed, returned or deleted after a
+    cursor, for consumers that keep a copy of the catalog in sync.
     """
-    books = db.query(Book).all()
-    return [BookResponse.from_orm(book) for book in books]
+    return await changes_service.get_changes(db, "book", cursor, limit)
 
-async def get_book(db: Session, book_id: int, current_user: User = Depends(get_current_user)) -> BookResponse:
+async def get_book(db: AsyncSession, book_id: int, current_user: User = Depends(get_current_user)) -> BookResponse:
     """
     Retrieves details of a specific book by its ID.
     """
-    book = db.query(Book).filter(Book.id == book_id).first()
+    book, _ = await get_book_payload(db, book_id)
+    return book
+
+async def get_book_payload(db: AsyncSession, book_id: int, current_user: User = Depends(get_current_user)) -> Tuple[BookResponse, bytes]:
+    """
+    Retrieves details of a specific book by its ID, along with its cache entry
+    holding the encoded book (see `pack_payload`).
+
+    Books are served from the cache when possible; on a miss the book is loaded
+    from the database and cached for `settings.CACHE_TTL_SECONDS`, unless the book
+    was invalidated meanwhile: the row may then predate the change that did it.
+    """
+    cache = get_cache()
+    cached = await cache.get(book_cache_key(book_id))
+    if cached is not None:
+        return BookResponse.parse_raw(unpack_payload(cached)), cached
+    book = await db.get(Book, book_id)
     if not book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Book with ID {book_id} not found",
         )
-    return BookResponse.from_orm(book)
+    book_response = BookResponse.from_orm(book)
+    payload = pack_payload(book_response.json().encode())
+    await cache.add(book_cache_key(book_id), payload, settings.CACHE_TTL_SECONDS)
+    return book_response, payload
+
+async def get_books_batch(db: AsyncSession, batch: BookBatchRequest, current_user: User = Depends(get_current_user)) -> BookBatchResponse:
+    """
+    Retrieves many books by ID and by ISBN in one call.
+
+    IDs are first looked up in the cache with a single multi-key read; the IDs it
+    misses and all the ISBNs (the cache is keyed by ID) are then resolved with one
+    `IN` query, whose books are cached in turn unless invalidated meanwhile. Results follow the request order,
+    duplicates included, and every ID or ISBN without a book gets `found: false`.
+    """
+    if len(batch.ids) + len(batch.isbns) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.BATCH_MAX_ITEMS} books can be looked up at once",
+        )
+    cache = get_cache()
+    ids = list(dict.fromkeys(batch.ids))
+    by_id: Dict[int, BookResponse] = {}
+    for book_id, cached in zip(ids, await cache.get_many([book_cache_key(book_id) for book_id in ids])):
+        if cached is not None:
+            by_id[book_id] = BookResponse.parse_raw(unpack_payload(cached))
+    missing_ids = [book_id for book_id in ids if book_id not in by_id]
+    isbns = list(dict.fromkeys(batch.isbns))
+    by_isbn: Dict[str, BookResponse] = {}
+    if missing_ids or isbns:
+        books = await db.scalars(select(Book).where(or_(Book.id.in_(missing_ids), Book.isbn.in_(isbns))))
+        fetched: Dict[str, bytes] = {}
+        for book in books:
+            book_response = BookResponse.from_orm(book)
+            by_id[book.id] = by_isbn[book.isbn] = book_response
+            fetched[book_cache_key(book.id)] = pack_payload(book_response.json().encode())
+        await cache.add_many(fetched, settings.CACHE_TTL_SECONDS)
+    items = [BookBatchItem(id=book_id, found=book_id in by_id, book=by_id.get(book_id)) for book_id in batch.ids]
+    items += [BookBatchItem(isbn=isbn, found=isbn in by_isbn, book=by_isbn.get(isbn)) for isbn in batch.isbns]
+    return BookBatchResponse(items=items)
+
+async def borrow_book(db: AsyncSession, book_id: int, current_user: CurrentUser) -> BookResponse:
+    """
+    Lends one copy of a book to the current user.
+
+    A copy is taken with a single conditional `UPDATE ... WHERE available_copies > 0`
+    on the book's holding, so concurrent borrowers are serialized by that one row
+    lock: each takes a copy until none is left and the rest get 409 Conflict. The
+    loan is recorded in the same transaction, and `books.is_available` is only
+    written when the last copy goes. Borrowers and returners lock the holding
+    before the book, and nothing else, so contention on popular books cannot
+    deadlock. A user whose hold is ready borrows the copy set aside for them.
+    """
+    user_id = await users_service.get_current_user_id(db, current_user)
+    # A copy set aside for the user's hold is already off the shelf
+    if not await holds_service.claim_ready_hold(db, book_id, user_id):
+        available = await _take_copy(db, book_id)
+        if available is None and await holds_service.ensure_holding(db, book_id):
+            available = await _take_copy(db, book_id)
+        if available is None:
+            await db.rollback()
+            await _raise_state_conflict(db, book_id, "No copy of the book is available")
+        if available == 0:
+            await db.execute(update(Book).where(Book.id == book_id).values(is_available=False))
+    db.add(Loan(book_id=book_id, user_id=user_id, borrowed_at=datetime.utcnow()))
+    changes_service.record_change(db, "book", book_id)
+    await db.commit()
+    await get_cache().delete(book_cache_key(book_id))
+    return BookResponse.from_orm(await db.get(Book, book_id, populate_existing=True))
 
-async def update_book(db: Session, book_id: int, book: Book, current_user: User = Depends(get_current_user)) -> BookResponse:
+async def return_book(db: AsyncSession, book_id: int, current_user: CurrentUser) -> BookResponse:
+    """
+    Returns a copy of a book borrowed by the current user.
+
+    The oldest open loan of the user on the book is closed with one conditional
+    `UPDATE ... WHERE returned_at IS NULL`, so a copy cannot be returned twice.
+    The copy then goes to the first patron waiting for the book, if any, or
+    back on the shelf.
+    """
+    user_id = await users_service.get_current_user_id(db, current_user)
+    open_loan = aliased(Loan)
+    loan_id = await db.scalar(
+        update(Loan)
+        .where(
+            Loan.id == select(open_loan.id)
+            .where(open_loan.book_id == book_id, open_loan.user_id == user_id, open_loan.returned_at.is_(None))
+            .order_by(open_loan.borrowed_at)
+            .limit(1)
+            .scalar_subquery(),
+            Loan.returned_at.is_(None),
+        )
+        .values(returned_at=datetime.utcnow())
+        .returning(Loan.id)
+        .execution_options(synchronize_session=False)
+    )
+    if loan_id is None:
+        await db.rollback()
+        await _raise_state_conflict(db, book_id, "Book is not borrowed by the current user")
+    await holds_service.release_copy(db, book_id)
+    changes_service.record_change(db, "book", book_id)
+    await db.commit()
+    await get_cache().delete(book_cache_key(book_id))
+    return BookResponse.from_orm(await db.get(Book, book_id, populate_existing=True))
+
+async def _take_copy(db: AsyncSession, book_id: int) -> Optional[int]:
+    # Returns the number of copies left, or None if no copy could be taken
+    return await db.scalar(
+        update(Holding)
+        .where(Holding.book_id == book_id, Holding.available_copies > 0)
+        .values(available_copies=Holding.available_copies - 1)
+        .returning(Holding.available_copies)
+        .execution_options(synchronize_session=False)
+    )
+
+async def _raise_state_conflict(db: AsyncSession, book_id: int, detail: str) -> None:
+    # Only failed attempts pay for telling a missing book apart from a conflict
+    if await db.scalar(select(Book.id).where(Book.id == book_id)) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Book with ID {book_id} not found",
+        )
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+async def update_book(db: AsyncSession, book_id: int, book: Book, if_match: Optional[str] = None, current_user: User = Depends(get_current_user)) -> BookResponse:
     """
     Updates the details of a specific book by its ID.
+
+    If `if_match` is given, the update only applies if it matches the current ETag
+    of the book. The UPDATE itself is conditioned on the version that was read, so
+    a concurrent update in between is detected as well.
     """
-    db_book = db.query(Book).filter(Book.id == book_id).first()
+    db_book = await db.get(Book, book_id)
     if not db_book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Book with ID {book_id} not found",
         )
+    require_if_match(if_match, book_etag(BookResponse.from_orm(db_book)))
     update_data = book.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_book, key, value)
-    db.commit()
-    db.refresh(db_book)
+    changes_service.record_change(db, "book", book_id)
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED if if_match else status.HTTP_409_CONFLICT,
+            detail="The book was modified concurrently, fetch it again before updating",
+        )
+    await db.refresh(db_book)
+    await get_cache().delete(book_cache_key(book_id))
     return BookResponse.from_orm(db_book)
 
-async def delete_book(db: Session, book_id: int, current_user: User = Depends(get_current_user)):
+async def delete_book(db: AsyncSession, book_id: int, current_user: User = Depends(get_current_user)):
     """
     Deletes a specific book from the library catalog.
     """
-    db_book = db.query(Book).filter(Book.id == book_id).first()
+    db_book = await db.get(Book, book_id)
     if not db_book:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Book with ID {book_id} not found",
         )
-    db.delete(db_book)
-    db.commit()
\ No newline at end of file
+    await db.delete(db_book)
+    changes_service.record_change(db, "book", book_id, op="delete")
+    await db.commit()
+    await get_cache().delete(book_cache_key(book_id))
\ No newline at end of file
@@ -0,0 +1,84 @@
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import BigInteger, Text, cast, func, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from infrastructure.database.models import Change
+from api.v1.schemas.change import ChangePage, ChangeResponse
+from utils.pagination import decode_cursor, encode_cursor
+
+# Every write to a book or a user appends a row to the change log within the same
+# transaction, so a change is logged if and only if it is committed. Consumers
+# follow the log of an entity from a cursor and fetch the current state of the
+# entities that changed, which makes a sync cost proportional to the churn since
+# the previous one rather than to the size of the catalog.
+#
+# IDs are assigned when a change is written but become visible when it commits,
+# so on Postgres a change may show up after one with a larger ID. The feed is
+# therefore ordered by the ID of the writing transaction, then by change ID, and
+# only serves the changes of transactions older than every one still in progress
+# (the xmin of the current snapshot): any change committed later belongs to a
+# newer transaction, so it sorts after the cursor and is never skipped. SQLite
+# serializes writers, so its changes commit in ID order and all carry txid 0.
+
+def record_change(db: AsyncSession, entity: str, entity_id: int, op: str = "upsert") -> None:
+    """
+    Logs a change of a book or user, within the caller's transaction.
+
+    Args:
+        db: The session the change is written with.
+        entity: Either "book" or "user".
+        entity_id: The ID of the changed entity, which must already be assigned.
+        op: "upsert" for a creation or an update, "delete" for a deletion.
+    """
+    db.add(Change(entity=entity, entity_id=entity_id, op=op, changed_at=datetime.utcnow(), txid=_current_txid(db)))
+
+async def record_changes(db: AsyncSession, entity: str, entity_ids: Iterable[int], op: str = "upsert") -> None:
+    """
+    Logs changes of many books or users with one statement, within the caller's transaction.
+    """
+    changed_at = datetime.utcnow()
+    rows = [dict(entity=entity, entity_id=entity_id, op=op, changed_at=changed_at) for entity_id in entity_ids]
+    if rows:
+        await db.execute(insert(Change).values(txid=_current_txid(db)), rows)
+
+async def get_changes(db: AsyncSession, entity: str, cursor: Optional[str], limit: int) -> ChangePage:
+    """
+    Retrieves the changes of an entity logged after a cursor, in commit order.
+
+    On Postgres, changes of transactions that overlap one still in progress are
+    held back until it ends, so the returned cursor never moves past a change that
+    has not committed yet. The same entity may appear several times; only its
+    current state matters to consumers.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed.
+    """
+    after = _decode_position(cursor) if cursor else (0, 0)
+    query = select(Change).where(Change.entity == entity, tuple_(Change.txid, Change.id) > tuple_(*after))
+    if db.bind.dialect.name == "postgresql":
+        query = query.where(Change.txid < cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger))
+    rows = (await db.scalars(query.order_by(Change.txid, Change.id).limit(limit + 1))).all()
+    page = rows[:limit]
+    return ChangePage(
+        changes=[
+            ChangeResponse(id=change.id, entity_id=change.entity_id, op=change.op, changed_at=change.changed_at)
+            for change in page
+        ],
+        cursor=encode_cursor([page[-1].txid, page[-1].id] if page else after),
+        has_more=len(rows) > limit,
+    )
+
+def _current_txid(db: AsyncSession):
+    if db.bind.dialect.name == "postgresql":
+        # xid8 has no cast to bigint, but both print as the same decimal number
+        return cast(cast(func.pg_current_xact_id(), Text), BigInteger)
+    return 0
+
+def _decode_position(cursor: str) -> Tuple[int, int]:
+    position = decode_cursor(cursor, 2)
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in position):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+    return position[0], position[1]
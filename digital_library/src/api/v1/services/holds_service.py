@@ -0,0 +1,321 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, func, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from infrastructure.cache import book_cache_key, get_cache
+from infrastructure.config import settings
+from infrastructure.database.db_session import SessionLocal
+from infrastructure.database.models import Book, Hold, HoldSkip, Holding
+from api.v1.schemas.auth import CurrentUser
+from api.v1.schemas.hold import HoldResponse
+from api.v1.services import changes_service, users_service
+
+# Holds are served in ticket order. Placing a hold takes the next ticket from the
+# holding's hold_tail, and a ticket never changes afterwards: cancelling a hold only
+# changes its status and leaves a gap, which it counts in the book's hold_skips
+# Fenwick tree. Dispatching serves the waiting hold with the lowest ticket and
+# records it as the holding's hold_head, so every ticket up to hold_head has left
+# the queue. A waiting hold's position is then its distance from hold_head less the
+# tickets cancelled in between: two tree lookups of at most 31 nodes each, however
+# long the queue. Every change locks the holding row first, which serializes them
+# per book and keeps the lock order the same as borrowing and returning. A copy set
+# aside for a ready hold waits until the hold's ready_until, after which the sweep
+# passes it on.
+
+logger = logging.getLogger(__name__)
+
+# Tickets are counted in Fenwick trees of this many leaves, so a ticket lookup or
+# cancellation touches at most 31 nodes
+SKIP_TREE_SIZE = 2 ** 31 - 1
+
+_sweeper: Optional[asyncio.Task] = None
+
+async def ensure_holding(db: AsyncSession, book_id: int) -> bool:
+    """
+    Creates the holding of a book that does not have one yet.
+
+    Books imported or created before holdings existed get a single-copy holding
+    matching their availability.
+
+    Returns:
+        bool: True if a holding was created.
+    """
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    result = await db.execute(
+        insert(Holding)
+        .from_select(
+            ["book_id", "total_copies", "available_copies", "hold_head", "hold_tail"],
+            select(Book.id, literal(1), case((Book.is_available, 1), else_=0), literal(0), literal(0)).where(Book.id == book_id),
+        )
+        .on_conflict_do_nothing(index_elements=[Holding.book_id])
+    )
+    return result.rowcount > 0
+
+async def place_hold(db: AsyncSession, book_id: int, current_user: CurrentUser) -> HoldResponse:
+    """
+    Queues the current user for the next copy of a book that has none available.
+    """
+    user_id = await users_service.get_current_user_id(db, current_user)
+    await ensure_holding(db, book_id)
+    queue = (await db.execute(
+        update(Holding)
+        .where(Holding.book_id == book_id, Holding.available_copies == 0)
+        .values(hold_tail=Holding.hold_tail + 1)
+        .returning(Holding.hold_head, Holding.hold_tail)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if queue is None:
+        await db.rollback()
+        if await db.get(Book, book_id) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Book with ID {book_id} not found",
+            )
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A copy of the book is available, borrow it instead")
+    head, ticket = queue
+    hold = Hold(book_id=book_id, user_id=user_id, ticket=ticket, status="waiting", created_at=datetime.utcnow())
+    db.add(hold)
+    ahead = await _waiting_ahead(db, book_id, head, ticket)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="You already have a hold on this book")
+    return _hold_response(hold, ahead)
+
+async def get_hold(db: AsyncSession, book_id: int, current_user: CurrentUser) -> HoldResponse:
+    """
+    Retrieves the current user's active hold on a book with its queue position.
+
+    The position is derived from the holding's hold_head and the cancelled tickets
+    in between, so it costs the same at the back of a long queue as at its front.
+    """
+    user_id = await users_service.get_current_user_id(db, current_user)
+    row = (await db.execute(
+        select(Hold, Holding.hold_head)
+        .join(Holding, Holding.book_id == Hold.book_id)
+        .where(Hold.book_id == book_id, Hold.user_id == user_id, Hold.status.in_(("waiting", "ready")))
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="You have no hold on this book")
+    ahead = await _waiting_ahead(db, book_id, row.hold_head, row.Hold.ticket) if row.Hold.status == "waiting" else 0
+    return _hold_response(row.Hold, ahead)
+
+async def cancel_hold(db: AsyncSession, book_id: int, current_user: CurrentUser) -> None:
+    """
+    Cancels the current user's active hold on a book.
+
+    Cancelling a waiting hold only changes its status and counts its ticket as
+    skipped; the holds behind it move up by one place without being written.
+    Cancelling a ready hold hands its set-aside copy to the next hold, or back to
+    the shelf if nobody is waiting.
+    """
+    user_id = await users_service.get_current_user_id(db, current_user)
+    hold = await db.scalar(
+        select(Hold).where(Hold.book_id == book_id, Hold.user_id == user_id, Hold.status.in_(("waiting", "ready")))
+    )
+    if hold is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="You have no hold on this book")
+    await _lock_holding(db, book_id)
+    cancelled = await db.scalar(
+        update(Hold)
+        .where(Hold.id == hold.id, Hold.status == hold.status)
+        .values(status="cancelled")
+        .returning(Hold.id)
+        .execution_options(synchronize_session=False)
+    )
+    if cancelled is None:
+        # Dispatched or cancelled concurrently; the hold has moved on
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="The hold changed, please retry")
+    if hold.status == "ready":
+        await release_copy(db, book_id)
+        changes_service.record_change(db, "book", book_id)
+    else:
+        await _skip_ticket(db, book_id, hold.ticket)
+    await db.commit()
+    await get_cache().delete(book_cache_key(book_id))
+
+async def release_copy(db: AsyncSession, book_id: int) -> None:
+    """
+    Puts a copy of a book back into circulation, within the caller's transaction.
+
+    If patrons are waiting, the copy is set aside for the first of them, whose hold
+    becomes ready until `settings.HOLD_READY_HOURS` from now and its ticket the
+    holding's hold_head; otherwise the copy becomes available again. Dispatch is
+    one indexed update of the hold with the lowest waiting ticket.
+    """
+    await _lock_holding(db, book_id)
+    now = datetime.utcnow()
+    first_waiting = (
+        select(Hold.id)
+        .where(Hold.book_id == book_id, Hold.status == "waiting")
+        .order_by(Hold.ticket)
+        .limit(1)
+        .scalar_subquery()
+    )
+    dispatched = await db.scalar(
+        update(Hold)
+        .where(Hold.id == first_waiting, Hold.status == "waiting")
+        .values(status="ready", ready_at=now, ready_until=now + timedelta(hours=float(settings.HOLD_READY_HOURS)))
+        .returning(Hold.ticket)
+        .execution_options(synchronize_session=False)
+    )
+    if dispatched is not None:
+        await db.execute(update(Holding).where(Holding.book_id == book_id).values(hold_head=dispatched))
+        return
+    available = await db.scalar(
+        update(Holding)
+        .where(Holding.book_id == book_id)
+        .values(available_copies=Holding.available_copies + 1)
+        .returning(Holding.available_copies)
+        .execution_options(synchronize_session=False)
+    )
+    if available == 1:
+        await db.execute(update(Book).where(Book.id == book_id).values(is_available=True))
+
+async def claim_ready_hold(db: AsyncSession, book_id: int, user_id: int) -> bool:
+    """
+    Fulfils the user's ready hold on a book, within the caller's transaction.
+
+    Returns:
+        bool: True if the user had a copy set aside, and still in time to take it,
+        which they now borrow.
+    """
+    await _lock_holding(db, book_id)
+    hold_id = await db.scalar(
+        update(Hold)
+        .where(Hold.book_id == book_id, Hold.user_id == user_id, Hold.status == "ready", Hold.ready_until >= datetime.utcnow())
+        .values(status="fulfilled")
+        .returning(Hold.id)
+        .execution_options(synchronize_session=False)
+    )
+    return hold_id is not None
+
+async def expire_ready_holds(db: AsyncSession, limit: int = 1000) -> int:
+    """
+    Expires the ready holds whose copy was not borrowed by their `ready_until`.
+
+    The copy of each expired hold goes to the next waiting hold, or back to the
+    shelf. Every hold is expired in its own short transaction, so the sweep never
+    holds the lock of more than one book at a time.
+
+    Args:
+        db: The database session.
+        limit: The largest number of holds expired in one call.
+
+    Returns:
+        int: The number of holds expired.
+    """
+    overdue = (await db.execute(
+        select(Hold.id, Hold.book_id)
+        .where(Hold.status == "ready", Hold.ready_until < datetime.utcnow())
+        .order_by(Hold.ready_until)
+        .limit(limit)
+    )).all()
+    await db.rollback()
+    expired = 0
+    for hold_id, book_id in overdue:
+        await _lock_holding(db, book_id)
+        hold_id = await db.scalar(
+            update(Hold)
+            .where(Hold.id == hold_id, Hold.status == "ready")
+            .values(status="expired")
+            .returning(Hold.id)
+            .execution_options(synchronize_session=False)
+        )
+        if hold_id is None:
+            # Borrowed or cancelled in the meantime
+            await db.rollback()
+            continue
+        await release_copy(db, book_id)
+        changes_service.record_change(db, "book", book_id)
+        await db.commit()
+        await get_cache().delete(book_cache_key(book_id))
+        expired += 1
+    return expired
+
+async def start_hold_sweeper() -> None:
+    """Starts expiring overdue ready holds every `settings.HOLD_SWEEP_INTERVAL_SECONDS`."""
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = asyncio.create_task(_sweep())
+
+async def stop_hold_sweeper() -> None:
+    """Stops expiring overdue ready holds."""
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        _sweeper = None
+
+async def _sweep() -> None:
+    # Every worker sweeps; expiring a hold is conditional, so overlapping sweeps are harmless
+    while True:
+        await asyncio.sleep(float(settings.HOLD_SWEEP_INTERVAL_SECONDS))
+        try:
+            async with SessionLocal() as db:
+                expired = await expire_ready_holds(db)
+            if expired:
+                logger.info("Expired %d ready holds", expired)
+        except Exception:
+            logger.exception("Could not expire ready holds")
+
+async def _lock_holding(db: AsyncSession, book_id: int) -> None:
+    # Lock the holding first, like every other change to the queue
+    await db.execute(select(Holding.id).where(Holding.book_id == book_id).with_for_update())
+
+async def _waiting_ahead(db: AsyncSession, book_id: int, head: int, ticket: int) -> int:
+    # Every ticket up to head has left the queue; of the ones between head and the
+    # given ticket, all are still waiting except those cancelled
+    below, up_to_head = _prefix_nodes(ticket - 1), _prefix_nodes(head)
+    skipped = await db.scalar(
+        select(
+            func.coalesce(func.sum(case((HoldSkip.node.in_(below), HoldSkip.skipped), else_=0)), 0)
+            - func.coalesce(func.sum(case((HoldSkip.node.in_(up_to_head), HoldSkip.skipped), else_=0)), 0)
+        )
+        .where(HoldSkip.book_id == book_id, HoldSkip.node.in_(below + up_to_head))
+    )
+    return ticket - 1 - head - (skipped or 0)
+
+async def _skip_ticket(db: AsyncSession, book_id: int, ticket: int) -> None:
+    # Counts a cancelled waiting ticket in every tree node covering it
+    insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    statement = insert(HoldSkip).values([dict(book_id=book_id, node=node, skipped=1) for node in _update_nodes(ticket)])
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=[HoldSkip.book_id, HoldSkip.node],
+        set_={"skipped": HoldSkip.skipped + 1},
+    ))
+
+def _prefix_nodes(ticket: int) -> List[int]:
+    # The tree nodes whose sum counts the skipped tickets up to `ticket`
+    nodes = []
+    while ticket > 0:
+        nodes.append(ticket)
+        ticket -= ticket & -ticket
+    return nodes
+
+def _update_nodes(ticket: int) -> List[int]:
+    # The tree nodes whose range covers `ticket`
+    nodes = []
+    while ticket <= SKIP_TREE_SIZE:
+        nodes.append(ticket)
+        ticket += ticket & -ticket
+    return nodes
+
+def _hold_response(hold: Hold, ahead: int) -> HoldResponse:
+    return HoldResponse(
+        id=hold.id,
+        book_id=hold.book_id,
+        status=hold.status,
+        position=ahead + 1 if hold.status == "waiting" else 0,
+        created_at=hold.created_at,
+        ready_at=hold.ready_at,
+        ready_until=hold.ready_until,
+    )
@@ -1,35 +1,60 @@
-from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
 from infrastructure.config import settings
 from infrastructure.database.db_session import get_db
-from api.v1.schemas.user import User, UserCreate, UserResponse
+from api.v1.schemas.auth import CurrentUser
+from api.v1.schemas.change import ChangePage
+from api.v1.schemas.user import UserCreate, UserResponse
+from api.v1.services import changes_service
+
+from utils.auth import credentials_exception, get_current_user, get_password_hash
+from utils.etags import require_if_match, user_etag
+from utils.pagination import paginate, split_page
 from infrastructure.database.models import User
 
-from utils.auth import get_current_user
-from api.v1.schemas.auth import User
+# The fields of UserResponse, in order, selected as plain columns for listing pages
+USER_RESPONSE_COLUMNS = (User.username, User.email, User.id, User.created_at, User.updated_at)
 
-async def create_user(db: Session, user: UserCreate, current_user: User = Depends(get_current_user)) -> UserResponse:
+async def create_user(db: AsyncSession, user: UserCreate, current_user: User = Depends(get_current_user)) -> UserResponse:
     """
     Creates a new user account in the library system.
     """
-    db_user = User(**user.dict())
+    db_user = User(**user.dict(exclude={"password"}), hashed_password=await get_password_hash(user.password))
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.flush()
+    changes_service.record_change(db, "user", db_user.id)
+    await db.commit()
+    await db.refresh(db_user)
     return UserResponse.from_orm(db_user)
 
-async def get_users(db: Session, current_user: User = Depends(get_current_user)) -> list[UserResponse]:
+async def get_users(db: AsyncSession, limit: int, cursor: Optional[str] = None, current_user: User = Depends(get_current_user)) -> Tuple[Sequence[Any], Optional[str]]:
     """
-    Retrieves a list of all users in the library system.
+    Retrieves one page of users from the library system ordered by ID, along with
+    the cursor for the next page.
+
+    Users are returned as rows of `USER_RESPONSE_COLUMNS` rather than as models,
+    ready to be encoded with `utils.serialization.rows_response`.
     """
-    users = db.query(User).all()
-    return [UserResponse.from_orm(user) for user in users]
+    users = (await db.execute(paginate(select(*USER_RESPONSE_COLUMNS), (User.id,), cursor, limit))).all()
+    return split_page(users, limit, key=lambda user: [user.id])
 
-async def get_user(db: Session, user_id: int, current_user: User = Depends(get_current_user)) -> UserResponse:
+async def get_user_changes(db: AsyncSession, cursor: Optional[str], limit: int, current_user: User = Depends(get_current_user)) -> ChangePage:
+    """
+    Retrieves the users created, updated or deleted after a cursor, for consumers
+    that keep a copy of the users in sync.
+    """
+    return await changes_service.get_changes(db, "user", cursor, limit)
+
+async def get_user(db: AsyncSession, user_id: int, current_user: User = Depends(get_current_user)) -> UserResponse:
     """
     Retrieves details of a specific user by ID.
     """
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -37,32 +62,59 @@ async def get_user(db: Session, user_id: int, current_user: User = Depends(get_c
         )
     return UserResponse.from_orm(user)
 
-async def update_user(db: Session, user_id: int, user: User, current_user: User = Depends(get_current_user)) -> UserResponse:
+async def update_user(db: AsyncSession, user_id: int, user: User, if_match: Optional[str] = None, current_user: User = Depends(get_current_user)) -> UserResponse:
     """
     Updates the details of a specific user by ID.
+
+    If `if_match` is given, the update only applies if it matches the current ETag
+    of the user. `updated_at` doubles as the row version: the UPDATE is conditioned
+    on the value that was read, so a concurrent update in between is detected too.
     """
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with ID {user_id} not found",
         )
+    require_if_match(if_match, user_etag(UserResponse.from_orm(db_user)))
     update_data = user.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_user, key, value)
-    db.commit()
-    db.refresh(db_user)
+    db_user.updated_at = datetime.utcnow()
+    changes_service.record_change(db, "user", user_id)
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED if if_match else status.HTTP_409_CONFLICT,
+            detail="The user was modified concurrently, fetch it again before updating",
+        )
+    await db.refresh(db_user)
     return UserResponse.from_orm(db_user)
 
-async def delete_user(db: Session, user_id: int, current_user: User = Depends(get_current_user)):
+async def delete_user(db: AsyncSession, user_id: int, current_user: User = Depends(get_current_user)):
     """
     Deletes a specific user account by ID.
     """
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
     if not db_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with ID {user_id} not found",
         )
-    db.delete(db_user)
-    db.commit()
\ No newline at end of file
+    await db.delete(db_user)
+    changes_service.record_change(db, "user", user_id, op="delete")
+    await db.commit()
+
+async def get_current_user_id(db: AsyncSession, current_user: CurrentUser) -> int:
+    """
+    Looks up the ID of the authenticated user with one read of the unique username index.
+
+    Raises:
+        HTTPException: 401 if the user was deleted after the token was issued.
+    """
+    user_id = await db.scalar(select(User.id).where(User.username == current_user.username))
+    if user_id is None:
+        raise credentials_exception()
+    return user_id
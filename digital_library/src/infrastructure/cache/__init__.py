@@ -0,0 +1,136 @@
+import hashlib
+import zlib
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import redis.asyncio as redis
+
+from infrastructure.compression import GZIP_MAGIC, compress
+from infrastructure.config import settings
+from infrastructure.cache.backends import CacheBackend, InMemoryCacheBackend, RedisCacheBackend
+from infrastructure.cache.local import LocalCacheBackend
+from infrastructure.cache.tiered import TieredCacheBackend
+from infrastructure.metrics import registry
+
+
+@lru_cache
+def get_redis() -> redis.Redis:
+    """
+    Retrieves the shared asyncio Redis client configured from the settings.
+
+    Returns:
+        redis.Redis: The Redis client.
+    """
+    return redis.Redis(host=settings.REDIS_HOST, port=int(settings.REDIS_PORT), db=int(settings.REDIS_DB))
+
+
+@lru_cache
+def get_cache() -> CacheBackend:
+    """
+    Retrieves the cache backend selected by `settings.CACHE_BACKEND`.
+
+    Returns:
+        CacheBackend: An in-process cache when the backend is "memory". Otherwise a
+        Redis backed cache, fronted by a per-worker LRU tier unless
+        `settings.CACHE_LOCAL_MAXSIZE` is 0.
+    """
+    if settings.CACHE_BACKEND == "memory":
+        return InMemoryCacheBackend(int(settings.CACHE_TOMBSTONE_SECONDS))
+    remote = RedisCacheBackend(get_redis(), int(settings.CACHE_TOMBSTONE_SECONDS))
+    if not int(settings.CACHE_LOCAL_MAXSIZE):
+        return remote
+    return TieredCacheBackend(
+        LocalCacheBackend(int(settings.CACHE_LOCAL_MAXSIZE), int(settings.CACHE_LOCAL_TTL_SECONDS)),
+        remote,
+        channel=f"{settings.CACHE_PREFIX}invalidate",
+        version_key=f"{settings.CACHE_PREFIX}version",
+        mode=settings.CACHE_INVALIDATION_MODE,
+        poll_interval=float(settings.CACHE_VERSION_POLL_SECONDS),
+    )
+
+
+async def start_cache() -> None:
+    """Starts the cross-worker invalidation listener of the cache, if it has one."""
+    cache = get_cache()
+    if isinstance(cache, TieredCacheBackend):
+        await cache.start()
+
+
+async def stop_cache() -> None:
+    """Stops the cross-worker invalidation listener of the cache, if it has one."""
+    cache = get_cache()
+    if isinstance(cache, TieredCacheBackend):
+        await cache.stop()
+
+
+def _cache_requests() -> Dict[Tuple[str, str], int]:
+    # A tiered cache reports per tier, a Redis one only for itself
+    stats = get_cache().stats()
+    tiers = stats if isinstance(next(iter(stats.values()), None), dict) else {"redis": stats}
+    return {
+        (tier, result): counts[key]
+        for tier, counts in tiers.items()
+        for result, key in (("hit", "hits"), ("miss", "misses"))
+        if key in counts
+    }
+
+
+registry.callback("cache_requests_total", "Cache lookups by tier and result.", "counter", ("tier", "result"), _cache_requests)
+
+
+def pack_payload(data: bytes) -> bytes:
+    """
+    Prepares a JSON payload for the cache.
+
+    Payloads of at least `settings.COMPRESSION_MIN_SIZE` bytes are stored gzip
+    compressed, which every client accepts: they are compressed once when cached
+    and can then be served as stored (see `infrastructure.compression.payload_response`).
+
+    Args:
+        data: The JSON payload.
+
+    Returns:
+        bytes: The entry to cache.
+    """
+    if settings.COMPRESSION_ENABLED and len(data) >= int(settings.COMPRESSION_MIN_SIZE):
+        return compress(data, "gzip", settings.COMPRESSION_LEVELS.get("gzip", 6))
+    return data
+
+
+def unpack_payload(entry: bytes) -> bytes:
+    """
+    Restores the JSON payload of a cache entry made by `pack_payload`.
+
+    Args:
+        entry: The cached entry.
+
+    Returns:
+        bytes: The JSON payload.
+    """
+    return zlib.decompress(entry, 16 + zlib.MAX_WBITS) if entry.startswith(GZIP_MAGIC) else entry
+
+
+def book_cache_key(book_id: int) -> str:
+    """
+    Builds the cache key of a single book.
+
+    Args:
+        book_id: The ID of the book.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"{settings.CACHE_PREFIX}book:{book_id}"
+
+
+def facets_cache_key(filters: str) -> str:
+    """
+    Builds the cache key of the catalog facets for a set of filters.
+
+    Args:
+        filters: The filters, serialized deterministically.
+
+    Returns:
+        str: The cache key.
+    """
+    return f"{settings.CACHE_PREFIX}facets:{hashlib.sha1(filters.encode()).hexdigest()}"
@@ -0,0 +1,281 @@
+import logging
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+# Left in place of a deleted entry so that a read that loaded the old value before
+# the delete cannot store it again afterwards; never a valid serialized value
+TOMBSTONE = b"\x00"
+
+
+class CacheBackend:
+    """
+    Interface shared by all cache backends.
+
+    Values are opaque bytes; callers are responsible for serializing them.
+
+    Deleting an entry leaves a tombstone for a few seconds, which reads treat as a
+    miss and `add` does not overwrite. Read-through callers store what they loaded
+    with `add`, so a value read from the database before a concurrent write
+    committed is not cached after the writer's delete.
+    """
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """
+        Retrieves a value from the cache.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            Optional[bytes]: The cached value, or None on a miss.
+        """
+        raise NotImplementedError
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        """
+        Retrieves several values from the cache.
+
+        Backends that can fetch many keys in one round trip override this.
+
+        Args:
+            keys: The cache keys.
+
+        Returns:
+            List[Optional[bytes]]: The cached values in the order of `keys`, None for each miss.
+        """
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        """
+        Stores a value in the cache.
+
+        Args:
+            key: The cache key.
+            value: The serialized value to store.
+            ttl: The time to live of the entry in seconds.
+        """
+        raise NotImplementedError
+
+    async def set_many(self, entries: Dict[str, bytes], ttl: int) -> None:
+        """
+        Stores several values in the cache.
+
+        Args:
+            entries: The serialized values to store, by cache key.
+            ttl: The time to live of the entries in seconds.
+        """
+        for key, value in entries.items():
+            await self.set(key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: int) -> bool:
+        """
+        Stores a value in the cache unless the key holds a value or a tombstone.
+
+        Args:
+            key: The cache key.
+            value: The serialized value to store.
+            ttl: The time to live of the entry in seconds.
+
+        Returns:
+            bool: True if the value was stored.
+        """
+        raise NotImplementedError
+
+    async def add_many(self, entries: Dict[str, bytes], ttl: int) -> List[str]:
+        """
+        Stores several values in the cache, each unless its key holds a value or a tombstone.
+
+        Args:
+            entries: The serialized values to store, by cache key.
+            ttl: The time to live of the entries in seconds.
+
+        Returns:
+            List[str]: The keys whose value was stored.
+        """
+        return [key for key, value in entries.items() if await self.add(key, value, ttl)]
+
+    async def delete(self, key: str) -> None:
+        """
+        Removes a value from the cache, leaving a tombstone in its place.
+
+        Args:
+            key: The cache key.
+        """
+        raise NotImplementedError
+
+    async def delete_many(self, keys: Sequence[str]) -> None:
+        """
+        Removes several values from the cache.
+
+        Backends that can remove many keys in one round trip override this.
+
+        Args:
+            keys: The cache keys.
+        """
+        for key in keys:
+            await self.delete(key)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Retrieves the hit and miss counters of the cache.
+
+        Returns:
+            Dict[str, int]: The counters, empty if the backend does not track any.
+        """
+        return {}
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Cache backend storing entries in Redis.
+
+    Redis errors are logged and treated as cache misses so that an unavailable
+    cache degrades to database reads instead of failing requests.
+    """
+
+    def __init__(self, client: redis.Redis, tombstone_ttl: int = 10) -> None:
+        """
+        Initializes the backend with a Redis client.
+
+        Args:
+            client: The asyncio Redis client to use.
+            tombstone_ttl: How long the tombstone of a deleted entry lasts, in seconds.
+        """
+        self.client = client
+        self.tombstone_ttl = tombstone_ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            value = await self.client.get(key)
+        except redis.RedisError as e:
+            logger.warning("Cache read failed for %s: %s", key, e)
+            value = None
+        if value == TOMBSTONE:
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        try:
+            values = await self.client.mget(keys)
+        except redis.RedisError as e:
+            logger.warning("Cache read failed for %d keys: %s", len(keys), e)
+            values = [None] * len(keys)
+        values = [None if value == TOMBSTONE else value for value in values]
+        found = sum(value is not None for value in values)
+        self.hits += found
+        self.misses += len(keys) - found
+        return values
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        try:
+            await self.client.set(key, value, ex=ttl)
+        except redis.RedisError as e:
+            logger.warning("Cache write failed for %s: %s", key, e)
+
+    async def set_many(self, entries: Dict[str, bytes], ttl: int) -> None:
+        if not entries:
+            return
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in entries.items():
+                    pipe.set(key, value, ex=ttl)
+                await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Cache write failed for %d keys: %s", len(entries), e)
+
+    async def add(self, key: str, value: bytes, ttl: int) -> bool:
+        try:
+            return bool(await self.client.set(key, value, ex=ttl, nx=True))
+        except redis.RedisError as e:
+            logger.warning("Cache write failed for %s: %s", key, e)
+            return False
+
+    async def add_many(self, entries: Dict[str, bytes], ttl: int) -> List[str]:
+        if not entries:
+            return []
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in entries.items():
+                    pipe.set(key, value, ex=ttl, nx=True)
+                stored = await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Cache write failed for %d keys: %s", len(entries), e)
+            return []
+        return [key for key, ok in zip(entries, stored) if ok]
+
+    async def delete(self, key: str) -> None:
+        await self.delete_many([key])
+
+    async def delete_many(self, keys: Sequence[str]) -> None:
+        if not keys:
+            return
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.set(key, TOMBSTONE, ex=self.tombstone_ttl)
+                await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Cache invalidation failed for %d keys: %s", len(keys), e)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """
+    Cache backend storing entries in a process-local dictionary.
+
+    Intended for local development and tests, where no Redis server is available.
+    """
+
+    def __init__(self, tombstone_ttl: int = 10) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            tombstone_ttl: How long the tombstone of a deleted entry lasts, in seconds.
+        """
+        self.tombstone_ttl = tombstone_ttl
+        self._entries: Dict[str, Tuple[float, bytes]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = self._live(key)
+        return None if value == TOMBSTONE else value
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+
+    async def add(self, key: str, value: bytes, ttl: int) -> bool:
+        if self._live(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str) -> None:
+        await self.set(key, TOMBSTONE, self.tombstone_ttl)
+
+    def _live(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return value
+
+    def clear(self) -> None:
+        """Removes every entry from the cache."""
+        self._entries.clear()
@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+from infrastructure.cache.backends import CacheBackend
+
+
+class LocalCacheBackend(CacheBackend):
+    """
+    Bounded, per-process LRU cache with a time to live on every entry.
+
+    Lookups and writes are O(1). Once `maxsize` entries are held, the least
+    recently used entry is evicted. Entries are also dropped when they outlive
+    their TTL, which is capped at `max_ttl` so that a worker that misses an
+    invalidation message never serves a stale entry for long.
+    """
+
+    def __init__(self, maxsize: int, max_ttl: int) -> None:
+        """
+        Initializes the cache.
+
+        Args:
+            maxsize: The maximum number of entries to hold.
+            max_ttl: The maximum time to live of an entry in seconds.
+        """
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + min(ttl, self.max_ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def delete_many(self, keys: Sequence[str]) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Removes every entry from the cache."""
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Sequence
+
+import redis.asyncio as redis
+
+from infrastructure.cache.backends import CacheBackend, RedisCacheBackend
+from infrastructure.cache.local import LocalCacheBackend
+
+logger = logging.getLogger(__name__)
+
+
+class TieredCacheBackend(CacheBackend):
+    """
+    Two-level cache: a per-worker `LocalCacheBackend` in front of Redis.
+
+    Reads try the local tier first and fall back to Redis, copying Redis hits
+    into the local tier. Deletes evict both tiers and tell the other workers to
+    evict their local copy, either by publishing the keys, newline-separated in
+    one message, on a Redis pub/sub channel or, in "poll" mode, by bumping a
+    version counter that every worker checks at most once per `poll_interval`
+    seconds.
+    """
+
+    def __init__(
+        self,
+        local: LocalCacheBackend,
+        remote: RedisCacheBackend,
+        channel: str,
+        version_key: str,
+        mode: str = "pubsub",
+        poll_interval: float = 1.0,
+    ) -> None:
+        """
+        Initializes the tiered cache.
+
+        Args:
+            local: The in-process tier.
+            remote: The Redis tier.
+            channel: The pub/sub channel invalidation messages are published on.
+            version_key: The Redis key of the invalidation version counter.
+            mode: The cross-worker invalidation mode, either "pubsub" or "poll".
+            poll_interval: How often the version counter is checked in "poll" mode, in seconds.
+        """
+        self.local = local
+        self.remote = remote
+        self.channel = channel
+        self.version_key = version_key
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self._version = 0
+        self._polled_at = 0.0
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def client(self) -> redis.Redis:
+        return self.remote.client
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if self.mode == "poll":
+            await self._poll_version()
+        value = await self.local.get(key)
+        if value is not None:
+            return value
+        value = await self.remote.get(key)
+        if value is not None:
+            await self.local.set(key, value, self.local.max_ttl)
+        return value
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if self.mode == "poll":
+            await self._poll_version()
+        values = await self.local.get_many(keys)
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            # One round trip to Redis for every key the local tier does not hold
+            fetched = await self.remote.get_many([keys[i] for i in missing])
+            for i, value in zip(missing, fetched):
+                if value is not None:
+                    values[i] = value
+                    await self.local.set(keys[i], value, self.local.max_ttl)
+        return values
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self.remote.set(key, value, ttl)
+        await self.local.set(key, value, ttl)
+
+    async def set_many(self, entries: Dict[str, bytes], ttl: int) -> None:
+        await self.remote.set_many(entries, ttl)
+        await self.local.set_many(entries, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: int) -> bool:
+        # Redis holds the tombstones, so it decides whether the value may be cached
+        if not await self.remote.add(key, value, ttl):
+            return False
+        await self.local.set(key, value, ttl)
+        return True
+
+    async def add_many(self, entries: Dict[str, bytes], ttl: int) -> List[str]:
+        stored = await self.remote.add_many(entries, ttl)
+        await self.local.set_many({key: entries[key] for key in stored}, ttl)
+        return stored
+
+    async def delete(self, key: str) -> None:
+        await self.delete_many([key])
+
+    async def delete_many(self, keys: Sequence[str]) -> None:
+        if not keys:
+            return
+        await self.local.delete_many(keys)
+        await self.remote.delete_many(keys)
+        try:
+            if self.mode == "poll":
+                await self.client.incr(self.version_key)
+            else:
+                # One message per call, however many keys it evicts
+                await self.client.publish(self.channel, "\n".join(keys))
+        except redis.RedisError as e:
+            logger.warning("Cache invalidation broadcast failed for %d keys: %s", len(keys), e)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {"local": self.local.stats(), "redis": self.remote.stats()}
+
+    async def start(self) -> None:
+        """Starts listening for invalidation messages from the other workers."""
+        if self.mode == "pubsub" and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Stops listening for invalidation messages."""
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # Anything cached before the subscription may have missed an invalidation
+                    self.local.clear()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            await self.local.delete_many(message["data"].decode().split("\n"))
+            except asyncio.CancelledError:
+                raise
+            except redis.RedisError as e:
+                logger.warning("Cache invalidation listener disconnected: %s", e)
+                self.local.clear()
+                await asyncio.sleep(self.poll_interval)
+
+    async def _poll_version(self) -> None:
+        now = time.monotonic()
+        if now - self._polled_at < self.poll_interval:
+            return
+        self._polled_at = now
+        try:
+            version = int(await self.client.get(self.version_key) or 0)
+        except redis.RedisError as e:
+            logger.warning("Cache version check failed: %s", e)
+            return
+        if version != self._version:
+            # Some worker invalidated an entry; the counter does not say which one
+            self.local.clear()
+            self._version = version
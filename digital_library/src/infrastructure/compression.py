@@ -0,0 +1,284 @@
+import zlib
+from typing import Dict, Mapping, Optional, Sequence
+
+from fastapi import Request, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# brotli and zstandard are in requirements.txt; without them only gzip is offered
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# The first two bytes of every gzip stream, which no JSON document starts with
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Media types worth compressing; anything else (images, archives) is sent as is
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript", "application/xml")
+
+
+def available_encodings() -> Sequence[str]:
+    """Returns the content codings the installed libraries support."""
+    return tuple(
+        encoding for encoding, module in (("zstd", zstandard), ("br", brotli), ("gzip", zlib)) if module is not None
+    )
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    Derives the ETag of a compressed representation from the uncompressed one's.
+
+    A strong ETag promises byte-identical bodies, so the content coding is added
+    to it, e.g. `"abc"` becomes `"abc-gzip"`. Weak ETags are kept as they are.
+
+    Args:
+        etag: The ETag of the uncompressed representation.
+        encoding: The content coding of the response.
+
+    Returns:
+        str: The ETag to send with the compressed body.
+    """
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def decoded_etag(etag: str) -> str:
+    """
+    Reverses `encoded_etag`, so that conditional requests match any coding.
+
+    Args:
+        etag: An entity tag sent back by a client.
+
+    Returns:
+        str: The entity tag without its content coding suffix, if it had one.
+    """
+    for encoding in ("zstd", "br", "gzip"):
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
+
+
+class Compressor:
+    """
+    Incremental compressor for one response body, whatever its content coding.
+    """
+
+    def __init__(self, encoding: str, level: int) -> None:
+        """
+        Initializes the compressor.
+
+        Args:
+            encoding: The content coding, one of "gzip", "br" or "zstd".
+            level: The compression level, in the range of the coding: 1 to 9 for
+                gzip, 0 to 11 for br and 1 to 22 for zstd.
+        """
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"Unsupported content coding: {encoding}")
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        """
+        Compresses the next part of the body.
+
+        Args:
+            data: The uncompressed bytes.
+            flush: Whether everything written so far must be decodable by the client
+                on its own, as when streaming. Each flush slightly worsens the ratio.
+
+        Returns:
+            bytes: The compressed bytes available so far.
+        """
+        if self.encoding == "br":
+            output = self._compressor.process(data)
+            return output + self._compressor.flush() if flush else output
+        output = self._compressor.compress(data)
+        if not flush:
+            return output
+        if self.encoding == "gzip":
+            return output + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        return output + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        """Ends the compressed stream and returns its last bytes."""
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """
+    Compresses a whole payload.
+
+    Args:
+        data: The uncompressed bytes.
+        encoding: See `Compressor`.
+        level: See `Compressor`.
+
+    Returns:
+        bytes: The compressed bytes.
+    """
+    compressor = Compressor(encoding, level)
+    return compressor.compress(data) + compressor.finish()
+
+
+def negotiate(accept_encoding: Optional[str], encodings: Sequence[str]) -> Optional[str]:
+    """
+    Picks the content coding of a response from the `Accept-Encoding` header.
+
+    Args:
+        accept_encoding: The header value, e.g. "gzip, br;q=0.9", if sent.
+        encodings: The codings the server offers, most preferred first.
+
+    Returns:
+        Optional[str]: The offered coding with the highest quality value for the
+        client, ties going to the server preference, or None to send the body
+        uncompressed.
+    """
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _compressible(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return False
+    media_type = content_type.split(";")[0].strip().lower()
+    return media_type.startswith(COMPRESSIBLE_TYPES) or media_type.endswith(("+json", "+xml"))
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing response bodies with the content coding the
+    client prefers among zstd, br and gzip.
+
+    Complete bodies are compressed at once if they reach `minimum_size`. Streamed
+    bodies, whose size is unknown up front, are always compressed, and flushed
+    chunk by chunk so that the client can decode each part as it arrives.
+    Responses that already carry a `Content-Encoding`, such as precompressed
+    cache entries, are sent as is. The ETag of a compressed response gets a
+    content coding suffix (see `encoded_etag`).
+    """
+
+    def __init__(self, app: ASGIApp, levels: Mapping[str, int], minimum_size: int = 1024) -> None:
+        """
+        Initializes the middleware.
+
+        Args:
+            app: The application to wrap.
+            levels: The compression level of each offered content coding, most
+                preferred first, e.g. {"zstd": 3, "br": 4, "gzip": 6}. Codings the
+                installed libraries do not support are left out.
+            minimum_size: The smallest complete body, in bytes, worth compressing.
+        """
+        self.app = app
+        self.levels = {encoding: level for encoding, level in levels.items() if encoding in available_encodings()}
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"), tuple(self.levels)) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        start: Optional[Message] = None
+        compressor: Optional[Compressor] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                # Held back until the first body part tells whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if start is not None:
+                headers = MutableHeaders(scope=start)
+                if (
+                    "content-encoding" in headers
+                    or not _compressible(headers.get("content-type"))
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    await send(start)
+                    start = None
+                    await send(message)
+                    return
+                compressor = Compressor(encoding, self.levels[encoding])
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                if more_body:
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                    body = compressor.compress(body, flush=True)
+                else:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+                start = None
+            elif compressor is not None:
+                body = compressor.compress(body, flush=True) if more_body else compressor.compress(body) + compressor.finish()
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def payload_response(request: Request, payload: bytes, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """
+    Serves a cached JSON payload, compressed or not.
+
+    Gzip compressed payloads are sent as they are stored to clients that accept
+    gzip, so they are compressed once when cached rather than on every response,
+    and decompressed for the others. Either way `Accept-Encoding` is added to the
+    `Vary` header, and the ETag of a compressed response gets a coding suffix.
+
+    Args:
+        request: The incoming request, whose `Accept-Encoding` header is honoured.
+        payload: The cached payload, plain or gzip compressed JSON.
+        headers: Additional response headers, e.g. an ETag.
+
+    Returns:
+        Response: The `application/json` response.
+    """
+    compressed = payload.startswith(GZIP_MAGIC)
+    send_compressed = compressed and negotiate(request.headers.get("accept-encoding"), ("gzip",)) is not None
+    if compressed and not send_compressed:
+        payload = zlib.decompress(payload, 16 + zlib.MAX_WBITS)
+    response = Response(payload, media_type="application/json", headers=headers)
+    if compressed:
+        response.headers.add_vary_header("Accept-Encoding")
+    if send_compressed:
+        response.headers["Content-Encoding"] = "gzip"
+        if "etag" in response.headers:
+            response.headers["ETag"] = encoded_etag(response.headers["etag"], "gzip")
+    return response
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Date
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, ForeignKey, Boolean, Date, Index, CheckConstraint, text
 from sqlalchemy.orm import relationship
 
 from infrastructure.database.models import Base
@@ -12,11 +12,22 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     created_at = Column(DateTime, nullable=False)
     updated_at = Column(DateTime, nullable=False)
+    # Set by every update, which only applies if it is unchanged (see users_service.update_user)
+    __mapper_args__ = {"version_id_col": updated_at, "version_id_generator": False}
 
     borrowed_books = relationship("Book", backref="borrower", cascade="all, delete-orphan")
 
 class Book(Base):
     __tablename__ = "books"
+    __table_args__ = (
+        # Backs keyset pagination of the catalog ordered by (title, id)
+        Index("ix_books_title_id", "title", "id"),
+        # Back the listing filters, which are keyset paginated on id
+        Index("ix_books_genre_available_id", "genre", "is_available", "id"),
+        Index("ix_books_author_id", "author", "id"),
+        Index("ix_books_available_id", "is_available", "id"),
+        Index("ix_books_publication_date", "publication_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -28,5 +39,104 @@ class Book(Base):
     cover_image = Column(String, nullable=True)
     is_available = Column(Boolean, default=True, nullable=False)
     borrower_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # Incremented by every ORM update, which only applies if the version is unchanged
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
+    __mapper_args__ = {"version_id_col": version}
 
-    borrower = relationship("User", backref="borrowed_books")
\ No newline at end of file
+    borrower = relationship("User", backref="borrowed_books")
+    # One-to-one, joined so that listing pages read availability in the same query
+    holding = relationship("Holding", uselist=False, lazy="joined", back_populates="book", cascade="all, delete-orphan")
+
+    @property
+    def total_copies(self) -> int:
+        # Books created before holdings existed have a single copy
+        return self.holding.total_copies if self.holding else 1
+
+    @property
+    def available_copies(self) -> int:
+        return self.holding.available_copies if self.holding else int(self.is_available)
+
+class Holding(Base):
+    __tablename__ = "book_holdings"
+    __table_args__ = (
+        CheckConstraint("available_copies >= 0 AND available_copies <= total_copies", name="ck_book_holdings_available"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False, unique=True)
+    total_copies = Column(Integer, nullable=False, default=1)
+    available_copies = Column(Integer, nullable=False, default=1)
+    # Tickets of the last hold dispatched and of the last hold placed on the book
+    hold_head = Column(Integer, nullable=False, default=0)
+    hold_tail = Column(Integer, nullable=False, default=0)
+
+    book = relationship("Book", back_populates="holding")
+
+class Loan(Base):
+    __tablename__ = "loans"
+    __table_args__ = (
+        # Finds the open loan of a borrower on a book when it is returned
+        Index("ix_loans_book_user_returned", "book_id", "user_id", "returned_at"),
+        Index("ix_loans_user_returned", "user_id", "returned_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    borrowed_at = Column(DateTime, nullable=False)
+    returned_at = Column(DateTime, nullable=True)
+
+class Hold(Base):
+    __tablename__ = "holds"
+    __table_args__ = (
+        # Dispatch finds the first waiting hold of a book
+        Index("ix_holds_book_status_ticket", "book_id", "status", "ticket"),
+        # The sweep finds the ready holds past their deadline
+        Index("ix_holds_status_ready_until", "status", "ready_until"),
+        # A patron can have at most one active hold per book
+        Index(
+            "uq_holds_active_book_user", "book_id", "user_id", unique=True,
+            postgresql_where=text("status IN ('waiting', 'ready')"),
+            sqlite_where=text("status IN ('waiting', 'ready')"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # Place in the FIFO queue of the book, never changed once taken; cancelled
+    # holds leave gaps between the tickets of the waiting ones, counted in hold_skips
+    ticket = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="waiting")
+    created_at = Column(DateTime, nullable=False)
+    ready_at = Column(DateTime, nullable=True)
+    # When a ready hold expires if its copy has not been borrowed
+    ready_until = Column(DateTime, nullable=True)
+
+# Nodes of a Fenwick tree per book counting the tickets of cancelled waiting
+# holds: node n counts the tickets in (n - (n & -n), n], so the count up to any
+# ticket sums at most 31 nodes and a cancellation adds to at most 31. Nodes are
+# only stored once a ticket they cover has been cancelled.
+class HoldSkip(Base):
+    __tablename__ = "hold_skips"
+
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    node = Column(Integer, primary_key=True)
+    skipped = Column(Integer, nullable=False, default=0)
+
+class Change(Base):
+    __tablename__ = "changes"
+    __table_args__ = (
+        # Backs the change feed of each entity, read in (txid, id) order after a cursor
+        Index("ix_changes_entity_txid_id", "entity", "txid", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # The Postgres transaction that logged the change, which orders the feed by
+    # commit; 0 on databases whose writers are serialized, where ids do
+    txid = Column(BigInteger, nullable=False, default=0, server_default=text("0"))
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    # "upsert" when the entity was created or changed, "delete" for a tombstone
+    op = Column(String, nullable=False)
+    changed_at = Column(DateTime, nullable=False)
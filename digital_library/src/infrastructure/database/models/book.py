@@ -1,10 +1,19 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean, Index, text
 from sqlalchemy.orm import relationship
 
 from infrastructure.database.models import Base
 
 class Book(Base):
     __tablename__ = "books"
+    __table_args__ = (
+        # Backs keyset pagination of the catalog ordered by (title, id)
+        Index("ix_books_title_id", "title", "id"),
+        # Back the listing filters, which are keyset paginated on id
+        Index("ix_books_genre_available_id", "genre", "is_available", "id"),
+        Index("ix_books_author_id", "author", "id"),
+        Index("ix_books_available_id", "is_available", "id"),
+        Index("ix_books_publication_date", "publication_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
@@ -16,5 +25,19 @@ class Book(Base):
     cover_image = Column(String, nullable=True)
     is_available = Column(Boolean, default=True, nullable=False)
     borrower_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    # Incremented by every ORM update, which only applies if the version is unchanged
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
+    __mapper_args__ = {"version_id_col": version}
 
-    borrower = relationship("User", backref="borrowed_books")
\ No newline at end of file
+    borrower = relationship("User", backref="borrowed_books")
+    # One-to-one, joined so that listing pages read availability in the same query
+    holding = relationship("Holding", uselist=False, lazy="joined", back_populates="book", cascade="all, delete-orphan")
+
+    @property
+    def total_copies(self) -> int:
+        # Books created before holdings existed have a single copy
+        return self.holding.total_copies if self.holding else 1
+
+    @property
+    def available_copies(self) -> int:
+        return self.holding.available_copies if self.holding else int(self.is_available)
\ No newline at end of file
@@ -0,0 +1,20 @@
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Index, text
+
+from infrastructure.database.models import Base
+
+class Change(Base):
+    __tablename__ = "changes"
+    __table_args__ = (
+        # Backs the change feed of each entity, read in (txid, id) order after a cursor
+        Index("ix_changes_entity_txid_id", "entity", "txid", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # The Postgres transaction that logged the change, which orders the feed by
+    # commit; 0 on databases whose writers are serialized, where ids do
+    txid = Column(BigInteger, nullable=False, default=0, server_default=text("0"))
+    entity = Column(String, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    # "upsert" when the entity was created or changed, "delete" for a tombstone
+    op = Column(String, nullable=False)
+    changed_at = Column(DateTime, nullable=False)
\ No newline at end of file
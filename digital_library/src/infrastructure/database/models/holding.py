@@ -0,0 +1,72 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, CheckConstraint, text
+from sqlalchemy.orm import relationship
+
+from infrastructure.database.models import Base
+
+class Holding(Base):
+    __tablename__ = "book_holdings"
+    __table_args__ = (
+        CheckConstraint("available_copies >= 0 AND available_copies <= total_copies", name="ck_book_holdings_available"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False, unique=True)
+    total_copies = Column(Integer, nullable=False, default=1)
+    available_copies = Column(Integer, nullable=False, default=1)
+    # Tickets of the last hold dispatched and of the last hold placed on the book
+    hold_head = Column(Integer, nullable=False, default=0)
+    hold_tail = Column(Integer, nullable=False, default=0)
+
+    book = relationship("Book", back_populates="holding")
+
+class Loan(Base):
+    __tablename__ = "loans"
+    __table_args__ = (
+        # Finds the open loan of a borrower on a book when it is returned
+        Index("ix_loans_book_user_returned", "book_id", "user_id", "returned_at"),
+        Index("ix_loans_user_returned", "user_id", "returned_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    borrowed_at = Column(DateTime, nullable=False)
+    returned_at = Column(DateTime, nullable=True)
+
+class Hold(Base):
+    __tablename__ = "holds"
+    __table_args__ = (
+        # Dispatch finds the first waiting hold of a book
+        Index("ix_holds_book_status_ticket", "book_id", "status", "ticket"),
+        # The sweep finds the ready holds past their deadline
+        Index("ix_holds_status_ready_until", "status", "ready_until"),
+        # A patron can have at most one active hold per book
+        Index(
+            "uq_holds_active_book_user", "book_id", "user_id", unique=True,
+            postgresql_where=text("status IN ('waiting', 'ready')"),
+            sqlite_where=text("status IN ('waiting', 'ready')"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # Place in the FIFO queue of the book, never changed once taken; cancelled
+    # holds leave gaps between the tickets of the waiting ones, counted in hold_skips
+    ticket = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="waiting")
+    created_at = Column(DateTime, nullable=False)
+    ready_at = Column(DateTime, nullable=True)
+    # When a ready hold expires if its copy has not been borrowed
+    ready_until = Column(DateTime, nullable=True)
+
+# Nodes of a Fenwick tree per book counting the tickets of cancelled waiting
+# holds: node n counts the tickets in (n - (n & -n), n], so the count up to any
+# ticket sums at most 31 nodes and a cancellation adds to at most 31. Nodes are
+# only stored once a ticket they cover has been cancelled.
+class HoldSkip(Base):
+    __tablename__ = "hold_skips"
+
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    node = Column(Integer, primary_key=True)
+    skipped = Column(Integer, nullable=False, default=0)
\ No newline at end of file
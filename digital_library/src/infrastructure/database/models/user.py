@@ -12,5 +12,7 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     created_at = Column(DateTime, nullable=False)
     updated_at = Column(DateTime, nullable=False)
+    # Set by every update, which only applies if it is unchanged (see users_service.update_user)
+    __mapper_args__ = {"version_id_col": updated_at, "version_id_generator": False}
 
     borrowed_books = relationship("Book", backref="borrower", cascade="all, delete-orphan")
\ No newline at end of file
@@ -0,0 +1,80 @@
+from sqlalchemy import DDL, event, func, literal_column, select, text
+
+from infrastructure.database.models import Book
+
+# Postgres: a stored tsvector over the searchable columns, weighted so that title
+# matches rank above author, genre and description matches, with a GIN index on it
+POSTGRES_SEARCH_DDL = [
+    DDL(
+        "ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(author, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(genre, '')), 'C') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'D')"
+        ") STORED"
+    ),
+    DDL("CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books USING GIN (search_vector)"),
+]
+
+# SQLite: an external-content FTS5 table kept in sync with books by triggers
+SQLITE_SEARCH_DDL = [
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+        "title, author, genre, description, content='books', content_rowid='id')"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN "
+        "INSERT INTO books_fts (rowid, title, author, genre, description) "
+        "VALUES (new.id, new.title, new.author, new.genre, new.description); END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN "
+        "INSERT INTO books_fts (books_fts, rowid, title, author, genre, description) "
+        "VALUES ('delete', old.id, old.title, old.author, old.genre, old.description); END"
+    ),
+    DDL(
+        "CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE ON books BEGIN "
+        "INSERT INTO books_fts (books_fts, rowid, title, author, genre, description) "
+        "VALUES ('delete', old.id, old.title, old.author, old.genre, old.description); "
+        "INSERT INTO books_fts (rowid, title, author, genre, description) "
+        "VALUES (new.id, new.title, new.author, new.genre, new.description); END"
+    ),
+]
+
+for ddl in POSTGRES_SEARCH_DDL:
+    event.listen(Book.__table__, "after_create", ddl.execute_if(dialect="postgresql"))
+for ddl in SQLITE_SEARCH_DDL:
+    event.listen(Book.__table__, "after_create", ddl.execute_if(dialect="sqlite"))
+
+
+def ranked_matches(dialect_name: str, q: str):
+    """
+    Builds a subquery of the books matching a full-text query.
+
+    The subquery has an `id` column and a `score` column where lower scores are
+    better matches, so results can be ordered and keyset paginated by
+    `(score, id)` on every backend.
+
+    Args:
+        dialect_name: The name of the database dialect, e.g. "postgresql" or "sqlite".
+        q: The user's search query.
+
+    Returns:
+        The subquery of matching book IDs and their scores.
+    """
+    if dialect_name == "postgresql":
+        search_vector = literal_column("books.search_vector")
+        tsquery = func.websearch_to_tsquery("english", q)
+        return (
+            select(Book.id.label("id"), (-func.ts_rank_cd(search_vector, tsquery)).label("score"))
+            .where(search_vector.op("@@")(tsquery))
+            .subquery()
+        )
+    # FTS5 treats punctuation as query syntax, so every term is matched as a quoted string
+    match = " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+    return (
+        select(literal_column("books_fts.rowid").label("id"), literal_column("bm25(books_fts)").label("score"))
+        .select_from(text("books_fts"))
+        .where(text("books_fts MATCH :match").bindparams(match=match))
+        .subquery()
+    )
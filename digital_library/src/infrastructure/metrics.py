@@ -0,0 +1,478 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import redis.asyncio as redis
+
+from infrastructure.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+# A sample is identified by its name and label pairs, e.g. ("x_bucket", (("route", "/books"), ("le", "0.1")))
+SampleKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Metric:
+    """
+    Base class of all metrics.
+
+    Metrics are updated with plain in-process additions and no lock: they are only
+    updated from the event loop thread, which never runs two updates at once, and
+    every worker process has its own registry.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        """
+        Initializes the metric.
+
+        Args:
+            name: The metric name.
+            documentation: The help text of the metric.
+            labelnames: The names of the labels every sample carries.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    @property
+    def cumulative(self) -> bool:
+        """Whether the samples only grow, so that they add up across workers and restarts."""
+        return self.type in ("counter", "histogram")
+
+    def samples(self) -> Iterator[Tuple[SampleKey, float]]:
+        """Yields the current value of every sample of the metric."""
+        raise NotImplementedError
+
+    def _pairs(self, labels: Labels) -> Tuple[Tuple[str, str], ...]:
+        return tuple(zip(self.labelnames, labels))
+
+
+class Counter(Metric):
+    """
+    Monotonically increasing count, with one series per label set.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        """
+        Increments the counter.
+
+        Args:
+            labels: The label values, in the order of `labelnames`.
+            amount: How much to add.
+        """
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterator[Tuple[SampleKey, float]]:
+        for labels, value in self._values.items():
+            yield (self.name, self._pairs(labels)), value
+
+
+class Histogram(Metric):
+    """
+    Prometheus-style histogram with fixed buckets and one series per label set.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        """
+        Initializes the histogram.
+
+        Args:
+            name: The metric name.
+            documentation: The help text of the metric.
+            labelnames: The names of the labels every observation is made with.
+            buckets: The upper bounds of the buckets, in increasing order.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> ([count per bucket, then above the last bucket], sum)
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """
+        Records one observation.
+
+        Args:
+            value: The observed value.
+            labels: The label values, in the order of `labelnames`.
+        """
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def samples(self) -> Iterator[Tuple[SampleKey, float]]:
+        for labels, (counts, total) in self._series.items():
+            pairs = self._pairs(labels)
+            cumulative = 0
+            for bound, count in zip((*map(_format_float, self.buckets), "+Inf"), counts):
+                cumulative += count
+                yield (f"{self.name}_bucket", pairs + (("le", bound),)), cumulative
+            yield (f"{self.name}_sum", pairs), total[0]
+            yield (f"{self.name}_count", pairs), cumulative
+
+
+class CallbackMetric(Metric):
+    """
+    Metric whose values are read from another component when metrics are collected.
+
+    Suits values that component already keeps, such as connection pool or cache
+    statistics, at no cost outside of collection.
+    """
+
+    def __init__(self, name: str, documentation: str, type: str, labelnames: Sequence[str], callback: Callable[[], Dict[Labels, float]]) -> None:
+        """
+        Initializes the metric.
+
+        Args:
+            name: The metric name.
+            documentation: The help text of the metric.
+            type: Either "counter", for values that only grow, or "gauge".
+            labelnames: The names of the labels of the samples.
+            callback: Returns the current values by label values.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self.callback = callback
+
+    def samples(self) -> Iterator[Tuple[SampleKey, float]]:
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.warning("Collecting metric %s failed: %s", self.name, e)
+            return
+        for labels, value in values.items():
+            yield (self.name, self._pairs(labels)), float(value)
+
+
+class MetricsRegistry:
+    """
+    The set of metrics of a worker.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Registers a counter, or retrieves the one already registered under `name`."""
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Registers a histogram, or retrieves the one already registered under `name`."""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, type: str, labelnames: Sequence[str], callback: Callable[[], Dict[Labels, float]]) -> CallbackMetric:
+        """Registers a metric read through `callback`, replacing any registered under `name`."""
+        self._metrics[name] = CallbackMetric(name, documentation, type, labelnames, callback)
+        return self._metrics[name]
+
+    def collect(self, cumulative: bool) -> Dict[SampleKey, float]:
+        """
+        Reads the current value of every sample.
+
+        Args:
+            cumulative: True for the samples of counters and histograms, False for
+                the samples of gauges.
+
+        Returns:
+            Dict[SampleKey, float]: The values by sample.
+        """
+        return {
+            key: value
+            for metric in self._metrics.values() if metric.cumulative == cumulative
+            for key, value in metric.samples()
+        }
+
+    def render(self, values: Optional[Dict[SampleKey, float]] = None) -> str:
+        """
+        Renders metrics in the Prometheus text exposition format.
+
+        Args:
+            values: The sample values to render, e.g. aggregated over all workers;
+                by default the values of this worker.
+
+        Returns:
+            str: The exposition, one sample per line.
+        """
+        if values is None:
+            values = {**self.collect(cumulative=True), **self.collect(cumulative=False)}
+        by_name: Dict[str, List[Tuple[SampleKey, float]]] = {}
+        for key, value in values.items():
+            by_name.setdefault(key[0], []).append((key, value))
+        lines = []
+        for metric in self._metrics.values():
+            names = [f"{metric.name}_bucket", f"{metric.name}_sum", f"{metric.name}_count"] if metric.type == "histogram" else [metric.name]
+            samples = [sample for name in names for sample in by_name.get(name, ())]
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for (name, pairs), value in sorted(samples, key=_series_order):
+                lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+        return "".join(f"{line}\n" for line in lines)
+
+    def _register(self, metric: Metric) -> Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+
+class MetricsStore:
+    """
+    Interface shared by all metrics stores.
+
+    Every worker periodically adds the increments of its counters and histograms
+    to totals shared by all workers, so the totals keep growing when a worker
+    exits or restarts, and stores a snapshot of its gauges that expires unless it
+    is refreshed, so only the gauges of live workers are summed.
+    """
+
+    async def publish(self, worker: str, increments: Dict[SampleKey, float], gauges: Dict[SampleKey, float], ttl: int) -> bool:
+        """
+        Adds a worker's increments to the totals and replaces its gauges.
+
+        Args:
+            worker: The ID of the worker.
+            increments: How much each cumulative sample grew since the last publish.
+            gauges: The current value of each gauge sample of the worker.
+            ttl: How long the gauges remain valid, in seconds.
+
+        Returns:
+            bool: True if the metrics were stored. False means none of the
+            increments were added, as they are published again next time.
+        """
+        raise NotImplementedError
+
+    async def collect(self) -> Dict[SampleKey, float]:
+        """
+        Retrieves the totals and the sum of the live workers' gauges.
+
+        Returns:
+            Dict[SampleKey, float]: The aggregated values by sample.
+        """
+        raise NotImplementedError
+
+
+class RedisMetricsStore(MetricsStore):
+    """
+    Metrics store aggregating the workers' metrics in Redis.
+
+    The totals are a single hash updated with HINCRBYFLOAT, and the gauges of each
+    worker a key with a TTL, listed in a sorted set by last update time. Publishing
+    is one MULTI/EXEC transaction, so a publish that fails adds none of its
+    increments and the exporter can send them again without counting them twice;
+    collecting is two round trips.
+    """
+
+    def __init__(self, client: redis.Redis, prefix: str) -> None:
+        """
+        Initializes the store with a Redis client.
+
+        Args:
+            client: The asyncio Redis client to use.
+            prefix: The prefix of the metrics keys.
+        """
+        self.client = client
+        self.prefix = prefix
+
+    async def publish(self, worker: str, increments: Dict[SampleKey, float], gauges: Dict[SampleKey, float], ttl: int) -> bool:
+        now = time.time()
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                for key, amount in increments.items():
+                    pipe.hincrbyfloat(f"{self.prefix}totals", _encode_key(key), amount)
+                pipe.set(f"{self.prefix}gauges:{worker}", json.dumps([[list(key), value] for key, value in gauges.items()]), ex=ttl)
+                pipe.zadd(f"{self.prefix}workers", {worker: now})
+                pipe.zremrangebyscore(f"{self.prefix}workers", "-inf", now - ttl)
+                await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Publishing metrics failed: %s", e)
+            return False
+        return True
+
+    async def collect(self) -> Dict[SampleKey, float]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(f"{self.prefix}totals")
+            pipe.zrange(f"{self.prefix}workers", 0, -1)
+            totals, workers = await pipe.execute()
+        snapshots = await self.client.mget([f"{self.prefix}gauges:{worker.decode()}" for worker in workers]) if workers else []
+        values = {_decode_key(key): float(value) for key, value in totals.items()}
+        for snapshot in snapshots:
+            # Gauges of workers that stopped publishing have expired
+            for (name, pairs), value in json.loads(snapshot) if snapshot else ():
+                key = (name, tuple(map(tuple, pairs)))
+                values[key] = values.get(key, 0.0) + value
+        return values
+
+
+class InMemoryMetricsStore(MetricsStore):
+    """
+    Metrics store keeping the aggregated metrics in a process-local dictionary.
+
+    Intended for local development and tests, where no Redis server is available
+    and there is a single worker.
+    """
+
+    def __init__(self) -> None:
+        self._totals: Dict[SampleKey, float] = {}
+        self._gauges: Dict[str, Tuple[float, Dict[SampleKey, float]]] = {}
+
+    async def publish(self, worker: str, increments: Dict[SampleKey, float], gauges: Dict[SampleKey, float], ttl: int) -> bool:
+        for key, amount in increments.items():
+            self._totals[key] = self._totals.get(key, 0.0) + amount
+        self._gauges[worker] = (time.monotonic() + ttl, dict(gauges))
+        return True
+
+    async def collect(self) -> Dict[SampleKey, float]:
+        values = dict(self._totals)
+        now = time.monotonic()
+        for expires_at, gauges in self._gauges.values():
+            if expires_at > now:
+                for key, value in gauges.items():
+                    values[key] = values.get(key, 0.0) + value
+        return values
+
+
+class MetricsExporter:
+    """
+    Publishes the metrics of a worker to a metrics store and renders the
+    aggregated metrics of all workers.
+    """
+
+    def __init__(self, registry: "MetricsRegistry", store: MetricsStore, interval: float, worker: Optional[str] = None) -> None:
+        """
+        Initializes the exporter.
+
+        Args:
+            registry: The registry of the worker.
+            store: The store shared by all workers.
+            interval: How often the worker publishes its metrics, in seconds.
+            worker: The ID of the worker, by default its host name and process ID.
+        """
+        self.registry = registry
+        self.store = store
+        self.interval = interval
+        self.worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        self._published: Dict[SampleKey, float] = {}
+        # Concurrent publishes would both add the increments since the same publish
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self) -> None:
+        """Publishes what the worker's counters and histograms gained since the last publish, and its gauges."""
+        async with self._lock:
+            current = self.registry.collect(cumulative=True)
+            increments = {
+                key: value - self._published.get(key, 0.0)
+                for key, value in current.items() if value != self._published.get(key)
+            }
+            gauges = self.registry.collect(cumulative=False)
+            # Gauges outlive a few missed publishes before they are dropped
+            if await self.store.publish(self.worker, increments, gauges, int(self.interval * 3) + 1):
+                self._published = current
+
+    async def render(self) -> str:
+        """
+        Renders the metrics of all workers in the Prometheus text exposition format.
+
+        Falls back to the metrics of this worker alone if the store is unavailable.
+        """
+        await self.publish()
+        try:
+            values = await self.store.collect()
+        except redis.RedisError as e:
+            logger.warning("Collecting metrics failed, serving this worker's only: %s", e)
+            values = None
+        return self.registry.render(values)
+
+    async def start(self) -> None:
+        """Starts publishing the worker's metrics periodically."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops publishing, after a last publish of the worker's metrics."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            await self.publish()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.publish()
+
+
+def _encode_key(key: SampleKey) -> str:
+    return json.dumps([key[0], [list(pair) for pair in key[1]]], separators=(",", ":"))
+
+
+def _decode_key(field: bytes) -> SampleKey:
+    name, pairs = json.loads(field)
+    return name, tuple(map(tuple, pairs))
+
+
+def _series_order(sample: Tuple[SampleKey, float]):
+    # Groups the samples of a series together, buckets in increasing order
+    (name, pairs), _ = sample
+    series = tuple(pair for pair in pairs if pair[0] != "le")
+    bound = next((float(value) for label, value in pairs if label == "le"), 0.0)
+    return series, not name.endswith("_bucket"), bound, name
+
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_float(value: float) -> str:
+    return repr(float(value))
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+# The registry of this worker
+registry = MetricsRegistry()
+
+
+@lru_cache
+def get_metrics_exporter() -> MetricsExporter:
+    """
+    Retrieves the metrics exporter of this worker, publishing to the store selected
+    by `settings.METRICS_BACKEND`.
+
+    Returns:
+        MetricsExporter: An exporter to an in-process store when the backend is
+        "memory", otherwise to a store shared by all workers through Redis.
+    """
+    if settings.METRICS_BACKEND == "memory":
+        store: MetricsStore = InMemoryMetricsStore()
+    else:
+        from infrastructure.cache import get_redis
+
+        store = RedisMetricsStore(get_redis(), prefix=f"{settings.CACHE_PREFIX}metrics:")
+    return MetricsExporter(registry, store, float(settings.METRICS_PUSH_INTERVAL_SECONDS))
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from infrastructure.timing import instrument_engine
+
+logger = logging.getLogger(__name__)
+
+# How EXPLAIN is spelled per dialect; statements on other databases are logged without a plan
+EXPLAIN_PREFIXES = {"postgresql": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN "}
+
+# The number of distinct slow statements whose plan is remembered as already logged
+EXPLAINED_MAXSIZE = 1000
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a block runs more SQL statements than its budget allows.
+    """
+
+
+class QueryTracker:
+    """
+    The SQL statements run by one request or test block.
+
+    A statement run again and again with different parameters is the mark of an
+    N+1 pattern, e.g. loading a relationship once per row of a listing, and is
+    flagged when it reaches `repeat_threshold` executions.
+    """
+
+    def __init__(self, repeat_threshold: int = 5, label: str = "block") -> None:
+        """
+        Initializes the tracker.
+
+        Args:
+            repeat_threshold: The number of executions of a statement with distinct
+                parameters at which it is flagged (0 disables flagging).
+            label: What is being tracked, e.g. "GET /api/v1/books", for the logs.
+        """
+        self.repeat_threshold = repeat_threshold
+        self.label = label
+        self.total = 0
+        self.counts: Dict[str, int] = {}
+        self._seen: Set[Tuple[str, str]] = set()
+
+    def record(self, statement: str, parameters) -> None:
+        """
+        Records one execution of a statement.
+
+        Args:
+            statement: The SQL sent to the database.
+            parameters: The parameters it was sent with.
+        """
+        self.total += 1
+        key = (statement, repr(parameters))
+        if key in self._seen:
+            return
+        self._seen.add(key)
+        count = self.counts[statement] = self.counts.get(statement, 0) + 1
+        if count == self.repeat_threshold:
+            logger.warning(
+                "Possible N+1 queries in %s: statement run %d times with different parameters: %s",
+                self.label, count, _shorten(statement),
+            )
+
+    def repeated(self) -> List[Tuple[str, int]]:
+        """
+        Lists the flagged statements.
+
+        Returns:
+            List[Tuple[str, int]]: The statements run at least `repeat_threshold`
+            times with different parameters, with their count, most repeated first.
+        """
+        if not self.repeat_threshold:
+            return []
+        return sorted(
+            ((statement, count) for statement, count in self.counts.items() if count >= self.repeat_threshold),
+            key=lambda item: -item[1],
+        )
+
+
+# The tracker of the request or test block being run, if any
+_current: ContextVar[Optional[QueryTracker]] = ContextVar("query_tracker", default=None)
+
+
+@contextmanager
+def track_queries(budget: Optional[int] = None, repeat_threshold: int = 5, label: str = "block") -> Iterator[QueryTracker]:
+    """
+    Tracks the SQL statements run within a block, including by the tasks it starts.
+
+    Intended for tests, to pin the number of statements an operation runs:
+
+        with track_queries(budget=2):
+            client.get("/api/v1/books")
+
+    Args:
+        budget: The largest number of statements the block may run, if limited.
+        repeat_threshold: See `QueryTracker`.
+        label: See `QueryTracker`.
+
+    Raises:
+        QueryBudgetExceeded: If the block ran more statements than `budget`.
+    """
+    tracker = QueryTracker(repeat_threshold, label)
+    token = _current.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current.reset(token)
+    if budget is not None and tracker.total > budget:
+        repeated = "".join(f"\n  {count} x {_shorten(statement)}" for statement, count in tracker.repeated())
+        raise QueryBudgetExceeded(f"{tracker.label} ran {tracker.total} SQL statements, over the budget of {budget}{repeated}")
+
+
+def instrument_queries(engine: AsyncEngine, slow_query_ms: float = 0, explain: bool = True) -> None:
+    """
+    Feeds the SQL statements run on an engine to the current tracker, and logs
+    slow statements.
+
+    Statements are timed by the listeners of `timing.instrument_engine`.
+
+    Args:
+        engine: The engine to instrument, normally the one shared by the process.
+        slow_query_ms: The duration from which a statement is logged as slow, in
+            milliseconds (0 disables the slow query log).
+        explain: Whether to log the plan of slow reads. The plan of each distinct
+            statement is logged once per worker, which bounds the load the log puts
+            on the database. EXPLAIN runs in the background on a connection of its
+            own, so the request that ran the statement does not wait for it.
+    """
+    slow_query_seconds = slow_query_ms / 1000
+    explained: "OrderedDict[str, None]" = OrderedDict()
+
+    def observe(conn, statement: str, parameters, executemany: bool, elapsed: float) -> None:
+        tracker = _current.get()
+        if tracker is not None:
+            tracker.record(statement, parameters)
+        if not slow_query_seconds or elapsed < slow_query_seconds:
+            return
+        # Parameters are left out: they may hold personal data or password hashes
+        if explain and not executemany and statement not in explained and _explainable(conn, statement):
+            explained[statement] = None
+            if len(explained) > EXPLAINED_MAXSIZE:
+                explained.popitem(last=False)
+            try:
+                task = asyncio.get_running_loop().create_task(_log_with_plan(engine, statement, parameters, elapsed))
+            except RuntimeError:
+                pass
+            else:
+                _explaining.add(task)
+                task.add_done_callback(_explaining.discard)
+                return
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement)
+
+    instrument_engine(engine, observe)
+
+
+# The EXPLAIN tasks still running, referenced so they are not garbage collected
+_explaining: Set[asyncio.Task] = set()
+
+
+def _explainable(conn, statement: str) -> bool:
+    # Only reads are explained, so looking at a plan never risks a side effect
+    return conn.dialect.name in EXPLAIN_PREFIXES and statement.lstrip()[:6].upper() == "SELECT"
+
+
+async def _log_with_plan(engine: AsyncEngine, statement: str, parameters, elapsed: float) -> None:
+    try:
+        async with engine.connect() as conn:
+            result = await conn.exec_driver_sql(EXPLAIN_PREFIXES[engine.dialect.name] + statement, parameters)
+            plan = "\n".join(str(row[-1]) for row in result)
+    except Exception as e:
+        logger.warning("EXPLAIN failed: %s", e)
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement)
+        return
+    logger.warning("Slow query (%.1f ms): %s\nPlan:\n%s", elapsed * 1000, statement, plan)
+
+
+def _shorten(statement: str, width: int = 200) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= width else statement[: width - 3] + "..."
+
+
+class QueryGuardMiddleware:
+    """
+    ASGI middleware tracking the SQL statements of every HTTP request, for
+    development and test environments.
+
+    Statements repeated with different parameters are logged as possible N+1
+    queries, and requests running more statements than a budget are logged too.
+    """
+
+    def __init__(self, app: ASGIApp, repeat_threshold: int = 5, budget: int = 0) -> None:
+        """
+        Initializes the middleware.
+
+        Args:
+            app: The application to wrap.
+            repeat_threshold: See `QueryTracker`.
+            budget: The number of statements a request may run before it is logged
+                (0 disables the check).
+        """
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+        self.budget = budget
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with track_queries(repeat_threshold=self.repeat_threshold, label=f"{scope['method']} {scope['path']}") as tracker:
+            await self.app(scope, receive, send)
+        if self.budget and tracker.total > self.budget:
+            logger.warning("%s ran %d SQL statements, over the budget of %d", tracker.label, tracker.total, self.budget)
@@ -0,0 +1,148 @@
+import logging
+import math
+import time
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import redis.asyncio as redis
+
+from infrastructure.config import settings
+from infrastructure.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitStore:
+    """
+    Interface shared by all rate limit stores.
+
+    Limits are enforced with a sliding window counter: each key keeps a count for
+    the current fixed window and the previous one, and the previous count is
+    weighted by how much of it still overlaps the sliding window. That approximates
+    a true sliding log in O(1) time and memory per key.
+    """
+
+    async def hit(self, key: str, limit: int, window: int) -> Optional[int]:
+        """
+        Records one attempt for `key` and checks it against the limit.
+
+        Args:
+            key: The rate limited identity, e.g. an IP address or a username.
+            limit: The number of attempts allowed per sliding window.
+            window: The length of the sliding window in seconds.
+
+        Returns:
+            Optional[int]: None if the attempt is allowed, otherwise the number of
+            seconds after which the client may retry.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _check(now: float, window: int, limit: int, current: int, previous: int) -> Optional[int]:
+        elapsed = now % window
+        if previous * (1 - elapsed / window) + current <= limit:
+            return None
+        # The earliest moment a retry fits, counting the retry itself: rejected
+        # attempts are counted too, so waiting for the count to reach the limit
+        # exactly would only get the retry rejected again
+        if previous and current < limit:
+            # The weight of the previous window decays linearly until the retry fits
+            return max(1, math.ceil(window * (1 - (limit - current - 1) / previous) - elapsed))
+        # Only the next window can make room, where this window's count decays in turn
+        return max(1, math.ceil(window - elapsed + window * max(0.0, 1 - (limit - 1) / current)))
+
+
+class RedisRateLimitStore(RateLimitStore):
+    """
+    Rate limit store keeping its window counters in Redis, shared by all workers.
+
+    Every check is a single round trip (INCR and EXPIRE of the current window and
+    GET of the previous one, pipelined). Redis errors are logged and the attempt
+    is allowed, so an unavailable Redis never locks users out.
+    """
+
+    def __init__(self, client: redis.Redis, prefix: str) -> None:
+        """
+        Initializes the store with a Redis client.
+
+        Args:
+            client: The asyncio Redis client to use.
+            prefix: The prefix of the counter keys.
+        """
+        self.client = client
+        self.prefix = prefix
+
+    async def hit(self, key: str, limit: int, window: int) -> Optional[int]:
+        now = time.time()
+        index = int(now // window)
+        current_key = f"{self.prefix}{key}:{index}"
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.incr(current_key)
+                pipe.expire(current_key, 2 * window)
+                pipe.get(f"{self.prefix}{key}:{index - 1}")
+                current, _, previous = await pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Rate limit check failed for %s: %s", key, e)
+            return None
+        return self._check(now, window, limit, int(current), int(previous or 0))
+
+
+class InMemoryRateLimitStore(RateLimitStore):
+    """
+    Rate limit store keeping its window counters in a process-local dictionary.
+
+    Intended for local development and tests, where no Redis server is available.
+    The counters of a key are useless two windows after its last hit, so, like
+    the expiring Redis keys, they are dropped: whenever the dictionary has
+    doubled since the last sweep, the stale keys are pruned, which keeps writes
+    O(1) amortized and the memory proportional to the recently active keys.
+    """
+
+    def __init__(self, prune_size: int = 1024) -> None:
+        """
+        Initializes the store.
+
+        Args:
+            prune_size: The number of keys from which stale ones are first pruned.
+        """
+        self.prune_size = prune_size
+        self._prune_at = prune_size
+        # The window index, current and previous counts, and expiry of every key
+        self._windows: Dict[str, Tuple[int, int, int, float]] = {}
+
+    async def hit(self, key: str, limit: int, window: int) -> Optional[int]:
+        now = time.time()
+        index = int(now // window)
+        last_index, current, previous, _ = self._windows.get(key, (index, 0, 0, 0.0))
+        if last_index == index - 1:
+            current, previous = 0, current
+        elif last_index != index:
+            current, previous = 0, 0
+        current += 1
+        self._windows[key] = (index, current, previous, (index + 2) * window)
+        if len(self._windows) >= self._prune_at:
+            self._prune(now)
+        return self._check(now, window, limit, current, previous)
+
+    def clear(self) -> None:
+        """Forgets every counter."""
+        self._windows.clear()
+
+    def _prune(self, now: float) -> None:
+        self._windows = {key: entry for key, entry in self._windows.items() if entry[3] > now}
+        self._prune_at = max(self.prune_size, 2 * len(self._windows))
+
+
+@lru_cache
+def get_rate_limit_store() -> RateLimitStore:
+    """
+    Retrieves the rate limit store selected by `settings.RATE_LIMIT_BACKEND`.
+
+    Returns:
+        RateLimitStore: An in-process store when the backend is "memory", otherwise
+        a store shared by all workers through Redis.
+    """
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return InMemoryRateLimitStore()
+    return RedisRateLimitStore(get_redis(), prefix=f"{settings.CACHE_PREFIX}ratelimit:")
@@ -0,0 +1,211 @@
+import asyncio
+import functools
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional
+from weakref import WeakKeyDictionary
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from infrastructure.metrics import registry
+
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Wall time of HTTP requests, until the last body byte is sent.", ("method", "route")
+)
+REQUEST_DB_DURATION = registry.histogram(
+    "http_request_db_duration_seconds", "Time HTTP requests spent executing SQL statements.", ("method", "route")
+)
+REQUEST_QUERIES = registry.histogram(
+    "http_request_queries", "Number of SQL statements executed by HTTP requests.", ("method", "route"), QUERY_BUCKETS
+)
+REQUEST_SERIALIZE_DURATION = registry.histogram(
+    "http_request_serialize_duration_seconds",
+    "Time HTTP requests spent validating and encoding the response after the endpoint returned.",
+    ("method", "route"),
+)
+
+
+class RequestTimings:
+    """
+    Where the time of one request goes, accumulated while it is being handled.
+    """
+
+    __slots__ = ("start", "db", "queries", "endpoint_end", "response_start")
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.endpoint_end: Optional[float] = None
+        self.response_start: Optional[float] = None
+
+    def server_timing(self) -> str:
+        """
+        Formats the timings up to the response headers as a `Server-Timing` header.
+
+        "app" is the time spent in the endpoint and its dependencies outside SQL, e.g.
+        building response models; "serialize" is the time FastAPI then spent
+        validating and encoding the response.
+        """
+        end = self.response_start or time.perf_counter()
+        total = end - self.start
+        serialize = end - self.endpoint_end if self.endpoint_end else 0.0
+        app = max(total - self.db - serialize, 0.0)
+        return (
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries", '
+            f"app;dur={app * 1000:.1f}, serialize;dur={serialize * 1000:.1f}, total;dur={total * 1000:.1f}"
+        )
+
+
+# The timings of the request being handled, if any
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+# Called with the connection, statement, parameters, executemany flag and duration
+# in seconds of every statement that succeeds on an instrumented engine
+QueryObserver = Callable[[Any, str, Any, bool, float], None]
+
+_observers: "WeakKeyDictionary[Engine, List[QueryObserver]]" = WeakKeyDictionary()
+
+
+def instrument_engine(engine: AsyncEngine, observer: Optional[QueryObserver] = None) -> None:
+    """
+    Accounts the SQL statements run on an engine to the request that runs them.
+
+    The listeners are registered once per engine, however often this is called,
+    so that other instrumentation can share their timing instead of adding its own.
+
+    Args:
+        engine: The engine to instrument, normally the one shared by the process.
+        observer: A function to also call with every statement and its duration.
+    """
+    observers = _observers.setdefault(engine.sync_engine, [])
+    if observer is not None:
+        observers.append(observer)
+    if event.contains(engine.sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = _account(conn)
+    for observer in _observers.get(conn.engine, ()):
+        observer(conn, statement, parameters, executemany, elapsed)
+
+
+def _handle_error(exception_context) -> None:
+    # Failed statements never reach after_cursor_execute
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        _account(exception_context.connection)
+
+
+def _account(conn) -> float:
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    timings = _current.get()
+    if timings is not None:
+        timings.db += elapsed
+        timings.queries += 1
+    return elapsed
+
+
+class TimedRoute(APIRoute):
+    """
+    Route that marks when its endpoint returns.
+
+    The time FastAPI then spends validating the returned value against the response
+    model and encoding it is reported as serialization time.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, _mark_endpoint_end(endpoint), **kwargs)
+
+
+def _mark_endpoint_end(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    # functools.wraps keeps the signature FastAPI reads the parameters from
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed_endpoint(*args: Any, **kwargs: Any) -> Any:
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _mark(time.perf_counter())
+    else:
+        @functools.wraps(endpoint)
+        def timed_endpoint(*args: Any, **kwargs: Any) -> Any:
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _mark(time.perf_counter())
+    return timed_endpoint
+
+
+def _mark(now: float) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.endpoint_end = now
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware measuring the wall time, SQL time, SQL statement count and
+    serialization time of every HTTP request.
+
+    The measurements are observed in histograms labelled by method and route
+    template, and optionally sent to the client in a `Server-Timing` header.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = True) -> None:
+        """
+        Initializes the middleware.
+
+        Args:
+            app: The application to wrap.
+            server_timing: Whether to add the `Server-Timing` header to responses.
+        """
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _current.set(timings)
+
+        async def send_with_timings(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                timings.response_start = time.perf_counter()
+                if self.server_timing:
+                    MutableHeaders(scope=message).append("Server-Timing", timings.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _current.reset(token)
+            _observe(scope, timings)
+
+
+def _observe(scope: Scope, timings: RequestTimings) -> None:
+    # Label by route template, e.g. "/api/v1/books/{book_id}", to bound the number of series
+    route = getattr(scope.get("route"), "path", None) or "unmatched"
+    labels = (scope["method"], route)
+    REQUEST_DURATION.observe(time.perf_counter() - timings.start, *labels)
+    REQUEST_DB_DURATION.observe(timings.db, *labels)
+    REQUEST_QUERIES.observe(timings.queries, *labels)
+    if timings.endpoint_end and timings.response_start:
+        REQUEST_SERIALIZE_DURATION.observe(timings.response_start - timings.endpoint_end, *labels)
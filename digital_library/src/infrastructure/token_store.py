@@ -0,0 +1,167 @@
+import logging
+import time
+from functools import lru_cache
+from typing import Dict
+
+import redis.asyncio as redis
+
+from infrastructure.config import settings
+from infrastructure.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class TokenStore:
+    """
+    Interface shared by all token stores.
+
+    The store holds two kinds of short-lived markers, each expiring with the
+    tokens it refers to: the IDs (`jti`) of refresh tokens that have already been
+    used, and the revoked token families. Every operation is a single O(1)
+    lookup or write, so token checks never need the users table.
+    """
+
+    async def claim(self, jti: str, ttl: int) -> bool:
+        """
+        Marks a refresh token as used.
+
+        Args:
+            jti: The ID of the refresh token.
+            ttl: How long to remember it, i.e. the remaining lifetime of the token.
+
+        Returns:
+            bool: True the first time a token is claimed, False on every reuse.
+        """
+        raise NotImplementedError
+
+    async def revoke(self, family: str, ttl: int) -> None:
+        """
+        Revokes every token of a family.
+
+        Args:
+            family: The family ID shared by the tokens issued from one login.
+            ttl: How long to remember it, i.e. the longest remaining token lifetime.
+        """
+        raise NotImplementedError
+
+    async def is_revoked(self, family: str) -> bool:
+        """
+        Checks whether a token family has been revoked.
+
+        Args:
+            family: The family ID.
+
+        Returns:
+            bool: True if the family has been revoked.
+        """
+        raise NotImplementedError
+
+
+class RedisTokenStore(TokenStore):
+    """
+    Token store keeping its markers in Redis with a TTL, shared by all workers.
+
+    Claims use SET NX so that two concurrent refreshes with the same token cannot
+    both succeed. Redis errors fail closed for refreshes (the claim is refused)
+    but open for revocation checks, so a Redis outage does not log everyone out.
+    """
+
+    def __init__(self, client: redis.Redis, prefix: str) -> None:
+        """
+        Initializes the store with a Redis client.
+
+        Args:
+            client: The asyncio Redis client to use.
+            prefix: The prefix of the marker keys.
+        """
+        self.client = client
+        self.prefix = prefix
+
+    async def claim(self, jti: str, ttl: int) -> bool:
+        try:
+            return bool(await self.client.set(f"{self.prefix}used:{jti}", b"1", ex=max(1, ttl), nx=True))
+        except redis.RedisError as e:
+            logger.warning("Refresh token claim failed for %s: %s", jti, e)
+            return False
+
+    async def revoke(self, family: str, ttl: int) -> None:
+        try:
+            await self.client.set(f"{self.prefix}revoked:{family}", b"1", ex=max(1, ttl))
+        except redis.RedisError as e:
+            logger.warning("Token family revocation failed for %s: %s", family, e)
+
+    async def is_revoked(self, family: str) -> bool:
+        try:
+            return bool(await self.client.exists(f"{self.prefix}revoked:{family}"))
+        except redis.RedisError as e:
+            logger.warning("Token revocation check failed for %s: %s", family, e)
+            return False
+
+
+class InMemoryTokenStore(TokenStore):
+    """
+    Token store keeping its markers in a process-local dictionary.
+
+    Intended for local development and tests, where no Redis server is available.
+    Expired markers are dropped when they are next looked up and, so that markers
+    nobody looks up again do not pile up, whenever the dictionary has doubled
+    since the last sweep, which keeps writes O(1) amortized.
+    """
+
+    def __init__(self, prune_size: int = 1024) -> None:
+        """
+        Initializes the store.
+
+        Args:
+            prune_size: The number of markers from which expired ones are first pruned.
+        """
+        self.prune_size = prune_size
+        self._prune_at = prune_size
+        self._markers: Dict[str, float] = {}
+
+    async def claim(self, jti: str, ttl: int) -> bool:
+        key = f"used:{jti}"
+        if self._alive(key):
+            return False
+        self._set(key, ttl)
+        return True
+
+    async def revoke(self, family: str, ttl: int) -> None:
+        self._set(f"revoked:{family}", ttl)
+
+    async def is_revoked(self, family: str) -> bool:
+        return self._alive(f"revoked:{family}")
+
+    def clear(self) -> None:
+        """Forgets every marker."""
+        self._markers.clear()
+
+    def _set(self, key: str, ttl: int) -> None:
+        now = time.monotonic()
+        self._markers[key] = now + ttl
+        if len(self._markers) >= self._prune_at:
+            self._markers = {marker: expires_at for marker, expires_at in self._markers.items() if expires_at > now}
+            self._prune_at = max(self.prune_size, 2 * len(self._markers))
+
+    def _alive(self, key: str) -> bool:
+        expires_at = self._markers.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._markers[key]
+            return False
+        return True
+
+
+@lru_cache
+def get_token_store() -> TokenStore:
+    """
+    Retrieves the token store selected by `settings.TOKEN_STORE_BACKEND`.
+
+    Returns:
+        TokenStore: An in-process store when the backend is "memory", otherwise a
+        store shared by all workers through Redis.
+    """
+    if settings.TOKEN_STORE_BACKEND == "memory":
+        return InMemoryTokenStore()
+    return RedisTokenStore(get_redis(), prefix=f"{settings.CACHE_PREFIX}tokens:")
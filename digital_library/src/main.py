@@ -1,9 +1,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from infrastructure.database import initialize_database
+from infrastructure.database.db_session import engine
+from infrastructure.cache import start_cache, stop_cache
+from infrastructure.compression import CompressionMiddleware
 from infrastructure.config import settings
+from infrastructure.metrics import get_metrics_exporter
+from infrastructure.query_guard import QueryGuardMiddleware, instrument_queries
+from infrastructure.timing import TimingMiddleware, instrument_engine
 from api.v1 import api_router
+from api.v1.services.holds_service import start_hold_sweeper, stop_hold_sweeper
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -19,15 +27,69 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
+# Measure every request, including the time spent in the middlewares above
+if settings.MONITORING_ENABLED:
+    instrument_engine(engine)
+    app.add_middleware(TimingMiddleware, server_timing=settings.SERVER_TIMING_ENABLED)
+
+# Compress responses the client accepts compressed, once they are large enough.
+# Added after the timing middleware so that it wraps it: holding back the start
+# of a response until its first body part then does not skew the timings
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        levels=settings.COMPRESSION_LEVELS,
+        minimum_size=int(settings.COMPRESSION_MIN_SIZE),
+    )
+
+# Flag N+1 queries in development and tests, log slow statements everywhere
+if settings.QUERY_GUARD_ENABLED or float(settings.SLOW_QUERY_THRESHOLD_MS):
+    instrument_queries(engine, float(settings.SLOW_QUERY_THRESHOLD_MS), settings.SLOW_QUERY_EXPLAIN)
+if settings.QUERY_GUARD_ENABLED:
+    app.add_middleware(
+        QueryGuardMiddleware,
+        repeat_threshold=int(settings.QUERY_REPEAT_THRESHOLD),
+        budget=int(settings.QUERY_BUDGET_PER_REQUEST),
+    )
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        """
+        Serves the metrics of all workers in the Prometheus text format.
+        """
+        return PlainTextResponse(await get_metrics_exporter().render(), media_type="text/plain; version=0.0.4")
+
 @app.on_event("startup")
 async def startup_event():
     """
     This function is executed when the application starts.
     - It initializes the database connection.
+    - It starts listening for cache invalidations from the other workers.
+    - It starts publishing this worker's metrics, if metrics are enabled.
+    - It starts expiring the ready holds that were not picked up in time.
     """
     await initialize_database()
+    await start_cache()
+    await start_hold_sweeper()
+    if settings.METRICS_ENABLED:
+        await get_metrics_exporter().start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    This function is executed when the application stops.
+    - It stops the cache invalidation listener.
+    - It publishes this worker's last metrics.
+    - It stops expiring ready holds.
+    """
+    await stop_cache()
+    await stop_hold_sweeper()
+    if settings.METRICS_ENABLED:
+        await get_metrics_exporter().stop()
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
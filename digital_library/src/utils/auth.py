@@ -1,84 +1,187 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+import jwt
 from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from typing import Optional
+from fastapi.security import OAuth2PasswordBearer
 
 from infrastructure.config import settings
-from infrastructure.database.db_session import get_db
-from utils.auth import create_access_token, create_refresh_token, verify_password
-from api.v1.schemas.auth import Token, User, UserResponse
-from infrastructure.database.models import User
+from infrastructure.metrics import registry
+from infrastructure.token_store import get_token_store
+from api.v1.schemas.auth import CurrentUser
+from utils.passwords import PasswordHasher
+from utils.tokens import TokenVerifier
 
-from utils.exceptions import AuthenticationError
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
-# Dependency for retrieving the current user
-async def get_current_user(token: str = Depends(verify_password)) -> User:
+@lru_cache()
+def get_token_verifier() -> TokenVerifier:
+    """
+    Returns the token verifier of this worker.
+
+    The verifier accepts tokens signed with `settings.SECRET_KEY`, under the
+    `settings.JWT_KEY_ID` kid, and with any of `settings.JWT_PREVIOUS_KEYS`.
+    """
+    keys = dict(settings.JWT_PREVIOUS_KEYS)
+    keys[settings.JWT_KEY_ID] = settings.SECRET_KEY
+    return TokenVerifier(keys, settings.JWT_KEY_ID, settings.ALGORITHM, int(settings.TOKEN_CACHE_MAXSIZE))
+
+@lru_cache()
+def get_password_hasher() -> PasswordHasher:
+    """
+    Returns the password hasher of this worker, configured from the `PASSWORD_*` settings.
+    """
+    return PasswordHasher(
+        n=int(settings.PASSWORD_SCRYPT_N),
+        r=int(settings.PASSWORD_SCRYPT_R),
+        p=int(settings.PASSWORD_SCRYPT_P),
+        workers=int(settings.PASSWORD_HASH_WORKERS),
+        max_pending=int(settings.PASSWORD_HASH_MAX_PENDING),
+    )
+
+LOGINS = registry.counter("auth_logins_total", "Login attempts by outcome: success, failure or throttled.", ("outcome",))
+
+registry.callback(
+    "password_hash_pending", "Password hashes and checks running or queued in this worker.", "gauge", (),
+    lambda: {(): get_password_hasher().pending},
+)
+registry.callback(
+    "password_hash_rejected_total", "Password hashes and checks refused because too many were pending.", "counter", (),
+    lambda: {(): get_password_hasher().rejected},
+)
+
+async def get_password_hash(password: str) -> str:
+    """
+    Hashes a password off the event loop.
+
+    Raises:
+        HTTPException: 503 if the password hasher is overloaded.
+    """
+    return await get_password_hasher().hash(password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Checks a password against its stored hash off the event loop.
+
+    Raises:
+        HTTPException: 503 if the password hasher is overloaded.
+    """
+    return await get_password_hasher().verify(plain_password, hashed_password)
+
+def dummy_password_hash() -> str:
+    """Returns a hash to verify passwords against when the user does not exist, see `PasswordHasher.dummy_hash`."""
+    return get_password_hasher().dummy_hash
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Returns whether a stored hash should be replaced by one using the current parameters."""
+    return get_password_hasher().needs_rehash(hashed_password)
+
+def _create_token(data: Dict[str, Any], token_type: str, expires_delta: timedelta) -> str:
+    now = datetime.now(timezone.utc)
+    claims = dict(data, type=token_type, jti=uuid.uuid4().hex, iat=now, exp=now + expires_delta)
+    headers = {"kid": settings.JWT_KEY_ID} if settings.JWT_KEY_ID else None
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM, headers=headers)
+
+def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+    """
+    Creates a signed access token.
+
+    Args:
+        data: The claims to include, usually `{"sub": username}`.
+        expires_delta: How long the token is valid. Defaults to `settings.ACCESS_TOKEN_EXPIRE_MINUTES`.
+
+    Returns:
+        str: The encoded JWT.
+    """
+    return _create_token(data, "access", expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+
+def create_refresh_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """
-    Verifies the JWT token provided in the request header.
+    Creates a signed refresh token.
 
     Args:
-        token (str, optional): The JWT token provided in the request header. Defaults to None.
+        data: The claims to include, usually `{"sub": username}`.
+        expires_delta: How long the token is valid. Defaults to `settings.REFRESH_TOKEN_EXPIRE_MINUTES`.
 
     Returns:
-        User: The user object associated with the token if the token is valid, otherwise raises an HTTPException.
+        str: The encoded JWT.
+    """
+    return _create_token(data, "refresh", expires_delta or timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES))
+
+def create_token_pair(username: str, family: Optional[str] = None) -> Dict[str, str]:
     """
-    credentials_exception = HTTPException(
+    Creates an access token and a refresh token for a user.
+
+    Both tokens carry the same family ID (`fam`), which identifies the chain of
+    refreshes started by one login, so that the whole chain can be revoked at once.
+
+    Args:
+        username: The user the tokens are issued to.
+        family: The family to continue on refresh. A new family is started when omitted.
+
+    Returns:
+        Dict[str, str]: The tokens, shaped like the `Token` schema.
+    """
+    data = {"sub": username, "fam": family or uuid.uuid4().hex}
+    return {
+        "access_token": create_access_token(data),
+        "refresh_token": create_refresh_token(data),
+        "token_type": "bearer",
+    }
+
+def token_family_ttl() -> int:
+    """Returns how long, in seconds, a token of a family issued now can stay valid."""
+    return 60 * max(int(settings.ACCESS_TOKEN_EXPIRE_MINUTES), int(settings.REFRESH_TOKEN_EXPIRE_MINUTES))
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    if not token:
-        raise credentials_exception
-    return token
-
-# Authentication route
-@books_router.post("/", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
-async def create_book(book: BookCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Creates a new book in the library catalog."""
-    # Call the create_book function from the books service
-    new_book = await books_service.create_book(db, book)
-    return new_book
-
-# Authentication route
-@books_router.get("/", response_model=list[BookResponse])
-async def get_books(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Retrieves a list of all books in the library catalog."""
-    # Call the get_books function from the books service
-    books = await books_service.get_books(db)
-    return books
-
-# Authentication route
-@books_router.get("/{book_id}", response_model=BookResponse)
-async def get_book(book_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Retrieves details for a specific book by its ID."""
-    # Call the get_book function from the books service
-    book = await books_service.get_book(db, book_id)
-    # If the book is not found, raise a 404 Not Found exception
-    if not book:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Book with ID {book_id} not found",
-        )
-    return book
-
-# Authentication route
-@books_router.put("/{book_id}", response_model=BookResponse)
-async def update_book(book_id: int, book: Book, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Updates the details of a specific book by its ID."""
-    # Call the update_book function from the books service
-    updated_book = await books_service.update_book(db, book_id, book)
-    # If the book is not found, raise a 404 Not Found exception
-    if not updated_book:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Book with ID {book_id} not found",
-        )
-    return updated_book
-
-# Authentication route
-@books_router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_book(book_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """Deletes a specific book from the library catalog."""
-    # Call the delete_book function from the books service
-    await books_service.delete_book(db, book_id)
\ No newline at end of file
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """
+    Verifies a token and returns its claims.
+
+    Args:
+        token: The encoded JWT.
+
+    Returns:
+        Dict[str, Any]: The decoded claims.
+
+    Raises:
+        HTTPException: If the token is invalid or expired.
+    """
+    try:
+        return get_token_verifier().verify(token)
+    except jwt.PyJWTError as e:
+        raise credentials_exception() from e
+
+# Dependency for retrieving the current user
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> CurrentUser:
+    """
+    Verifies the bearer token provided in the request header.
+
+    The user is identified from the token alone, without a database query, so
+    this dependency stays cheap on every request. The only lookup is an O(1)
+    check that the token family has not been revoked by a logout.
+
+    Args:
+        token (str): The JWT provided in the `Authorization` header.
+
+    Returns:
+        CurrentUser: The user the token was issued to.
+
+    Raises:
+        HTTPException: If the token is missing, invalid, expired, revoked, or is not an access token.
+    """
+    claims = decode_token(token)
+    if claims.get("type", "access") != "access":
+        raise credentials_exception()
+    family = claims.get("fam")
+    if family and await get_token_store().is_revoked(family):
+        raise credentials_exception()
+    return CurrentUser(username=claims["sub"], expires_at=claims["exp"], token_family=family)
@@ -0,0 +1,114 @@
+import hashlib
+from typing import Any, Iterable, Optional
+
+from fastapi import HTTPException, Request, Response, status
+
+from infrastructure.compression import decoded_etag
+from api.v1.schemas.book import BookResponse
+from api.v1.schemas.user import UserResponse
+
+# Responses depend on the caller's credentials, so shared caches must not store
+# them, and clients must revalidate (cheaply, thanks to the ETag) before reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Builds a strong ETag from the values a representation is derived from.
+
+    Args:
+        parts: The values identifying the version of the representation.
+
+    Returns:
+        str: The quoted entity tag.
+    """
+    digest = hashlib.blake2b("\x1f".join(map(str, parts)).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def book_etag(book: BookResponse) -> str:
+    """
+    Derives the ETag of a book from its row version and circulation counts.
+
+    Borrowing and returning change the counts without touching the book row, so
+    both are part of the tag.
+    """
+    return make_etag("book", book.id, book.version, book.is_available, book.total_copies, book.available_copies)
+
+
+def user_etag(user: UserResponse) -> str:
+    """Derives the ETag of a user from its last update time."""
+    return make_etag("user", user.id, user.updated_at.isoformat())
+
+
+def page_etag(etags: Iterable[str], next_cursor: Optional[str]) -> str:
+    """Derives the ETag of a listing page from the ETags of its items and its next cursor."""
+    return make_etag("page", *etags, next_cursor)
+
+
+def etag_matches(header: Optional[str], etag: str, weak: bool = False) -> bool:
+    """
+    Checks an `If-None-Match` or `If-Match` header against an ETag.
+
+    Args:
+        header: The header value, a comma separated list of entity tags or "*".
+        etag: The current ETag of the resource.
+        weak: Whether to use the weak comparison of `If-None-Match`, which ignores
+            the `W/` prefix, instead of the strong comparison of `If-Match`.
+            Either way, the content coding suffix of a tag sent with a compressed
+            response is ignored.
+
+    Returns:
+        bool: True if any of the listed tags matches.
+    """
+    if header is None:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if weak and tag.startswith("W/"):
+            tag = tag[2:]
+        if decoded_etag(tag) == etag:
+            return True
+    return False
+
+
+def conditional_response(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Tags a response and answers conditional GETs for unchanged resources.
+
+    Args:
+        request: The incoming request, possibly carrying `If-None-Match`.
+        response: The response the `ETag` and `Cache-Control` headers are added to.
+        etag: The current ETag of the resource.
+
+    Returns:
+        Optional[Response]: An empty 304 Not Modified response if the client's
+        copy is current, in which case the body need not be serialized at all;
+        otherwise None.
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("If-None-Match"), etag, weak=True):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def require_if_match(if_match: Optional[str], etag: str) -> None:
+    """
+    Enforces an `If-Match` precondition for optimistic concurrency control.
+
+    Args:
+        if_match: The `If-Match` header value, if the client sent one.
+        etag: The current ETag of the resource.
+
+    Raises:
+        HTTPException: 412 Precondition Failed if the resource has changed since
+        the client read it.
+    """
+    if if_match is not None and not etag_matches(if_match, etag):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="The resource has been modified, fetch it again before updating",
+        )
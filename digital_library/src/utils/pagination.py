@@ -0,0 +1,147 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+
+from infrastructure.config import settings
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encodes the sort key of the last row of a page into an opaque cursor token.
+
+    Args:
+        values: The values of the ordering columns for the last row returned.
+
+    Returns:
+        str: A URL-safe token that can be passed back as the `cursor` query parameter.
+    """
+    payload = json.dumps([_dump_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Decodes a cursor token produced by `encode_cursor`.
+
+    Args:
+        cursor: The opaque cursor token received from the client.
+        size: The number of ordering columns the cursor is expected to hold.
+
+    Returns:
+        List[Any]: The decoded sort key values.
+
+    Raises:
+        HTTPException: If the cursor is malformed or does not match the ordering.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor",
+        ) from e
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor",
+        )
+    return [_load_value(value) for value in values]
+
+
+def paginate(query, columns: Sequence[Any], cursor: Optional[str], limit: int):
+    """
+    Applies keyset pagination to a select statement.
+
+    Rows are ordered by `columns` (which must end with a unique column such as the
+    primary key). The cursor holds the values of those columns for the last row of
+    the previous page, and only rows whose key compares strictly greater are
+    selected: no rows are skipped over, so every page costs a single index range
+    scan regardless of how deep it is. One extra row is selected to detect
+    whether a next page exists; `split_page` drops it.
+
+    Args:
+        query: The SQLAlchemy select statement to paginate.
+        columns: The ordering columns, most significant first.
+        cursor: The cursor of the previous page as made by `split_page`, or None
+            for the first page.
+        limit: The page size; `limit + 1` rows are selected.
+
+    Returns:
+        The paginated select statement.
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(columns))
+        if len(columns) == 1:
+            query = query.where(columns[0] > values[0])
+        else:
+            query = query.where(tuple_(*columns) > tuple_(*values))
+    return query.order_by(*columns).limit(limit + 1)
+
+
+def split_page(rows: Sequence[Any], limit: int, key: Callable[[Any], Sequence[Any]]) -> Tuple[List[Any], Optional[str]]:
+    """
+    Splits the rows fetched by `paginate` into a page and the next cursor.
+
+    Args:
+        rows: The rows returned by the paginated query.
+        limit: The page size requested by the client.
+        key: A function returning the ordering column values for a row.
+
+    Returns:
+        Tuple[List[Any], Optional[str]]: The page rows and the cursor for the next
+        page, or None if this is the last page.
+    """
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(key(page[-1]))
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    """
+    Exposes the next page cursor to the client through the `X-Next-Cursor` header.
+
+    Listing endpoints keep returning a plain JSON array, so the cursor travels in a
+    header rather than in the response body.
+
+    Args:
+        response: The response the headers are added to.
+        next_cursor: The cursor for the next page, or None if this is the last page.
+    """
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+
+def page_size(limit: Optional[int]) -> int:
+    """
+    Clamps the requested page size to the configured bounds.
+
+    Args:
+        limit: The page size requested by the client.
+
+    Returns:
+        int: The page size to use.
+    """
+    if not limit:
+        return settings.DEFAULT_PAGE_SIZE
+    return max(1, min(limit, settings.MAX_PAGE_SIZE))
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return {"$dt": value.isoformat(), "$date": not isinstance(value, datetime)}
+    return value
+
+
+def _load_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$dt" in value:
+        if value.get("$date"):
+            return date.fromisoformat(value["$dt"])
+        return datetime.fromisoformat(value["$dt"])
+    return value
@@ -0,0 +1,135 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Tuple, TypeVar
+
+from fastapi import HTTPException, status
+
+T = TypeVar("T")
+
+# Identifies the hash format; stored hashes look like "scrypt$n$r$p$salt$key"
+SCHEME = "scrypt"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords with scrypt on a bounded thread pool.
+
+    scrypt is deliberately slow, so it never runs on the event loop: every call
+    is handed to a pool of `workers` threads (hashlib releases the GIL while the
+    KDF runs). At most `max_pending` calls may be running or queued at once;
+    beyond that the request fails fast with 503 Service Unavailable instead of
+    queueing behind a login storm and stalling every other request.
+
+    Hashes embed their cost parameters, so changing them only affects new
+    hashes; `needs_rehash` tells whether a stored hash uses outdated ones.
+    """
+
+    def __init__(self, n: int, r: int, p: int, workers: int, max_pending: int) -> None:
+        """
+        Initializes the hasher.
+
+        Args:
+            n: The scrypt CPU/memory cost, a power of two.
+            r: The scrypt block size.
+            p: The scrypt parallelization factor.
+            workers: The number of threads running the KDF.
+            max_pending: The maximum number of hash or verify calls running or queued.
+        """
+        self.params = (n, r, p)
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+
+    async def hash(self, password: str) -> str:
+        """
+        Returns a salted scrypt hash of `password` using the current parameters.
+
+        Raises:
+            HTTPException: 503 if too many hash or verify calls are pending.
+        """
+        salt = os.urandom(SALT_BYTES)
+        key = await self._run(_derive, password, salt, self.params)
+        n, r, p = self.params
+        return f"{SCHEME}${n}${r}${p}${_encode(salt)}${_encode(key)}"
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """
+        Checks `password` against a stored hash, using the parameters embedded in the hash.
+
+        Raises:
+            HTTPException: 503 if too many hash or verify calls are pending.
+        """
+        try:
+            params, salt, expected = _parse(hashed)
+        except ValueError:
+            return False
+        key = await self._run(_derive, password, salt, params)
+        return hmac.compare_digest(key, expected)
+
+    @property
+    def dummy_hash(self) -> str:
+        """
+        A well-formed hash, using the current parameters, that no password matches.
+
+        Verifying a password against it costs as much as against a real hash, so
+        a login for an unknown user takes as long to fail as a wrong password.
+        """
+        n, r, p = self.params
+        return f"{SCHEME}${n}${r}${p}${_encode(bytes(SALT_BYTES))}${_encode(bytes(KEY_BYTES))}"
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """Returns whether a stored hash was made with parameters other than the current ones."""
+        try:
+            params, _, _ = _parse(hashed)
+        except ValueError:
+            return True
+        return params != self.params
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": self.pending, "rejected": self.rejected}
+
+    def shutdown(self) -> None:
+        """Waits for running calls to finish and stops the pool."""
+        self._executor.shutdown(wait=True)
+
+    async def _run(self, fn: Callable[..., T], *args) -> T:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent authentication requests, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+
+def _derive(password: str, salt: bytes, params: Tuple[int, int, int]) -> bytes:
+    n, r, p = params
+    # Allow twice the memory the parameters need; OpenSSL's default cap is only 32 MiB
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=KEY_BYTES)
+
+
+def _parse(hashed: str) -> Tuple[Tuple[int, int, int], bytes, bytes]:
+    scheme, n, r, p, salt, key = hashed.split("$")
+    if scheme != SCHEME:
+        raise ValueError(f"Unsupported password hash scheme {scheme!r}")
+    return (int(n), int(r), int(p)), _decode(salt), _decode(key)
+
+
+def _encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
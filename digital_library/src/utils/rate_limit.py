@@ -0,0 +1,57 @@
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+
+from infrastructure.config import settings
+from infrastructure.rate_limit import get_rate_limit_store
+from utils.auth import LOGINS
+
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+def _too_many_requests(retry_after: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many attempts, please retry later",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+async def limit_login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()) -> None:
+    """
+    Throttles login attempts per client IP and per username.
+
+    The per-IP limit slows down credential stuffing from one source, while the
+    per-username limit slows down brute forcing of one account from many. Both
+    are checked before any password is verified.
+
+    Raises:
+        HTTPException: 429 with a `Retry-After` header if either limit is exceeded.
+    """
+    store = get_rate_limit_store()
+    window = int(settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS)
+    retry_after: Optional[int] = await store.hit(
+        f"login:ip:{_client_ip(request)}", int(settings.LOGIN_RATE_LIMIT_PER_IP), window
+    )
+    if retry_after is None:
+        retry_after = await store.hit(
+            f"login:user:{form_data.username.lower()}", int(settings.LOGIN_RATE_LIMIT_PER_USERNAME), window
+        )
+    if retry_after is not None:
+        LOGINS.inc("throttled")
+        raise _too_many_requests(retry_after)
+
+async def limit_signup(request: Request) -> None:
+    """
+    Throttles account creation per client IP.
+
+    Raises:
+        HTTPException: 429 with a `Retry-After` header if the limit is exceeded.
+    """
+    retry_after = await get_rate_limit_store().hit(
+        f"signup:ip:{_client_ip(request)}",
+        int(settings.SIGNUP_RATE_LIMIT_PER_IP),
+        int(settings.SIGNUP_RATE_LIMIT_WINDOW_SECONDS),
+    )
+    if retry_after is not None:
+        raise _too_many_requests(retry_after)
@@ -0,0 +1,81 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+
+
+class TokenVerifier:
+    """
+    Verifies signed JWTs and remembers the claims of tokens it has already verified.
+
+    Verification never touches the database: a token is valid if its signature
+    matches one of the configured keys and it has not expired. Keys are selected
+    by the `kid` header so the signing key can be rotated while tokens signed with
+    the previous key are still in circulation; tokens without a `kid` are checked
+    against the key of `default_kid`.
+
+    Verified claims are kept in a bounded LRU keyed by the whole token, so a client
+    repeating the same bearer token skips the HMAC and JSON decoding until the
+    token expires. The key must be the whole token rather than its signature
+    alone, or a valid signature could be replayed with a forged payload.
+    """
+
+    def __init__(self, keys: Dict[Optional[str], str], default_kid: Optional[str], algorithm: str, maxsize: int) -> None:
+        """
+        Initializes the verifier.
+
+        Args:
+            keys: The accepted signing keys by `kid`.
+            default_kid: The `kid` of the key used for tokens without a `kid` header.
+            algorithm: The signing algorithm tokens must use.
+            maxsize: The maximum number of verified tokens to remember.
+        """
+        self.keys = keys
+        self.default_kid = default_kid
+        self.algorithm = algorithm
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._verified: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Returns the claims of a valid token.
+
+        Args:
+            token: The encoded JWT.
+
+        Returns:
+            Dict[str, Any]: The decoded claims.
+
+        Raises:
+            jwt.PyJWTError: If the token is malformed, expired, or not signed with an accepted key.
+        """
+        entry = self._verified.get(token)
+        if entry is not None:
+            expires_at, claims = entry
+            if expires_at > time.time():
+                self._verified.move_to_end(token)
+                self.hits += 1
+                return claims
+            del self._verified[token]
+        self.misses += 1
+
+        kid = jwt.get_unverified_header(token).get("kid", self.default_kid)
+        key = self.keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key {kid!r}")
+        claims = jwt.decode(token, key, algorithms=[self.algorithm], options={"require": ["exp", "sub"]})
+        if self.maxsize > 0:
+            self._verified[token] = (claims["exp"], claims)
+            while len(self._verified) > self.maxsize:
+                self._verified.popitem(last=False)
+        return claims
+
+    def clear(self) -> None:
+        """Forgets every verified token."""
+        self._verified.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._verified)}
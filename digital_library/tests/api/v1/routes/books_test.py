@@ -1,3 +1,5 @@
+import json
+
 import pytest
 from fastapi import status
 from fastapi.testclient import TestClient
@@ -6,6 +8,7 @@ from sqlalchemy.orm import Session
 from infrastructure.database.db_session import get_db
 from infrastructure.config import settings
 from api.v1.schemas.book import Book, BookCreate, BookResponse
+from utils.pagination import encode_cursor
 from tests.utils.auth import get_test_user, get_test_user_credentials
 from tests.utils.utils import get_test_client
 
@@ -54,6 +57,115 @@ def test_get_books(client: TestClient, db: Session, test_user: UserResponse):
     assert isinstance(response.json(), list)
 
 
+def test_get_books_paginated(client: TestClient, db: Session, test_user: UserResponse):
+    headers = {"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"}
+    for isbn in ("9780000000011", "9780000000012"):
+        book_data = BookCreate(
+            title="Mostly Harmless",
+            author="Douglas Adams",
+            isbn=isbn,
+            genre="Science Fiction",
+            publication_date="1992-10-01",
+        )
+        response = client.post("/books", json=book_data.dict(), headers=headers)
+        assert response.status_code == status.HTTP_201_CREATED
+
+    response = client.get("/books", params={"limit": 1}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    first_page = response.json()
+    assert len(first_page) == 1
+    next_cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/books", params={"limit": 1, "cursor": next_cursor}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    second_page = response.json()
+    assert len(second_page) == 1
+    assert second_page[0]["id"] > first_page[0]["id"]
+
+
+def test_get_books_invalid_cursor(client: TestClient, test_user: UserResponse):
+    response = client.get(
+        "/books",
+        params={"cursor": "not-a-cursor"},
+        headers={"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_books_filtered(client: TestClient, db: Session, test_user: UserResponse):
+    response = client.get(
+        "/books",
+        params={"genre": "Science Fiction", "published_from": 1979, "published_to": 1979},
+        headers={"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    for book in response.json():
+        assert book["genre"] == "Science Fiction"
+        assert book["publication_date"].startswith("1979")
+
+
+def test_get_book_facets(client: TestClient, db: Session, test_user: UserResponse):
+    response = client.get(
+        "/books/facets",
+        headers={"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    facets = response.json()
+    assert facets["total"] == sum(genre["count"] for genre in facets["genres"])
+    assert facets["total"] == facets["availability"]["available"] + facets["availability"]["unavailable"]
+    assert facets["total"] == sum(decade["count"] for decade in facets["decades"])
+
+
+def test_search_books(client: TestClient, db: Session, test_user: UserResponse):
+    headers = {"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"}
+    book_data = BookCreate(
+        title="Dirk Gently's Holistic Detective Agency",
+        author="Douglas Adams",
+        isbn="9780000000028",
+        genre="Comic Fantasy",
+        description="A detective who believes in the interconnectedness of all things",
+        publication_date="1987-05-01",
+    )
+    response = client.post("/books", json=book_data.dict(), headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED
+
+    response = client.get("/books/search", params={"q": "interconnectedness"}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert [book["isbn"] for book in response.json()] == [book_data.isbn]
+
+
+def test_export_books(client: TestClient, db: Session, test_user: UserResponse):
+    response = client.get(
+        "/books/export",
+        headers={"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    books = [json.loads(line) for line in response.text.splitlines()]
+    assert all("isbn" in book for book in books)
+    assert [book["id"] for book in books] == sorted(book["id"] for book in books)
+
+
+def test_import_books(client: TestClient, db: Session, test_user: UserResponse):
+    csv_data = (
+        "title,author,isbn,genre,publication_date\n"
+        "Good Omens,Terry Pratchett,0060853980,Fantasy,1990-05-01\n"
+        "Good Omens,Neil Gaiman,0060853980,Fantasy,1990-05-01\n"
+        "Untitled,Nobody,,Fantasy,not-a-date\n"
+    )
+    response = client.post(
+        "/books/import",
+        files={"file": ("books.csv", csv_data, "text/csv")},
+        headers={"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    report = response.json()
+    assert report["received"] == 3
+    assert report["imported"] == 2
+    assert report["failed"] == 1
+    assert report["errors"][0]["row"] == 3
+
+
 def test_get_book(client: TestClient, db: Session, test_user: UserResponse):
     book_data = BookCreate(
         title="The Hitchhiker's Guide to the Galaxy",
@@ -80,6 +192,185 @@ def test_get_book(client: TestClient, db: Session, test_user: UserResponse):
     assert response.json()["title"] == book_data.title
 
 
+def test_book_changes(client: TestClient, db: Session, test_user: UserResponse):
+    headers = {"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"}
+    # Start from the end of the feed
+    page = {"cursor": None, "has_more": True}
+    while page["has_more"]:
+        page = client.get("/books/changes", params={"cursor": page["cursor"]}, headers=headers).json()
+    cursor = page["cursor"]
+
+    book_data = Book(
+        title="Hogfather",
+        author="Terry Pratchett",
+        isbn="0575063149",
+        genre="Fantasy",
+        publication_date="1996-11-07",
+    )
+    book_id = client.post("/books", json=book_data.dict(), headers=headers).json()["id"]
+    client.put(f"/books/{book_id}", json=dict(book_data.dict(), title="Jingo"), headers=headers)
+    client.delete(f"/books/{book_id}", headers=headers)
+
+    response = client.get("/books/changes", params={"cursor": cursor}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    page = response.json()
+    assert [(change["entity_id"], change["op"]) for change in page["changes"]] == [
+        (book_id, "upsert"),
+        (book_id, "upsert"),
+        (book_id, "delete"),
+    ]
+    assert page["has_more"] is False
+    # Nothing changed since, and the cursor stays put
+    page = client.get("/books/changes", params={"cursor": page["cursor"]}, headers=headers).json()
+    assert page["changes"] == []
+
+
+def test_book_changes_malformed_cursor(client: TestClient, db: Session, test_user: UserResponse):
+    headers = {"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"}
+    for cursor in ("not-a-cursor", encode_cursor([1]), encode_cursor(["a", "b"])):
+        response = client.get("/books/changes", params={"cursor": cursor}, headers=headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_books_batch(client: TestClient, db: Session, test_user: UserResponse):
+    headers = {"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"}
+    book_data = BookCreate(
+        title="Dune",
+        author="Frank Herbert",
+        isbn="0441172717",
+        genre="Science Fiction",
+        publication_date="1965-08-01",
+    )
+    response = client.post("/books", json=book_data.dict(), headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    book_id = response.json()["id"]
+    # Cache the book so that the batch mixes cache hits and database reads
+    client.get(f"/books/{book_id}", headers=headers)
+
+    response = client.post(
+        "/books/batch",
+        json={"ids": [book_id, 999999, book_id], "isbns": ["0000000000", book_data.isbn]},
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_200_OK
+    items = response.json()["items"]
+    assert [item["found"] for item in items] == [True, False, True, False, True]
+    assert items[1] == {"id": 999999, "isbn": None, "found": False, "book": None}
+    assert items[4]["book"]["id"] == book_id
+
+    response = client.post("/books/batch", json={"ids": [], "isbns": []}, headers=headers)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_borrow_and_return_copies(client: TestClient, db: Session, test_user: UserResponse):
+    headers = {"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"}
+    book_data = BookCreate(
+        title="Mort",
+        author="Terry Pratchett",
+        isbn="0552131067",
+        genre="Fantasy",
+        publication_date="1987-11-12",
+        copies=2,
+    )
+    response = client.post("/books", json=book_data.dict(), headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    book_id = response.json()["id"]
+
+    response = client.post(f"/books/{book_id}/borrow", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["available_copies"] == 1
+    assert response.json()["is_available"] is True
+    response = client.post(f"/books/{book_id}/borrow", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["available_copies"] == 0
+    assert response.json()["is_available"] is False
+    # No copy is left until one is returned
+    response = client.post(f"/books/{book_id}/borrow", headers=headers)
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    for available_copies in (1, 2):
+        response = client.post(f"/books/{book_id}/return", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["available_copies"] == available_copies
+        assert response.json()["is_available"] is True
+    response = client.post(f"/books/{book_id}/return", headers=headers)
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+
+def test_hold_queue(client: TestClient, db: Session, test_user: UserResponse):
+    headers = {"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"}
+    book_data = BookCreate(
+        title="Small Gods",
+        author="Terry Pratchett",
+        isbn="0552139262",
+        genre="Fantasy",
+        publication_date="1992-05-01",
+    )
+    book_id = client.post("/books", json=book_data.dict(), headers=headers).json()["id"]
+    # Holds are only for books without an available copy
+    response = client.post(f"/books/{book_id}/holds", headers=headers)
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    assert client.post(f"/books/{book_id}/borrow", headers=headers).status_code == status.HTTP_200_OK
+    response = client.post(f"/books/{book_id}/holds", headers=headers)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["status"] == "waiting"
+    assert response.json()["position"] == 1
+    response = client.post(f"/books/{book_id}/holds", headers=headers)
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    # The returned copy is set aside for the first hold instead of going back on the shelf
+    response = client.post(f"/books/{book_id}/return", headers=headers)
+    assert response.json()["available_copies"] == 0
+    response = client.get(f"/books/{book_id}/holds/me", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["status"] == "ready"
+    assert response.json()["position"] == 0
+
+    response = client.delete(f"/books/{book_id}/holds/me", headers=headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert client.get(f"/books/{book_id}/holds/me", headers=headers).status_code == status.HTTP_404_NOT_FOUND
+    assert client.get(f"/books/{book_id}", headers=headers).json()["available_copies"] == 1
+
+
+def test_borrow_missing_book(client: TestClient, test_user: UserResponse):
+    headers = {"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"}
+    response = client.post("/books/999999/borrow", headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_book_etags(client: TestClient, db: Session, test_user: UserResponse):
+    headers = {"Authorization": f"Bearer {get_test_user_credentials(test_user)['access_token']}"}
+    book_data = Book(
+        title="Guards! Guards!",
+        author="Terry Pratchett",
+        isbn="0575043636",
+        genre="Fantasy",
+        publication_date="1989-11-01",
+    )
+    book_id = client.post("/books", json=book_data.dict(), headers=headers).json()["id"]
+    response = client.get(f"/books/{book_id}", headers=headers)
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+    response = client.get(f"/books/{book_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+    # A stale ETag loses the race and leaves the book untouched
+    book_data.title = "Men at Arms"
+    response = client.put(f"/books/{book_id}", json=book_data.dict(), headers={**headers, "If-Match": '"stale"'})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    response = client.put(f"/books/{book_id}", json=book_data.dict(), headers={**headers, "If-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["version"] == 2
+    assert response.headers["ETag"] != etag
+
+    response = client.get(f"/books/{book_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["title"] == "Men at Arms"
+
+
 def test_update_book(client: TestClient, db: Session, test_user: UserResponse):
     book_data = BookCreate(
         title="The Hitchhiker's Guide to the Galaxy",
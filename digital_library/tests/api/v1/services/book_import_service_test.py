@@ -0,0 +1,30 @@
+import io
+import json
+
+from sqlalchemy import select
+
+from infrastructure.database.models import Book, Holding
+from api.v1.services import book_import_service
+
+RECORDS = [
+    {"title": "Mort", "author": "Terry Pratchett", "genre": "Fantasy", "isbn": "0552131067", "publication_date": "1987-11-12", "copies": 2},
+    {"title": "Sourcery", "author": "Terry Pratchett", "genre": "Fantasy", "isbn": "0552131075", "publication_date": "1988-05-01"},
+    {"title": "Untitled"},
+    {"title": "Wyrd Sisters", "author": "Terry Pratchett", "genre": "Fantasy", "isbn": "0552134600", "publication_date": "1988-11-12"},
+]
+
+
+def test_import_in_batches(run_db):
+    lines = io.StringIO("\n".join([*map(json.dumps, RECORDS), "not json"]))
+
+    async def scenario(sessions):
+        async with sessions() as db:
+            records = book_import_service.read_records(lines, "ndjson")
+            report = await book_import_service.import_books(db, records, batch_size=2)
+            holdings = dict((await db.execute(select(Book.isbn, Holding.total_copies).join(Holding))).all())
+        return report, holdings
+
+    report, holdings = run_db(scenario)
+    assert (report.received, report.imported) == (5, 3)
+    assert [error.row for error in report.errors] == [3, 5]
+    assert holdings == {"0552131067": 2, "0552131075": 1, "0552134600": 1}
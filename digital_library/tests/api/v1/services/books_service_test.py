@@ -0,0 +1,116 @@
+import asyncio
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select
+
+from infrastructure.database.models import Book, Holding, Loan
+from api.v1.services import books_service
+from tests.api.v1.services.factories import add_book, add_users
+
+BORROWERS = 8
+
+
+async def attempt(call) -> int:
+    try:
+        await call
+    except HTTPException as e:
+        return e.status_code
+    return status.HTTP_200_OK
+
+
+def test_concurrent_borrowers_of_the_last_copy(run_db):
+    async def scenario(sessions):
+        book_id = await add_book(sessions, copies=1)
+        users = await add_users(sessions, BORROWERS)
+
+        async def borrow(user):
+            async with sessions() as db:
+                return await attempt(books_service.borrow_book(db, book_id, user))
+
+        results = await asyncio.gather(*(borrow(user) for user in users))
+        async with sessions() as db:
+            loans = await db.scalar(select(func.count()).select_from(Loan))
+            available = await db.scalar(select(Holding.available_copies).where(Holding.book_id == book_id))
+            is_available = await db.scalar(select(Book.is_available).where(Book.id == book_id))
+        return results, loans, available, is_available
+
+    results, loans, available, is_available = run_db(scenario)
+    assert sorted(results) == [status.HTTP_200_OK] + [status.HTTP_409_CONFLICT] * (BORROWERS - 1)
+    assert loans == 1
+    assert available == 0
+    assert is_available is False
+
+
+def test_concurrent_borrowers_share_the_copies(run_db):
+    async def scenario(sessions):
+        book_id = await add_book(sessions, copies=3)
+        users = await add_users(sessions, BORROWERS)
+
+        async def borrow(user):
+            async with sessions() as db:
+                return await attempt(books_service.borrow_book(db, book_id, user))
+
+        results = await asyncio.gather(*(borrow(user) for user in users))
+        async with sessions() as db:
+            loans = await db.scalar(select(func.count()).select_from(Loan))
+        return results, loans
+
+    results, loans = run_db(scenario)
+    assert results.count(status.HTTP_200_OK) == 3
+    assert results.count(status.HTTP_409_CONFLICT) == BORROWERS - 3
+    assert loans == 3
+
+
+def test_concurrent_returns_of_one_loan(run_db):
+    async def scenario(sessions):
+        book_id = await add_book(sessions, copies=1)
+        [user] = await add_users(sessions, 1)
+        async with sessions() as db:
+            await books_service.borrow_book(db, book_id, user)
+
+        async def give_back():
+            async with sessions() as db:
+                return await attempt(books_service.return_book(db, book_id, user))
+
+        results = await asyncio.gather(*(give_back() for _ in range(BORROWERS)))
+        async with sessions() as db:
+            available = await db.scalar(select(Holding.available_copies).where(Holding.book_id == book_id))
+        return results, available
+
+    results, available = run_db(scenario)
+    assert sorted(results) == [status.HTTP_200_OK] + [status.HTTP_409_CONFLICT] * (BORROWERS - 1)
+    assert available == 1
+
+
+def test_borrow_missing_book(run_db):
+    async def scenario(sessions):
+        [user] = await add_users(sessions, 1)
+        async with sessions() as db:
+            return await attempt(books_service.borrow_book(db, 404, user))
+
+    assert run_db(scenario) == status.HTTP_404_NOT_FOUND
+
+
+def test_read_overtaken_by_a_borrow_is_not_cached(run_db):
+    async def scenario(sessions):
+        book_id = await add_book(sessions, copies=1)
+        [user] = await add_users(sessions, 1)
+        async with sessions() as reader:
+            load = reader.get
+
+            async def get_then_borrow(*args, **kwargs):
+                # The reader holds the row as it was before the borrow committed
+                book = await load(*args, **kwargs)
+                async with sessions() as db:
+                    await books_service.borrow_book(db, book_id, user)
+                return book
+
+            reader.get = get_then_borrow
+            stale, _ = await books_service.get_book_payload(reader, book_id)
+        async with sessions() as db:
+            book, _ = await books_service.get_book_payload(db, book_id)
+        return stale, book
+
+    stale, book = run_db(scenario)
+    assert stale.is_available is True
+    assert book.is_available is False
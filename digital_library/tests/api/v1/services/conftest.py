@@ -0,0 +1,36 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from infrastructure.cache import get_cache
+from infrastructure.config import settings
+from infrastructure.database.models import Base
+
+
+@pytest.fixture
+def run_db(tmp_path, monkeypatch) -> Callable[[Callable[[async_sessionmaker], Awaitable[Any]]], Any]:
+    """
+    Runs a scenario against a fresh SQLite database file.
+
+    The scenario is called with a session factory; every session gets its own
+    connection, so concurrent sessions contend like separate requests would.
+    """
+    monkeypatch.setattr(settings, "CACHE_BACKEND", "memory")
+    get_cache.cache_clear()
+
+    def run(scenario: Callable[[async_sessionmaker], Awaitable[Any]]) -> Any:
+        async def main():
+            engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'library.db'}")
+            try:
+                async with engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+                return await scenario(async_sessionmaker(engine, expire_on_commit=False, autoflush=False))
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    yield run
+    get_cache.cache_clear()
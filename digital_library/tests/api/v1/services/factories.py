@@ -0,0 +1,29 @@
+from datetime import date, datetime, timedelta
+from typing import List
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from infrastructure.database.models import Book, Holding, User
+from api.v1.schemas.auth import CurrentUser
+
+
+async def add_book(sessions: async_sessionmaker, copies: int) -> int:
+    """Adds a book with `copies` copies and returns its ID."""
+    async with sessions() as db:
+        book = Book(title="Mort", author="Terry Pratchett", isbn="0552131067", genre="Fantasy", publication_date=date(1987, 11, 12))
+        book.holding = Holding(total_copies=copies, available_copies=copies)
+        db.add(book)
+        await db.commit()
+        return book.id
+
+
+async def add_users(sessions: async_sessionmaker, count: int) -> List[CurrentUser]:
+    """Adds `count` users and returns them as authenticated callers."""
+    now = datetime.utcnow()
+    async with sessions() as db:
+        db.add_all([
+            User(username=f"reader{i}", email=f"reader{i}@example.com", hashed_password="!", created_at=now, updated_at=now)
+            for i in range(count)
+        ])
+        await db.commit()
+    return [CurrentUser(username=f"reader{i}", expires_at=now + timedelta(hours=1)) for i in range(count)]
@@ -0,0 +1,140 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+
+from infrastructure.database.models import Book, Hold, Holding
+from api.v1.services import books_service, holds_service
+from tests.api.v1.services.factories import add_book, add_users
+
+PATRONS = 6
+
+
+def test_concurrent_holds_take_distinct_places(run_db):
+    async def scenario(sessions):
+        book_id = await add_book(sessions, copies=1)
+        owner, *patrons = await add_users(sessions, PATRONS + 1)
+        async with sessions() as db:
+            await books_service.borrow_book(db, book_id, owner)
+
+        async def place(user):
+            async with sessions() as db:
+                return (await holds_service.place_hold(db, book_id, user)).position
+
+        return await asyncio.gather(*(place(user) for user in patrons))
+
+    assert sorted(run_db(scenario)) == list(range(1, PATRONS + 1))
+
+
+def test_cancelling_keeps_tickets_and_moves_the_queue_up(run_db):
+    async def scenario(sessions):
+        book_id = await add_book(sessions, copies=1)
+        owner, first, second, third = await add_users(sessions, 4)
+        async with sessions() as db:
+            await books_service.borrow_book(db, book_id, owner)
+            for user in (first, second, third):
+                await holds_service.place_hold(db, book_id, user)
+            tickets = dict((await db.execute(select(Hold.id, Hold.ticket))).all())
+            await holds_service.cancel_hold(db, book_id, second)
+            positions = [(await holds_service.get_hold(db, book_id, user)).position for user in (first, third)]
+            return tickets, dict((await db.execute(select(Hold.id, Hold.ticket))).all()), positions
+
+    tickets_before, tickets_after, positions = run_db(scenario)
+    assert tickets_after == tickets_before
+    assert positions == [1, 2]
+
+
+def test_positions_behind_a_cancelled_hold_in_the_middle(run_db):
+    async def scenario(sessions):
+        book_id = await add_book(sessions, copies=1)
+        owner, *patrons = await add_users(sessions, PATRONS + 1)
+        async with sessions() as db:
+            await books_service.borrow_book(db, book_id, owner)
+            for user in patrons:
+                await holds_service.place_hold(db, book_id, user)
+
+            async def positions():
+                return [(await holds_service.get_hold(db, book_id, user)).position for user in queued]
+
+            queued = list(patrons)
+            await holds_service.cancel_hold(db, book_id, queued.pop(2))
+            after_cancel = await positions()
+            # The first hold is served, then one more cancels behind the gap
+            await books_service.return_book(db, book_id, owner)
+            await holds_service.cancel_hold(db, book_id, queued.pop(3))
+            ready = await holds_service.get_hold(db, book_id, queued.pop(0))
+            after_dispatch = await positions()
+            late = await holds_service.place_hold(db, book_id, owner)
+            return after_cancel, ready.position, after_dispatch, late.position
+
+    after_cancel, ready, after_dispatch, late = run_db(scenario)
+    assert after_cancel == [1, 2, 3, 4, 5]
+    assert ready == 0
+    assert after_dispatch == [1, 2, 3]
+    assert late == 4
+
+
+def test_returned_copy_goes_to_the_first_waiting_hold(run_db):
+    async def scenario(sessions):
+        book_id = await add_book(sessions, copies=1)
+        owner, first, second = await add_users(sessions, 3)
+        async with sessions() as db:
+            await books_service.borrow_book(db, book_id, owner)
+            await holds_service.place_hold(db, book_id, first)
+            await holds_service.place_hold(db, book_id, second)
+            await books_service.return_book(db, book_id, owner)
+            ready = await holds_service.get_hold(db, book_id, first)
+            waiting = await holds_service.get_hold(db, book_id, second)
+            # The set-aside copy is not on the shelf for anybody else
+            try:
+                await books_service.borrow_book(db, book_id, second)
+            except HTTPException as e:
+                refused = e.status_code
+            borrowed = await books_service.borrow_book(db, book_id, first)
+            return ready, waiting, refused, borrowed
+
+    ready, waiting, refused, borrowed = run_db(scenario)
+    assert ready.status == "ready" and ready.position == 0
+    assert ready.ready_until > datetime.utcnow() + timedelta(hours=1)
+    assert waiting.status == "waiting" and waiting.position == 1
+    assert refused == status.HTTP_409_CONFLICT
+    assert borrowed.available_copies == 0
+
+
+def test_overdue_ready_holds_pass_the_copy_on(run_db):
+    async def scenario(sessions):
+        book_id = await add_book(sessions, copies=1)
+        owner, first, second = await add_users(sessions, 3)
+        async with sessions() as db:
+            await books_service.borrow_book(db, book_id, owner)
+            await holds_service.place_hold(db, book_id, first)
+            await holds_service.place_hold(db, book_id, second)
+            await books_service.return_book(db, book_id, owner)
+            overdue = update(Hold).where(Hold.status == "ready").values(ready_until=datetime.utcnow() - timedelta(minutes=1))
+            await db.execute(overdue)
+            await db.commit()
+
+            swept = [await holds_service.expire_ready_holds(db)]
+            statuses = dict((await db.execute(select(Hold.user_id, Hold.status))).all())
+            # Too late: the copy is now set aside for the next patron
+            try:
+                await books_service.borrow_book(db, book_id, first)
+            except HTTPException as e:
+                refused = e.status_code
+
+            await db.execute(overdue)
+            await db.commit()
+            swept.append(await holds_service.expire_ready_holds(db))
+            swept.append(await holds_service.expire_ready_holds(db))
+            available = await db.scalar(select(Holding.available_copies).where(Holding.book_id == book_id))
+            is_available = await db.scalar(select(Book.is_available).where(Book.id == book_id))
+            return swept, statuses, refused, available, is_available
+
+    swept, statuses, refused, available, is_available = run_db(scenario)
+    assert swept == [1, 1, 0]
+    assert sorted(statuses.values()) == ["expired", "ready"]
+    assert refused == status.HTTP_409_CONFLICT
+    # Nobody is left waiting, so the last expired copy is back on the shelf
+    assert available == 1
+    assert is_available is True
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from infrastructure.cache import book_cache_key, pack_payload, unpack_payload
+from infrastructure.cache.backends import InMemoryCacheBackend
+from infrastructure.config import settings
+
+
+@pytest.fixture(scope="function")
+def cache():
+    return InMemoryCacheBackend()
+
+
+def test_set_and_get(cache: InMemoryCacheBackend):
+    asyncio.run(cache.set("key", b"value", ttl=60))
+    assert asyncio.run(cache.get("key")) == b"value"
+
+
+def test_get_missing_key(cache: InMemoryCacheBackend):
+    assert asyncio.run(cache.get("missing")) is None
+
+
+def test_delete(cache: InMemoryCacheBackend):
+    asyncio.run(cache.set("key", b"value", ttl=60))
+    asyncio.run(cache.delete("key"))
+    assert asyncio.run(cache.get("key")) is None
+
+
+def test_delete_many(cache: InMemoryCacheBackend):
+    asyncio.run(cache.set_many({"a": b"1", "b": b"2", "c": b"3"}, ttl=60))
+    asyncio.run(cache.delete_many(["a", "c", "missing"]))
+    assert asyncio.run(cache.get_many(["a", "b", "c"])) == [None, b"2", None]
+
+
+def test_expired_entry_is_a_miss(cache: InMemoryCacheBackend):
+    asyncio.run(cache.set("key", b"value", ttl=0))
+    assert asyncio.run(cache.get("key")) is None
+
+
+def test_set_many_and_get_many(cache: InMemoryCacheBackend):
+    asyncio.run(cache.set_many({"a": b"1", "b": b"2"}, ttl=60))
+    assert asyncio.run(cache.get_many(["b", "missing", "a"])) == [b"2", None, b"1"]
+
+
+def test_add_keeps_a_live_entry(cache: InMemoryCacheBackend):
+    asyncio.run(cache.set("key", b"value", ttl=60))
+    assert asyncio.run(cache.add("key", b"other", ttl=60)) is False
+    assert asyncio.run(cache.add("missing", b"value", ttl=60)) is True
+    assert asyncio.run(cache.get_many(["key", "missing"])) == [b"value", b"value"]
+
+
+def test_add_after_delete_is_refused_until_the_tombstone_expires():
+    cache = InMemoryCacheBackend(tombstone_ttl=60)
+    asyncio.run(cache.delete("key"))
+    assert asyncio.run(cache.add("key", b"stale", ttl=60)) is False
+    assert asyncio.run(cache.get("key")) is None
+    cache = InMemoryCacheBackend(tombstone_ttl=0)
+    asyncio.run(cache.delete("key"))
+    assert asyncio.run(cache.add_many({"key": b"fresh"}, ttl=60)) == ["key"]
+    assert asyncio.run(cache.get("key")) == b"fresh"
+
+
+def test_book_cache_key():
+    assert book_cache_key(42) == f"{settings.CACHE_PREFIX}book:42"
+
+
+def test_large_payloads_are_packed_compressed(monkeypatch):
+    monkeypatch.setattr(settings, "COMPRESSION_MIN_SIZE", 100)
+    small, large = b'{"id": 1}', b'{"title": "%s"}' % (b"x" * 1000)
+    assert pack_payload(small) == small
+    assert len(pack_payload(large)) < len(large)
+    assert unpack_payload(pack_payload(small)) == small
+    assert unpack_payload(pack_payload(large)) == large
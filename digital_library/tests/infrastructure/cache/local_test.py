@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+from infrastructure.cache.local import LocalCacheBackend
+
+
+@pytest.fixture(scope="function")
+def cache():
+    return LocalCacheBackend(maxsize=2, max_ttl=60)
+
+
+def test_hit_and_miss_counters(cache: LocalCacheBackend):
+    asyncio.run(cache.set("a", b"1", ttl=60))
+    assert asyncio.run(cache.get("a")) == b"1"
+    assert asyncio.run(cache.get("b")) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_evicts_least_recently_used(cache: LocalCacheBackend):
+    asyncio.run(cache.set("a", b"1", ttl=60))
+    asyncio.run(cache.set("b", b"2", ttl=60))
+    # Touch "a" so that "b" becomes the least recently used entry
+    asyncio.run(cache.get("a"))
+    asyncio.run(cache.set("c", b"3", ttl=60))
+    assert asyncio.run(cache.get("a")) == b"1"
+    assert asyncio.run(cache.get("b")) is None
+    assert asyncio.run(cache.get("c")) == b"3"
+
+
+def test_ttl_is_capped():
+    cache = LocalCacheBackend(maxsize=2, max_ttl=0)
+    asyncio.run(cache.set("a", b"1", ttl=60))
+    assert asyncio.run(cache.get("a")) is None
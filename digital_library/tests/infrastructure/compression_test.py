@@ -0,0 +1,94 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from infrastructure.compression import CompressionMiddleware, compress, decoded_etag, encoded_etag, negotiate, payload_response
+
+BODY = "All work and no play makes Jack a dull boy.\n" * 100
+
+
+def make_client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/large")
+    async def large():
+        return PlainTextResponse(BODY)
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("tiny")
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for _ in range(100):
+                yield "All work and no play makes Jack a dull boy.\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/image")
+    async def image():
+        return Response(b"\x89PNG" * 1000, media_type="image/png")
+
+    @app.get("/cached")
+    async def cached(request: Request):
+        headers = {"ETag": '"v1"', "Vary": "Authorization"}
+        return payload_response(request, compress(b'{"ok": true}' * 200, "gzip", 6), headers)
+
+    @app.get("/tagged")
+    async def tagged():
+        return PlainTextResponse(BODY, headers={"ETag": '"v1"'})
+
+    app.add_middleware(CompressionMiddleware, levels={"gzip": 6}, minimum_size=500)
+    return TestClient(app)
+
+
+def test_negotiate():
+    assert negotiate("gzip, br", ("zstd", "br", "gzip")) == "br"
+    assert negotiate("gzip;q=1.0, br;q=0.5", ("zstd", "br", "gzip")) == "gzip"
+    assert negotiate("*", ("zstd", "gzip")) == "zstd"
+    assert negotiate("gzip;q=0, identity", ("gzip",)) is None
+    assert negotiate(None, ("gzip",)) is None
+
+
+def test_large_bodies_are_compressed():
+    response = make_client().get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.text == BODY
+
+
+def test_small_and_binary_bodies_are_not_compressed():
+    client = make_client()
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/image", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_streams_are_compressed():
+    response = make_client().get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == BODY
+
+
+def test_precompressed_payloads_are_served_as_stored():
+    client = make_client()
+    response = client.get("/cached", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == '"v1-gzip"'
+    assert response.headers["vary"] == "Authorization, Accept-Encoding"
+    assert response.content == b'{"ok": true}' * 200
+    # Clients that do not accept gzip get the payload decompressed
+    response = client.get("/cached", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"v1"'
+    assert response.content == b'{"ok": true}' * 200
+
+
+def test_compressed_responses_get_their_own_etag():
+    client = make_client()
+    assert client.get("/tagged", headers={"Accept-Encoding": "gzip"}).headers["etag"] == '"v1-gzip"'
+    assert client.get("/tagged", headers={"Accept-Encoding": "identity"}).headers["etag"] == '"v1"'
+    assert encoded_etag('W/"v1"', "br") == 'W/"v1"'
+    assert decoded_etag('"v1-zstd"') == '"v1"'
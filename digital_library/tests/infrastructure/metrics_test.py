@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+from infrastructure import metrics
+from infrastructure.metrics import InMemoryMetricsStore, MetricsExporter, MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/books")
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP latency_seconds Latency.", "# TYPE latency_seconds histogram"]
+    assert 'latency_seconds_bucket{route="/books",le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/books",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{route="/books",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{route="/books"} 3.65' in lines
+    assert 'latency_seconds_count{route="/books"} 4' in lines
+
+
+def test_histogram_series_per_label_set():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", ("route",))
+    histogram.observe(0.2, "/books")
+    histogram.observe(0.2, '/users/"x"')
+    output = registry.render()
+    assert 'latency_seconds_count{route="/books"} 1' in output
+    assert 'latency_seconds_count{route="/users/\\"x\\""} 1' in output
+
+
+def test_histogram_is_registered_once():
+    registry = MetricsRegistry()
+    assert registry.histogram("latency_seconds", "Latency.") is registry.histogram("latency_seconds", "Latency.")
+
+
+def test_counter_and_callback_gauge():
+    registry = MetricsRegistry()
+    logins = registry.counter("logins_total", "Logins.", ("outcome",))
+    logins.inc("success")
+    logins.inc("success")
+    logins.inc("failure")
+    registry.callback("pending", "Pending.", "gauge", (), lambda: {(): 3})
+    lines = registry.render().splitlines()
+    assert "# TYPE logins_total counter" in lines
+    assert 'logins_total{outcome="success"} 2' in lines
+    assert 'logins_total{outcome="failure"} 1' in lines
+    assert "# TYPE pending gauge" in lines
+    assert "pending 3" in lines
+
+
+def test_exporter_aggregates_workers():
+    store = InMemoryMetricsStore()
+    workers = [MetricsRegistry(), MetricsRegistry()]
+    exporters = [MetricsExporter(registry, store, interval=5, worker=str(i)) for i, registry in enumerate(workers)]
+    pending = [1, 2]
+    for i, registry in enumerate(workers):
+        registry.counter("logins_total", "Logins.").inc(amount=i + 1)
+        registry.histogram("latency_seconds", "Latency.", buckets=(1.0,)).observe(0.5)
+        registry.callback("pending", "Pending.", "gauge", (), lambda i=i: {(): pending[i]})
+        asyncio.run(exporters[i].publish())
+    # Only what was gained since the last publish is added again
+    workers[0].counter("logins_total", "Logins.").inc()
+    lines = asyncio.run(exporters[0].render()).splitlines()
+    assert "logins_total 4" in lines
+    assert 'latency_seconds_bucket{le="1.0"} 2' in lines
+    assert "latency_seconds_count 2" in lines
+    assert "pending 3" in lines
+
+
+def test_exporter_drops_gauges_of_stopped_workers(monkeypatch):
+    store = InMemoryMetricsStore()
+    registry = MetricsRegistry()
+    registry.counter("logins_total", "Logins.").inc()
+    registry.callback("pending", "Pending.", "gauge", (), lambda: {(): 2})
+    asyncio.run(MetricsExporter(registry, store, interval=5, worker="gone").publish())
+    now = time.monotonic()
+    monkeypatch.setattr(metrics.time, "monotonic", lambda: now + 60)
+    values = asyncio.run(store.collect())
+    # Counts of a stopped worker remain part of the totals, its gauges do not
+    assert values == {("logins_total", ()): 1.0}
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from infrastructure import query_guard, timing
+from infrastructure.query_guard import QueryBudgetExceeded, instrument_queries, track_queries
+
+
+def run_queries(statements, slow_query_ms: float = 0):
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        instrument_queries(engine, slow_query_ms)
+        try:
+            async with engine.connect() as conn:
+                for statement, parameters in statements:
+                    await conn.execute(text(statement), parameters)
+            # Plans are looked up in the background, after the statement returned
+            await asyncio.gather(*query_guard._explaining)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_repeated_statements_are_flagged(caplog):
+    with caplog.at_level(logging.WARNING), track_queries(repeat_threshold=3) as tracker:
+        run_queries([("SELECT :x", {"x": i}) for i in range(3)] + [("SELECT 1", {})] * 3)
+    assert tracker.total == 6
+    # Only runs with different parameters count towards the threshold
+    assert tracker.repeated() == [("SELECT ?", 3)]
+    assert "Possible N+1 queries" in caplog.text
+
+
+def test_budget_exceeded():
+    with pytest.raises(QueryBudgetExceeded, match="ran 3 SQL statements, over the budget of 2"):
+        with track_queries(budget=2):
+            run_queries([("SELECT 1", {})] * 3)
+
+
+def test_budget_met():
+    with track_queries(budget=3) as tracker:
+        run_queries([("SELECT 1", {})] * 3)
+    assert tracker.total == 3
+
+
+def test_slow_reads_are_logged_with_their_plan(caplog):
+    with caplog.at_level(logging.WARNING):
+        run_queries([("SELECT :x", {"x": 1})], slow_query_ms=0.0001)
+    assert "Slow query" in caplog.text
+    assert "Plan:" in caplog.text
+
+
+def test_shares_the_timing_listeners():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    timing.instrument_engine(engine)
+    instrument_queries(engine, slow_query_ms=500)
+    instrument_queries(engine, slow_query_ms=500)
+    assert event.contains(engine.sync_engine, "after_cursor_execute", timing._after_cursor_execute)
+    assert len(engine.sync_engine.dispatch.after_cursor_execute) == 1
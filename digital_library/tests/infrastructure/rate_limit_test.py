@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from infrastructure import rate_limit
+from infrastructure.rate_limit import InMemoryRateLimitStore, RateLimitStore
+
+
+@pytest.fixture(scope="function")
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+    return now
+
+
+def test_allows_up_to_the_limit(clock):
+    store = InMemoryRateLimitStore()
+    assert [asyncio.run(store.hit("ip", limit=3, window=60)) for _ in range(3)] == [None, None, None]
+    assert asyncio.run(store.hit("ip", limit=3, window=60)) is not None
+    # Other keys have their own counters
+    assert asyncio.run(store.hit("other", limit=3, window=60)) is None
+
+
+def test_previous_window_is_weighted_by_overlap(clock):
+    store = InMemoryRateLimitStore()
+    clock[0] = 60 * 100
+    for _ in range(4):
+        asyncio.run(store.hit("ip", limit=4, window=60))
+    # Half way through the next window, half of the previous count still applies
+    clock[0] = 60 * 101 + 30
+    assert asyncio.run(store.hit("ip", limit=4, window=60)) is None
+    assert asyncio.run(store.hit("ip", limit=4, window=60)) is None
+    assert asyncio.run(store.hit("ip", limit=4, window=60)) is not None
+
+
+def test_counters_reset_after_two_windows(clock):
+    store = InMemoryRateLimitStore()
+    for _ in range(5):
+        asyncio.run(store.hit("ip", limit=2, window=60))
+    clock[0] += 120
+    assert asyncio.run(store.hit("ip", limit=2, window=60)) is None
+
+
+def test_retry_after():
+    # Blocked by the current window alone: wait until its weight in the next one has decayed enough
+    assert RateLimitStore._check(now=6010, window=60, limit=2, current=3, previous=0) == 90
+    # Blocked by the previous window: wait until its weight has decayed enough for one more attempt
+    assert RateLimitStore._check(now=6030, window=60, limit=4, current=2, previous=8) == 23
+
+
+def retry_once_rejected(store: InMemoryRateLimitStore, clock, limit: int):
+    retry_after = None
+    while retry_after is None:
+        retry_after = asyncio.run(store.hit("ip", limit=limit, window=60))
+    clock[0] += retry_after
+    return asyncio.run(store.hit("ip", limit=limit, window=60))
+
+
+def test_retry_after_a_burst_is_allowed(clock):
+    store = InMemoryRateLimitStore()
+    clock[0] = 60 * 100 + 30
+    for _ in range(9):
+        asyncio.run(store.hit("ip", limit=5, window=60))
+    assert retry_once_rejected(store, clock, limit=5) is None
+
+
+def test_retry_after_a_decaying_window_is_allowed(clock):
+    store = InMemoryRateLimitStore()
+    clock[0] = 60 * 100
+    for _ in range(8):
+        asyncio.run(store.hit("ip", limit=5, window=60))
+    clock[0] = 60 * 101 + 10
+    assert retry_once_rejected(store, clock, limit=5) is None
+
+
+def test_stale_counters_are_pruned(clock):
+    store = InMemoryRateLimitStore(prune_size=4)
+    for i in range(3):
+        asyncio.run(store.hit(f"ip-{i}", limit=2, window=60))
+    clock[0] += 120
+    for i in range(3, 6):
+        asyncio.run(store.hit(f"ip-{i}", limit=2, window=60))
+    assert sorted(store._windows) == ["ip-3", "ip-4", "ip-5"]
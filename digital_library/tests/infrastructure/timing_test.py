@@ -0,0 +1,35 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from infrastructure.metrics import registry
+from infrastructure.timing import TimedRoute, TimingMiddleware
+
+
+def make_client(server_timing: bool = True) -> TestClient:
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    app = FastAPI()
+    app.include_router(router, prefix="/timing")
+    app.add_middleware(TimingMiddleware, server_timing=server_timing)
+    return TestClient(app)
+
+
+def test_server_timing_header():
+    response = make_client().get("/timing/items/1")
+    assert response.json() == {"id": 1}
+    metrics = [metric.split(";")[0] for metric in response.headers["Server-Timing"].split(", ")]
+    assert metrics == ["db", "app", "serialize", "total"]
+
+
+def test_server_timing_header_disabled():
+    response = make_client(server_timing=False).get("/timing/items/1")
+    assert "Server-Timing" not in response.headers
+
+
+def test_requests_observed_by_route_template():
+    make_client().get("/timing/items/2")
+    assert 'http_request_duration_seconds_count{method="GET",route="/timing/items/{item_id}"}' in registry.render()
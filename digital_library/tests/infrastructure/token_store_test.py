@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from infrastructure.token_store import InMemoryTokenStore
+
+
+@pytest.fixture(scope="function")
+def store():
+    return InMemoryTokenStore()
+
+
+def test_claim_is_single_use(store: InMemoryTokenStore):
+    assert asyncio.run(store.claim("jti-1", ttl=60))
+    assert not asyncio.run(store.claim("jti-1", ttl=60))
+    assert asyncio.run(store.claim("jti-2", ttl=60))
+
+
+def test_revoke_family(store: InMemoryTokenStore):
+    assert not asyncio.run(store.is_revoked("family"))
+    asyncio.run(store.revoke("family", ttl=60))
+    assert asyncio.run(store.is_revoked("family"))
+
+
+def test_markers_expire(store: InMemoryTokenStore):
+    asyncio.run(store.claim("jti", ttl=0))
+    asyncio.run(store.revoke("family", ttl=0))
+    assert asyncio.run(store.claim("jti", ttl=60))
+    assert not asyncio.run(store.is_revoked("family"))
+
+
+def test_expired_markers_are_pruned():
+    store = InMemoryTokenStore(prune_size=4)
+    for i in range(3):
+        asyncio.run(store.claim(f"expired-{i}", ttl=0))
+    for i in range(3):
+        asyncio.run(store.claim(f"live-{i}", ttl=60))
+    assert sorted(store._markers) == ["used:live-0", "used:live-1", "used:live-2"]
@@ -58,12 +58,43 @@ def test_refresh_token(client: TestClient, test_user: UserResponse):
     credentials = get_test_user_credentials(test_user)
     login_response = client.post("/auth/login", data=credentials)
     assert login_response.status_code == status.HTTP_200_OK
-    access_token = login_response.json()["access_token"]
+    tokens = login_response.json()
     refresh_response = client.post(
-        "/auth/refresh_token", headers={"Authorization": f"Bearer {access_token}"}
+        "/auth/refresh_token", headers={"Authorization": f"Bearer {tokens['refresh_token']}"}
     )
     assert refresh_response.status_code == status.HTTP_200_OK
-    assert refresh_response.json()["access_token"] == access_token
+    refreshed = refresh_response.json()
+    assert refreshed["access_token"] != tokens["access_token"]
+    assert refreshed["refresh_token"] not in (tokens["refresh_token"], refreshed["access_token"])
+
+
+def test_refresh_token_is_single_use(client: TestClient, test_user: UserResponse):
+    """Test that replaying a refresh token revokes its whole family."""
+    tokens = client.post("/auth/login", data=get_test_user_credentials(test_user)).json()
+    headers = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+    refreshed = client.post("/auth/refresh_token", headers=headers).json()
+    assert client.post("/auth/refresh_token", headers=headers).status_code == status.HTTP_401_UNAUTHORIZED
+    # The pair issued by the first refresh belongs to the revoked family as well
+    response = client.post("/auth/refresh_token", headers={"Authorization": f"Bearer {refreshed['refresh_token']}"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_refresh_token_rejects_access_token(client: TestClient, test_user: UserResponse):
+    """Test that an access token cannot be used to refresh."""
+    tokens = client.post("/auth/login", data=get_test_user_credentials(test_user)).json()
+    response = client.post("/auth/refresh_token", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_logout(client: TestClient, test_user: UserResponse):
+    """Test that logging out revokes both tokens of the login."""
+    tokens = client.post("/auth/login", data=get_test_user_credentials(test_user)).json()
+    response = client.post("/auth/logout", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    response = client.get("/books/", headers={"Authorization": f"Bearer {tokens['access_token']}"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.post("/auth/refresh_token", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
 
 
 def test_refresh_token_invalid_token(client: TestClient):
@@ -0,0 +1,45 @@
+from api.v1.schemas.book import BookResponse
+from utils.etags import book_etag, etag_matches, page_etag
+
+
+def make_book(**changes) -> BookResponse:
+    values = dict(
+        id=1,
+        title="Small Gods",
+        author="Terry Pratchett",
+        isbn="0575052457",
+        genre="Fantasy",
+        publication_date="1992-05-01",
+        is_available=True,
+    )
+    values.update(changes)
+    return BookResponse(**values)
+
+
+def test_book_etag_is_strong_and_stable():
+    etag = book_etag(make_book())
+    assert etag.startswith('"') and etag.endswith('"')
+    assert book_etag(make_book()) == etag
+
+
+def test_book_etag_changes_with_version_and_copies():
+    etag = book_etag(make_book())
+    assert book_etag(make_book(version=2)) != etag
+    assert book_etag(make_book(available_copies=0)) != etag
+
+
+def test_page_etag_depends_on_cursor():
+    etags = [book_etag(make_book())]
+    assert page_etag(etags, None) != page_etag(etags, "next")
+
+
+def test_etag_matches():
+    etag = book_etag(make_book())
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    # Weak validators only match in If-None-Match comparisons
+    assert not etag_matches(f"W/{etag}", etag)
+    assert etag_matches(f"W/{etag}", etag, weak=True)
+    # The tag of a compressed response matches its uncompressed resource
+    assert etag_matches(etag[:-1] + '-gzip"', etag)
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, status
+
+from utils.passwords import PasswordHasher
+
+
+@pytest.fixture(scope="function")
+def hasher():
+    # Cheap parameters keep the tests fast
+    hasher = PasswordHasher(n=2 ** 8, r=8, p=1, workers=2, max_pending=2)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify(hasher: PasswordHasher):
+    hashed = asyncio.run(hasher.hash("correct horse"))
+    assert hashed.startswith("scrypt$256$8$1$")
+    assert asyncio.run(hasher.verify("correct horse", hashed))
+    assert not asyncio.run(hasher.verify("battery staple", hashed))
+
+
+def test_hashes_are_salted(hasher: PasswordHasher):
+    assert asyncio.run(hasher.hash("secret")) != asyncio.run(hasher.hash("secret"))
+
+
+def test_malformed_hash_does_not_verify(hasher: PasswordHasher):
+    assert not asyncio.run(hasher.verify("secret", "not-a-hash"))
+    assert hasher.needs_rehash("not-a-hash")
+
+
+def test_needs_rehash_when_parameters_change(hasher: PasswordHasher):
+    hashed = asyncio.run(hasher.hash("secret"))
+    assert not hasher.needs_rehash(hashed)
+    stronger = PasswordHasher(n=2 ** 9, r=8, p=1, workers=1, max_pending=1)
+    assert stronger.needs_rehash(hashed)
+    # Old hashes keep verifying with the parameters they were made with
+    assert asyncio.run(stronger.verify("secret", hashed))
+    stronger.shutdown()
+
+
+def test_rejects_calls_beyond_max_pending(hasher: PasswordHasher):
+    async def storm():
+        return await asyncio.gather(*(hasher.hash("secret") for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(storm())
+    errors = [result for result in results if isinstance(result, HTTPException)]
+    assert len(errors) == 1
+    assert errors[0].status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert hasher.stats() == {"pending": 0, "rejected": 1}
+
+
+def test_dummy_hash_uses_the_current_parameters(hasher: PasswordHasher):
+    assert not hasher.needs_rehash(hasher.dummy_hash)
+    assert not asyncio.run(hasher.verify("", hasher.dummy_hash))
@@ -0,0 +1,55 @@
+import asyncio
+import json
+from datetime import date, datetime
+
+from sqlalchemy import Column, Date, DateTime, Integer, MetaData, String, Table, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api.v1.schemas.user import UserResponse
+from utils.serialization import encode_rows, rows_response
+
+metadata = MetaData()
+users = Table(
+    "users",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("username", String),
+    Column("email", String),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+    Column("born_on", Date),
+)
+
+
+def fetch_rows():
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(metadata.create_all)
+                await conn.execute(insert(users), [
+                    dict(id=1, username="ada", email="ada@example.com", created_at=datetime(2024, 1, 2, 3, 4, 5, 678000),
+                         updated_at=datetime(2024, 1, 2, 3, 4, 5), born_on=date(1815, 12, 10)),
+                ])
+                return (await conn.execute(select(users.c.username, users.c.email, users.c.id, users.c.created_at, users.c.updated_at))).all()
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_rows_encode_like_the_response_schema():
+    rows = fetch_rows()
+    expected = UserResponse(**rows[0]._mapping).dict()
+    assert json.loads(encode_rows(rows)) == [json.loads(json.dumps(expected, default=lambda value: value.isoformat()))]
+
+
+def test_empty_rows():
+    assert encode_rows([]) == b"[]"
+
+
+def test_rows_response_keeps_headers():
+    response = rows_response(fetch_rows(), {"ETag": '"abc"'})
+    assert response.media_type == "application/json"
+    assert response.headers["etag"] == '"abc"'
+    assert json.loads(response.body)[0]["username"] == "ada"
@@ -0,0 +1,55 @@
+import time
+
+import jwt
+import pytest
+
+from utils.tokens import TokenVerifier
+
+CURRENT_KEY = "current-signing-key-that-is-long-enough"
+PREVIOUS_KEY = "previous-signing-key-that-is-long-enough"
+
+
+@pytest.fixture(scope="function")
+def verifier():
+    return TokenVerifier({"v2": CURRENT_KEY, "v1": PREVIOUS_KEY}, "v2", "HS256", maxsize=2)
+
+
+def make_token(key: str, kid: str = None, expires_in: int = 60, sub: str = "reader") -> str:
+    headers = {"kid": kid} if kid else None
+    return jwt.encode({"sub": sub, "exp": int(time.time()) + expires_in}, key, algorithm="HS256", headers=headers)
+
+
+def test_repeat_verification_is_cached(verifier: TokenVerifier):
+    token = make_token(CURRENT_KEY, "v2")
+    assert verifier.verify(token)["sub"] == "reader"
+    assert verifier.verify(token)["sub"] == "reader"
+    assert verifier.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_accepts_previous_key_by_kid(verifier: TokenVerifier):
+    assert verifier.verify(make_token(PREVIOUS_KEY, "v1"))["sub"] == "reader"
+
+
+def test_token_without_kid_uses_default_key(verifier: TokenVerifier):
+    assert verifier.verify(make_token(CURRENT_KEY))["sub"] == "reader"
+
+
+def test_rejects_unknown_kid_and_bad_signature(verifier: TokenVerifier):
+    with pytest.raises(jwt.InvalidTokenError):
+        verifier.verify(make_token(CURRENT_KEY, "v0"))
+    with pytest.raises(jwt.InvalidSignatureError):
+        verifier.verify(make_token(PREVIOUS_KEY, "v2"))
+
+
+def test_rejects_expired_token(verifier: TokenVerifier):
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verifier.verify(make_token(CURRENT_KEY, "v2", expires_in=-1))
+
+
+def test_evicts_least_recently_used(verifier: TokenVerifier):
+    tokens = [make_token(CURRENT_KEY, "v2", sub=f"reader{i}") for i in range(3)]
+    for token in tokens:
+        verifier.verify(token)
+    assert verifier.stats()["size"] == 2
+    verifier.verify(tokens[0])
+    assert verifier.stats()["hits"] == 0